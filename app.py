@@ -1,58 +1,130 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-import uuid
+
+# The page shell goes out before the heavy imports below (pandas alone takes
+# most of a second on a cold start), so the browser has something to show
+st.set_page_config(page_title="Item Balancing Tool", layout="wide")
+st.title("🎮 Item Balancing Tool")
+
 import json
+import os
+import time
+import uuid
 from pathlib import Path
-import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import json
+
 import numpy as np
-import uuid
+import pandas as pd
+
+from balancing import RESOURCE_FIELDS, CatalogConflict, ItemStore, ResourceCostBreakdown, SharedCatalog
+from balancing.backends import SqliteBackend
+from balancing.binning import ResourceMix
+from balancing.columnar import COLUMNAR_SUFFIX, is_columnar_file, load_columnar, save_columnar
+from balancing.derived import FrameCache
+from balancing.export import EXPORT_FORMATS, ExportCache
+from balancing.formulas import (
+    FORMULA_PRESETS, FUNCTIONS, STANDARD_FORMULA, FormulaError, compile_formula, preset_name
+)
+from balancing.importer import ImportStats, import_items
+from balancing.journal import JournaledStorage, discard_journals, replay_journal
+from balancing.location import resolve_data_file
+from balancing.lod import density_grid, scatter_mode, top_positions
+from balancing.parallel import AnalysisPool
+from balancing.persistence import AutoSaver, write_json_atomic
+from balancing.resources import DEFAULT_TOLERANCE, MIN_TOLERANCE, REPAIR_STRATEGIES, plan_repair
+from balancing.simulation import simulate
+from balancing.whatif import Sweep, scenario_grid
 
-st.set_page_config(page_title="Item Balancing Tool", layout="wide")
-st.title("🎮 Item Balancing Tool")
 
 # Data file configuration for Docker compatibility
+@st.cache_resource
 def get_data_file_path():
-    """Get the appropriate data file path, handling Docker environments and Streamlit Cloud"""
-    # First try: /app/data directory (for Docker)
-    docker_data_dir = Path("/app/data")
-    try:
-        if docker_data_dir.exists() and docker_data_dir.is_dir():
-            docker_data_dir.mkdir(exist_ok=True)
-            data_file = docker_data_dir / "data.json"
-            # Test write permissions
-            test_file = docker_data_dir / ".write_test"
-            test_file.touch()
-            test_file.unlink()
-            return data_file
-    except (OSError, PermissionError):
-        pass
-    
-    # Second try: /tmp directory (always writable in containers)
-    tmp_data_dir = Path("/tmp/item_balancing_data")
-    try:
-        tmp_data_dir.mkdir(exist_ok=True)
-        return tmp_data_dir / "data.json"
-    except (OSError, PermissionError):
-        pass
-    
-    # Third try: User's home directory (for Streamlit Cloud)
-    try:
-        home_data_dir = Path.home() / ".item_balancing_tool"
-        home_data_dir.mkdir(exist_ok=True)
-        return home_data_dir / "data.json"
-    except (OSError, PermissionError):
-        pass
-    
-    # Fallback: relative to current file
-    return Path(__file__).parent / "data.json"
+    """Get the data file path once per process, handling Docker environments and Streamlit Cloud
+
+    ITEM_BALANCING_DATA_FILE overrides the location. Otherwise the candidate
+    directories are probed on the first start only and the result is kept in
+    a marker file (see balancing.location).
+    """
+    override = os.environ.get("ITEM_BALANCING_DATA_FILE")
+    if override:
+        data_file = Path(override)
+        data_file.parent.mkdir(parents=True, exist_ok=True)
+        return data_file
+    return resolve_data_file(Path(__file__).parent / "data.json")
 
 DATA_FILE = get_data_file_path()
 
+# Where saves go when DATA_FILE can't be written; loading considers it too
+FALLBACK_DATA_FILE = Path("/tmp") / "item_balancing_data.json"
+
+# Auto-saves are coalesced: a burst of edits within this many seconds of each
+# other is written once, in the background
+SAVE_DEBOUNCE_SECONDS = float(os.environ.get("ITEM_BALANCING_SAVE_DEBOUNCE", "1.0"))
+
+# "json" rewrites the whole data file on every change; "journal" appends each
+# change to data.json.journal and only rewrites data.json on compaction;
+# "sqlite" keeps the items in data.db and writes each change as one row update
+STORAGE_MODE = os.environ.get("ITEM_BALANCING_STORAGE", "json")
+DB_FILE = DATA_FILE.with_suffix(".db")
+
+# Analysis frames kept for recent (catalog version, category filter) pairs
+FRAME_CACHE_SIZE = int(os.environ.get("ITEM_BALANCING_FRAME_CACHE", "8"))
+
+# Scatter plots switch to WebGL (labelling only the top items) above the
+# first threshold and to a server-side density grid above the second
+SCATTER_WEBGL_THRESHOLD = int(os.environ.get("ITEM_BALANCING_SCATTER_WEBGL", "2000"))
+SCATTER_DENSITY_THRESHOLD = int(os.environ.get("ITEM_BALANCING_SCATTER_DENSITY", "50000"))
+SCATTER_LABEL_COUNT = int(os.environ.get("ITEM_BALANCING_SCATTER_LABELS", "20"))
+
+# Most items drawn as individual bars in the resource distribution chart;
+# larger selections are shown per bin by default
+RESOURCE_BAR_ITEMS = int(os.environ.get("ITEM_BALANCING_RESOURCE_BAR_ITEMS", "100"))
+
+# Largest what-if sweep (scenarios per run) the Advanced Metrics tab accepts
+WHATIF_MAX_SCENARIOS = int(os.environ.get("ITEM_BALANCING_WHATIF_MAX_SCENARIOS", "2000"))
+
+# Largest usage simulation (trials x items) the Advanced Metrics tab runs
+SIMULATION_MAX_USES = int(os.environ.get("ITEM_BALANCING_SIMULATION_MAX_USES", "1000000000"))
+
+# Balance analysis of catalogs with at least PARALLEL_MIN_ITEMS items runs
+# on a pool of ANALYSIS_WORKERS threads (or processes; 0: one per usable
+# CPU). With a single CPU, or ANALYSIS_WORKERS=1, it always runs serially
+ANALYSIS_WORKERS = int(os.environ.get("ITEM_BALANCING_ANALYSIS_WORKERS", "0"))
+ANALYSIS_POOL_KIND = os.environ.get("ITEM_BALANCING_ANALYSIS_POOL", "thread")
+PARALLEL_MIN_ITEMS = int(os.environ.get("ITEM_BALANCING_PARALLEL_MIN_ITEMS", "200000"))
+
+
+@st.cache_resource
+def get_sqlite_backend(path):
+    """One SQLite connection per database file, shared by all sessions."""
+    return SqliteBackend(path)
+
+
+@st.cache_resource
+def get_export_cache():
+    """Export payloads shared by all sessions, rebuilt only after the catalog changed."""
+    return ExportCache()
+
+
+@st.cache_resource
+def get_frame_cache():
+    """Analysis frames shared by all sessions, one per catalog version and filter."""
+    return FrameCache(max_frames=FRAME_CACHE_SIZE)
+
+
+@st.cache_resource
+def get_analysis_pool():
+    """Worker pool for the balance analysis of large catalogs, shared by all sessions."""
+    return AnalysisPool(ANALYSIS_WORKERS or None, ANALYSIS_POOL_KIND, PARALLEL_MIN_ITEMS)
+
+
+@st.cache_resource
+def get_auto_saver(path):
+    """One background saver per data file, shared by all sessions of the process."""
+    return AutoSaver(
+        path,
+        debounce=SAVE_DEBOUNCE_SECONDS,
+        fallback_path=FALLBACK_DATA_FILE
+    )
+
 # Sample data directly embedded in the code
 SAMPLE_DATA = [
   {
@@ -203,47 +275,57 @@ CATEGORIES = [
 
 
 def load_data_file(path=None):
-    """Try to load items from a JSON file with Docker-friendly fallbacks.
+    """Load items from ``path`` or the resolved data file.
 
-    Accepts either a top-level list of item dicts or an object with an "items" key.
-    Returns list on success, or None on failure.
+    Accepts either a top-level list of item dicts or an object with an "items" key,
+    or a binary columnar file (see balancing.columnar).
+    Any change journal next to the file is replayed over it. Returns an
+    ItemStore on success, or None on failure.
     """
-    paths_to_try = []
-    
-    # If a specific path is provided, try it first
+    # The data file was resolved once at startup (see balancing.location).
+    # Saves that couldn't write it went to FALLBACK_DATA_FILE, and a columnar
+    # copy (data.npz) next to a JSON file is recognized too: whichever of
+    # them was written last is loaded first. The bundled data.json seeds the
+    # catalog until one of them exists.
     if path is not None:
-        paths_to_try.append(path)
-    
-    # Add our standard data file locations
-    paths_to_try.extend([
-        DATA_FILE,
-        Path("/tmp") / "item_balancing_data.json",
-        Path("/app/data") / "data.json",
-        Path.home() / ".item_balancing_tool" / "data.json",
-        Path(__file__).parent / "data.json"
-    ])
-    
-    # Remove duplicates while preserving order
-    unique_paths = []
-    for p in paths_to_try:
-        if p not in unique_paths:
-            unique_paths.append(p)
+        groups = [[Path(path)]]
+    else:
+        groups = [[DATA_FILE] + ([FALLBACK_DATA_FILE] if FALLBACK_DATA_FILE != DATA_FILE else [])]
+        bundled = Path(__file__).parent / "data.json"
+        if bundled != DATA_FILE:
+            groups.append([bundled])
+    paths_to_try = []
+    for group in groups:
+        found = [(p, data_path) for data_path in group
+                 for p in (data_path, data_path.with_suffix(COLUMNAR_SUFFIX)) if p.exists()]
+        paths_to_try.extend(sorted(found, key=lambda pair: pair[0].stat().st_mtime, reverse=True))
     
-    for current_path in unique_paths:
+    for current_path, data_path in paths_to_try:
         try:
-            if not current_path.exists():
-                continue
+            if is_columnar_file(current_path):
+                # Memory-mapped: only names and indexes are built up front
+                store = load_columnar(current_path, categories=CATEGORIES)
+                replayed = replay_journal(store, data_path)
+                st.success(f"📂 Loaded data from {current_path}")
+                if replayed:
+                    st.info(f"📝 Replayed {replayed} journaled changes")
+                st.session_state["data_source_path"] = current_path
+                return store
                 
             with current_path.open("r", encoding="utf-8") as fh:
                 data = json.load(fh)
             
             # Accept both list-of-dicts and { "items": [...] }
-            if isinstance(data, list):
-                st.success(f"📂 Loaded data from {current_path}")
-                return data
             if isinstance(data, dict) and "items" in data and isinstance(data["items"], list):
+                data = data["items"]
+            if isinstance(data, list):
+                store = ItemStore.from_records(data, categories=CATEGORIES)
+                replayed = replay_journal(store, current_path)
                 st.success(f"📂 Loaded data from {current_path}")
-                return data["items"]
+                if replayed:
+                    st.info(f"📝 Replayed {replayed} journaled changes")
+                st.session_state["data_source_path"] = current_path
+                return store
             
             # Unexpected format
             st.warning(f"{current_path.name} exists but has unexpected JSON structure; expected a list or {{'items': [...]}}")
@@ -257,13 +339,13 @@ def load_data_file(path=None):
     # Try loading from session state as last resort
     if 'persistent_items' in st.session_state:
         st.info("📂 Loaded data from session memory")
-        return st.session_state.persistent_items
+        return st.session_state.persistent_items.copy()
     
     return None
 
 
-def save_data_file(items, path=None):
-    """Save items to a JSON file with Docker-friendly error handling.
+def save_data_file(store, path=None):
+    """Save the item store to a JSON file with Docker-friendly error handling.
     
     For Docker compatibility, we'll try multiple strategies to save data.
     """
@@ -272,13 +354,16 @@ def save_data_file(items, path=None):
     if path is None:
         path = DATA_FILE
     
+    items = store.to_records()
+    
     # Strategy 1: Try the primary data file path
     try:
         # Ensure parent directory exists
         path.parent.mkdir(parents=True, exist_ok=True)
         
-        with path.open("w", encoding="utf-8") as fh:
-            json.dump(items, fh, indent=2, ensure_ascii=False)
+        write_json_atomic(path, items)
+        # The file now holds every change, so the journal is obsolete
+        discard_journals(path)
         st.success(f"✅ Saved {len(items)} items to {path}")
         return True
     except Exception as e:
@@ -286,9 +371,8 @@ def save_data_file(items, path=None):
     
     # Strategy 2: Try /tmp directory
     try:
-        tmp_path = Path("/tmp") / "item_balancing_data.json"
-        with tmp_path.open("w", encoding="utf-8") as fh:
-            json.dump(items, fh, indent=2, ensure_ascii=False)
+        tmp_path = FALLBACK_DATA_FILE
+        write_json_atomic(tmp_path, items)
         st.success(f"✅ Saved {len(items)} items to fallback location: {tmp_path}")
         
         # Also update the global DATA_FILE to point to this working location
@@ -300,10 +384,7 @@ def save_data_file(items, path=None):
     # Strategy 3: In-memory storage (session-based persistence)
     try:
         # Store in session state as backup
-        if 'persistent_items' not in st.session_state:
-            st.session_state.persistent_items = items
-        else:
-            st.session_state.persistent_items = items
+        st.session_state.persistent_items = store.copy()
         st.info("💾 Data saved in memory (session-based persistence). Download your data to keep it permanently.")
         return False
     except Exception as e:
@@ -311,109 +392,132 @@ def save_data_file(items, path=None):
         return False
 
 
-def restore_sample_data():
-    """Restore the sample data to the session state."""
-    # Deep copy to avoid modifying the original
-    sample_data = json.loads(json.dumps(SAMPLE_DATA))
-    
-    # Update costs for all items
-    for item in sample_data:
-        item['calculated_cost'] = calculate_cost(
-            item['success_rate'], 
-            item['efficiency'], 
-            st.session_state["cost_max_value"]
+@st.cache_resource
+def get_shared_catalog():
+    """The item catalog shared by all browser sessions of this process."""
+    return SharedCatalog(ItemStore(categories=CATEGORIES))
+
+
+def replace_catalog(store, message):
+    """Make ``store`` the shared catalog unless another session changed it first."""
+    try:
+        get_shared_catalog().replace(store, base_version)
+    except CatalogConflict:
+        st.session_state["catalog_notice"] = (
+            "⚠️ The catalog was changed by another session in the meantime; "
+            "nothing was replaced. Check the current data and try again."
         )
-    
-    st.session_state["items"] = sample_data
-    st.success("Sample data has been restored!")
-    
-    # Auto-save after restoring sample data
+        return False
+    st.session_state["catalog_notice"] = message
     auto_save_data()
-    
-    return sample_data
+    return True
+
+
+def restore_sample_data():
+    """Replace the shared catalog with the sample data."""
+    # The store copies the values, so SAMPLE_DATA itself is never modified
+    store = ItemStore.from_records(SAMPLE_DATA, categories=CATEGORIES)
+    return replace_catalog(store, "Sample data has been restored!")
+
+
+@st.cache_resource
+def get_journaled_storage():
+    """Journaled persistence of the shared catalog (journal storage mode)."""
+    return JournaledStorage(get_auto_saver(DATA_FILE), DATA_FILE, lock=get_shared_catalog().lock)
 
 
 def auto_save_data():
-    """Automatically save data when it changes (Docker-friendly)"""
-    if "items" in st.session_state:
-        items = st.session_state.get("items", [])
-        if items:  # Only save if there's actual data
-            save_data_file(items)
+    """Automatically save data when it changes (Docker-friendly)
 
+    The write happens in the background; its outcome is shown in the sidebar.
+    In journal mode the change itself is already in the journal and this only
+    triggers a compaction when one is due. In SQLite mode every change has
+    already been written through.
+    """
+    catalog = get_shared_catalog()
+    store = catalog.store
+    if STORAGE_MODE == "journal":
+        get_journaled_storage().commit(store)
+    elif STORAGE_MODE == "json" and len(store):  # Only save if there's actual data
+        # Copied under the catalog lock, so an edit from another session can't tear it
+        get_auto_saver(DATA_FILE).schedule(store, on_saved=lambda: discard_journals(DATA_FILE), lock=catalog.lock)
 
-# Initialize session state
-if "items" not in st.session_state:
-    # Try to load from data.json first, but don't worry if it fails
-    try:
-        loaded = load_data_file()
+
+def load_sqlite_store():
+    """Load the catalog from the SQLite database, migrating data.json on first use.
+
+    A database that was emptied (Clear All Items) stays empty; data.json is
+    only migrated into one that never held a catalog.
+    """
+    backend = get_sqlite_backend(DB_FILE)
+    if backend.initialized():
+        store = backend.load(categories=CATEGORIES)
+        st.success(f"📂 Loaded data from {DB_FILE}")
+    else:
+        # One-shot migration from the JSON data file
+        store = load_data_file()
+        if store is None:
+            return None
+        backend.save(store)
+        st.success(f"🗄️ Migrated {len(store)} items to {DB_FILE}")
+    return store
+
+
+def connect_storage(catalog, synced):
+    """Persist every later change of the shared catalog in the configured storage.
+
+    ``synced`` says the catalog was just loaded from that storage; otherwise
+    it is written out in full first.
+    """
+    if STORAGE_MODE == "journal":
+        journaled = get_journaled_storage()
+        journaled.attach(catalog.store, synced=synced)
+        # A replaced catalog can't be journaled; attaching writes a snapshot
+        catalog.on_replace(journaled.attach)
+    elif STORAGE_MODE == "sqlite":
+        backend = get_sqlite_backend(DB_FILE)
+        if synced:
+            # Loading recomputed the costs; store the factors that changed and the scale
+            backend.sync_costs(catalog.store)
+        else:
+            backend.save(catalog.store)
+        catalog.add_listener(backend.listener())
+        catalog.on_replace(backend.save)
+    elif not synced:
+        auto_save_data()
+
+
+# All sessions share one catalog; the first session of the process loads it
+catalog = get_shared_catalog()
+with catalog.lock:
+    if not catalog.loaded:
+        # Try to load from data.json first, but don't worry if it fails
+        try:
+            loaded = load_sqlite_store() if STORAGE_MODE == "sqlite" else load_data_file()
+        except Exception:
+            loaded = None
         if loaded is not None:
-            st.session_state["items"] = loaded
+            catalog.load(loaded)
+            synced = STORAGE_MODE == "sqlite" or st.session_state.get("data_source_path") == DATA_FILE
+            connect_storage(catalog, synced=synced)
             st.success("📂 Loaded existing data from file!")
         else:
             # Use sample data as fallback
-            st.session_state["items"] = json.loads(json.dumps(SAMPLE_DATA))
-            st.info("📝 Started with sample data. Your changes will be auto-saved!")
+            catalog.load(ItemStore.from_records(SAMPLE_DATA, categories=CATEGORIES))
             # Auto-save the initial sample data
-            auto_save_data()
-    except:
-        # Use sample data as fallback
-        st.session_state["items"] = json.loads(json.dumps(SAMPLE_DATA))
-        st.info("📝 Started with sample data. Your changes will be auto-saved!")
-        # Auto-save the initial sample data
-        auto_save_data()
-
-# Initialize max cost value if not exists
-if "cost_max_value" not in st.session_state:
-    st.session_state["cost_max_value"] = 100000
+            connect_storage(catalog, synced=False)
+            st.info("📝 Started with sample data. Your changes will be auto-saved!")
 
-# Cost calculation function
-def calculate_cost(success_rate, efficiency, cost_max):
-    """Calculate item cost as (success_rate * efficiency / 10000) * cost_max
+# Writes made in this run are based on the catalog version the previous run
+# showed; read the version before the store so it is never newer than the data
+base_version = st.session_state.get("catalog_version", catalog.version)
+st.session_state["catalog_version"] = catalog.version
+with catalog.lock:
+    store = catalog.store
+    aggregates = catalog.aggregates
 
-    success_rate and efficiency are percentages (0-100). The product is divided
-    by 10000 to map 100*100 -> 1.0, then scaled by cost_max.
-    """
-    cost_factor = (success_rate * efficiency) / 10000.0
-    final_cost = cost_factor * cost_max
-    return final_cost
-
-# Update costs for existing items
-for item in st.session_state["items"]:
-    item['calculated_cost'] = calculate_cost(item['success_rate'], item['efficiency'], st.session_state["cost_max_value"])
-
-# Generate resource costs based on total cost and resource distribution
-def calculate_resource_costs(items):
-    """Calculate the cost of each resource type based on item's total cost and resource distribution."""
-    resource_fields = [
-        "metals_alloys", "synthetic_materials", "tech_components", 
-        "energy_sources", "biomatter", "chemicals"
-    ]
-    
-    resource_costs = []
-    for item in items:
-        item_resource_costs = {
-            "item_name": item["item_name"],
-            "category": item.get("category", ""),
-            "calculated_cost": item["calculated_cost"]
-        }
-        
-        total_resource_percentage = sum(item.get(field, 0) for field in resource_fields)
-        
-        # Avoid division by zero
-        if total_resource_percentage > 0:
-            for field in resource_fields:
-                percentage = item.get(field, 0)
-                # Calculate the cost for this resource
-                cost = (percentage / total_resource_percentage) * item["calculated_cost"]
-                item_resource_costs[f"{field}_cost"] = cost
-        else:
-            # If no resources specified, set all costs to 0
-            for field in resource_fields:
-                item_resource_costs[f"{field}_cost"] = 0
-                
-        resource_costs.append(item_resource_costs)
-    
-    return resource_costs
+if "catalog_notice" in st.session_state:
+    st.info(st.session_state.pop("catalog_notice"))
 
 # Create tabs
 tab1, tab2, tab3 = st.tabs(["📊 Data Input", "⚖️ Balance Analysis", "📈 Advanced Metrics"])
@@ -425,7 +529,22 @@ st.sidebar.markdown("### ⚙️ Global Settings")
 st.sidebar.markdown("### 🔎 Filter Items")
 category_filter = st.sidebar.radio("Filter by:", ["All Categories", "Specific Category"], key="filter_type")
 
-filtered_items = st.session_state["items"]
+# None means "no filter": views over the whole store are then zero-copy
+filtered_positions = None
+active_category = None
+
+
+def category_positions(category):
+    """Sorted positions of the items of ``category`` in the shared catalog.
+
+    With the SQLite backend they come from the category index of the
+    database. Call it under the catalog lock.
+    """
+    if STORAGE_MODE == "sqlite":
+        positions = store.positions_of(get_sqlite_backend(DB_FILE).item_ids(category))
+        return np.sort(positions[positions >= 0])
+    return store.filter(category=category)
+
 
 if category_filter == "Specific Category":
     selected_category = st.sidebar.selectbox(
@@ -435,18 +554,188 @@ if category_filter == "Specific Category":
     )
     
     if selected_category != "All":
-        filtered_items = [item for item in st.session_state["items"] 
-                        if item.get("category") == selected_category]
+        active_category = selected_category
+        with catalog.lock:
+            filtered_positions = category_positions(selected_category)
+
+filtered_count = len(store) if filtered_positions is None else len(filtered_positions)
+
+
+def analysis_frame():
+    """The filtered items with derived columns, shared by all tabs (read-only).
+
+    Built once per catalog version and filter, for all sessions together,
+    from a copy taken under the catalog lock.
+    """
+    return get_frame_cache().frame(store, active_category, lock=catalog.lock, find=category_positions)
+
+
+def balance_report():
+    """engine.BalanceReport of analysis_frame(), computed once per catalog version and filter."""
+    df = analysis_frame()
+    key = (store, df.attrs["version"], active_category)
+    cached = st.session_state.get("balance_report")
+    if cached is None or cached[0] != key:
+        cached = (key, get_analysis_pool().analyze(df))
+        st.session_state["balance_report"] = cached
+    return cached[1]
+
+
+def category_table():
+    """Per-category count and means of the filtered items, sorted by category.
+
+    With the SQLite backend the aggregation is pushed down as a SQL query;
+    otherwise it is read from the catalog's running aggregates. Neither
+    scans the items in memory.
+    """
+    if STORAGE_MODE == "sqlite":
+        return get_sqlite_backend(DB_FILE).category_stats(active_category)
+    return aggregates.table(active_category)
+
+
+def category_stats():
+    """Per-category means of success_rate, efficiency, calculated_cost and performance_score."""
+    table = category_table()
+    return table[['category', 'success_rate', 'efficiency', 'calculated_cost', 'performance_score', 'power_level']]
+
+
+def plotly_go():
+    """plotly.graph_objects, imported when the first chart is built.
+
+    Importing Plotly is a large part of a cold start, and a run only builds
+    the charts that are shown.
+    """
+    import plotly.graph_objects as go
+    return go
+
+
+def show_chart(label, key):
+    """Checkbox that shows one chart; build its figure only while it is checked.
+
+    Every tab runs on each rerun (collapsed expanders too), so a chart
+    that isn't shown would otherwise still be built.
+    """
+    return st.checkbox(f"📈 Show {label}", key=key)
+
+
+def add_item_scatter(fig, df, x, y, color, marker, hovertemplate=None, rank_by='power_level',
+                     x_range=None, y_range=None):
+    """Add the items of df to fig as a scatter of columns x and y, colored by column color.
+
+    The level of detail depends on the number of items: every item labelled,
+    WebGL markers with only the top items (by rank_by) labelled, or a density
+    grid with the outliers and the top items drawn on top.
+    """
+    go = plotly_go()
+    mode = scatter_mode(len(df), SCATTER_WEBGL_THRESHOLD, SCATTER_DENSITY_THRESHOLD)
+    if mode == "svg":
+        fig.add_trace(go.Scatter(
+            x=df[x],
+            y=df[y],
+            mode='markers+text',
+            text=df['item_name'],
+            textposition="top center",
+            marker=dict(marker, color=df[color]),
+            hovertemplate=hovertemplate,
+            name="Items"
+        ))
+        return
+
+    if mode == "density":
+        grid = density_grid(df[x].to_numpy(), df[y].to_numpy(), x_range, y_range)
+        fig.add_trace(go.Heatmap(
+            x=grid.x_centers,
+            y=grid.y_centers,
+            z=np.where(grid.counts > 0, grid.counts, np.nan),
+            colorscale='Greys',
+            showscale=False,
+            opacity=0.6,
+            hovertemplate="Items: %{z:.0f}<extra></extra>",
+            name="Item density"
+        ))
+        points = df.iloc[grid.outliers]
+    else:
+        points = df
+    # Markers without a border: outlines are what makes many points expensive
+    fig.add_trace(go.Scattergl(
+        x=points[x],
+        y=points[y],
+        mode='markers',
+        text=points['item_name'],
+        marker=dict({key: value for key, value in marker.items() if key != 'line'},
+                    color=points[color], size=min(marker.get('size', 8), 8)),
+        hovertemplate=hovertemplate,
+        name="Items" if mode == "webgl" else "Outliers"
+    ))
+    top = df.iloc[top_positions(df[rank_by].to_numpy(), SCATTER_LABEL_COUNT)]
+    fig.add_trace(go.Scatter(
+        x=top[x],
+        y=top[y],
+        mode='text',
+        text=top['item_name'],
+        textposition="top center",
+        hoverinfo='skip',
+        showlegend=False
+    ))
+
+
+def category_counts():
+    """Item counts of the categories present in the filtered items, largest first."""
+    table = category_table().sort_values('count', ascending=False, kind='stable')
+    return pd.Series(table['count'].to_numpy(), index=table['category'].to_numpy())
 
 st.sidebar.markdown("---")
 new_cost_max = st.sidebar.number_input(
     "Maximum Cost Value",
     min_value=1,
     max_value=10_000_000,
-    value=st.session_state["cost_max_value"],
+    value=catalog.cost_max,
     step=1000,
-    help="Maximum cost when success_rate and efficiency are both 100% (cost = (s × e / 10000) × max_cost)."
+    help="The cost_max parameter of the cost formula: with the standard formula, the cost of an item with "
+         "100% success rate and efficiency (cost = (s × e / 10000) × max_cost)."
+)
+
+# Cost formula (a catalog-wide setting like Max Cost). A session that picked
+# "Custom" keeps seeing it until the formula changes, even for a preset's formula
+formula_names = list(FORMULA_PRESETS) + ["Custom"]
+current_formula = catalog.formula.expression if catalog.formula is not None else STANDARD_FORMULA
+formula_choice = preset_name(current_formula) or "Custom"
+if st.session_state.get("custom_formula") == current_formula:
+    formula_choice = "Custom"
+formula_name = st.sidebar.selectbox(
+    "Cost Formula",
+    formula_names,
+    index=formula_names.index(formula_choice),
+    help="How calculated_cost is computed from the item fields. Presets can be tuned with their parameters."
 )
+if formula_name == "Custom":
+    st.session_state["custom_formula"] = current_formula
+    formula_expression = st.sidebar.text_area(
+        "Formula",
+        value=current_formula,
+        help="An expression over success_rate, efficiency, the resource shares (metals_alloys, ...), "
+             "category (only as in category == \"Weapons\") and parameters such as cost_max. "
+             "Supports + - * / ** %, comparisons, and/or/not, `a if condition else b` and "
+             + ", ".join(f"{name}()" for name in FUNCTIONS) + "."
+    )
+    preset_parameters = {}
+else:
+    st.session_state.pop("custom_formula", None)
+    formula_expression, preset_parameters = FORMULA_PRESETS[formula_name]
+try:
+    new_formula = compile_formula(formula_expression)
+except FormulaError as e:
+    st.sidebar.error(f"Invalid formula: {e}")
+    new_formula = compile_formula(current_formula)
+new_formula_parameters = {}
+for name in new_formula.parameters:
+    if name != "cost_max":
+        new_formula_parameters[name] = st.sidebar.number_input(
+            name,
+            value=float(catalog.formula_parameters.get(name, preset_parameters.get(name, 1.0))),
+            step=0.05,
+            format="%.4g"
+        )
 
 # Display options
 st.sidebar.markdown("### 📊 Display Options")
@@ -464,12 +753,15 @@ show_resource_costs = st.sidebar.checkbox(
 # Update session state with current checkbox value
 st.session_state["show_resource_costs"] = show_resource_costs
 
-# Update max cost if changed
-if new_cost_max != st.session_state["cost_max_value"]:
-    st.session_state["cost_max_value"] = new_cost_max
-    # Recalculate all item costs
-    for item in st.session_state["items"]:
-        item['calculated_cost'] = calculate_cost(item['success_rate'], item['efficiency'], st.session_state["cost_max_value"])
+# Update max cost if changed (a catalog-wide setting shared by all sessions)
+if new_cost_max != catalog.cost_max:
+    catalog.set_cost_max(new_cost_max)
+    st.rerun()
+
+# Switching the formula recomputes calculated_cost once for the whole catalog
+if new_formula.expression != current_formula or new_formula_parameters != catalog.formula_parameters:
+    catalog.set_formula(None if new_formula.expression == STANDARD_FORMULA else new_formula,
+                        new_formula_parameters)
     st.rerun()
 
 with tab1:
@@ -477,15 +769,63 @@ with tab1:
 
     # Current Items Table
     st.subheader("📋 Current Items Table")
-    if st.session_state["items"]:
-        df = pd.DataFrame(filtered_items)
+    if len(store):
+        df = store.to_frame(filtered_positions)
+        
+        # The editor reports its edits as row offsets into the frame it showed
+        # on the previous run. Other sessions may have added, deleted or moved
+        # items since, so the offsets are mapped through the item ids shown
+        # then, not through df. Edits of a different store or filter are dropped.
+        shown_ids = st.session_state.get("item_editor_ids")
+        editor_scope = (store, active_category)
+        if st.session_state.get("item_editor_scope") != editor_scope:
+            st.session_state.pop("item_editor", None)
+            st.session_state["item_editor_scope"] = editor_scope
+            shown_ids = None
+        
+        # Apply the cells changed in the editor before it is drawn again:
+        # Streamlit resets an editor whose data changed, which would drop them.
+        # They come as {row offset: {column: value}}; the item_id shown in that
+        # row identifies the item in the shared catalog. The edit state persists
+        # across reruns, so cells that already match the catalog are skipped.
+        edited_rows = st.session_state.get("item_editor", {}).get("edited_rows", {}) if shown_ids is not None else {}
+        rows_changed = 0
+        conflicts = []
+        for row, cells in edited_rows.items():
+            if int(row) >= len(shown_ids):
+                continue
+            item_id = int(shown_ids[int(row)])
+            try:
+                if catalog.update_item(item_id, cells, base_version) > base_version:
+                    rows_changed += 1
+            except CatalogConflict as e:
+                try:
+                    name = store.value(store.position_of(item_id), "item_name")
+                except KeyError:
+                    name = f"Item {item_id}"
+                conflicts.append(f"{name}: {e}")
+        
+        if rows_changed or conflicts:
+            if conflicts:
+                st.session_state["catalog_notice"] = (
+                    "⚠️ Some edits were not applied because another session changed the same "
+                    "fields first:\n\n" + "\n\n".join(conflicts)
+                )
+            if rows_changed:
+                # Auto-save after updating items
+                auto_save_data()
+            # Start the editor over from the catalog so applied (or rejected)
+            # edits are not re-sent on later runs
+            st.session_state["item_editor_scope"] = None
+            st.rerun()
         
         # Standard data editor view (always shown)
-        edited_df = st.data_editor(
+        st.data_editor(
             df,
             use_container_width=True,
             num_rows="fixed",
             column_config={
+                "item_id": None,  # Hidden; used to map edits back to store rows
                 "item_name": st.column_config.TextColumn("Item Name", width="medium"),
                 "category": st.column_config.SelectboxColumn("Category", options=CATEGORIES),
                 "success_rate": st.column_config.NumberColumn("Success Rate (%)", min_value=0.0, max_value=100.0),
@@ -502,30 +842,20 @@ with tab1:
             column_order=None,  # Show all columns
             hide_index=True
         )
-        
-                # Display resource costs table if toggle is enabled
-        if show_resource_costs:
-            st.subheader("📊 Resource Cost Breakdown")
-            resource_costs = calculate_resource_costs(filtered_items)
-            cost_df = pd.DataFrame(resource_costs)
-            
-            column_config = {
-                "item_name": st.column_config.TextColumn("Item Name"),
-                "category": st.column_config.TextColumn("Category"),
-                "calculated_cost": st.column_config.NumberColumn("Total Cost", format="%.0f"),
-                "metals_alloys_cost": st.column_config.NumberColumn("Metals & Alloys Cost", format="%.0f"),
-                "synthetic_materials_cost": st.column_config.NumberColumn("Synthetic Materials Cost", format="%.0f"),
-                "tech_components_cost": st.column_config.NumberColumn("Tech Components Cost", format="%.0f"),
-                "energy_sources_cost": st.column_config.NumberColumn("Energy Sources Cost", format="%.0f"),
-                "biomatter_cost": st.column_config.NumberColumn("Biomatter Cost", format="%.0f"),
-                "chemicals_cost": st.column_config.NumberColumn("Chemicals Cost", format="%.0f")
-            }
+        st.session_state["item_editor_ids"] = df["item_id"].to_numpy()
         
         # Display resource costs table if toggle is enabled
         if show_resource_costs:
             st.subheader("💰 Resource Costs Breakdown")
-            resource_costs = calculate_resource_costs(filtered_items)
-            cost_df = pd.DataFrame(resource_costs)
+            # One matrix pass per catalog version and filter; the table, the
+            # totals and the summary chart below all read from it
+            breakdown_key = (store, store.version, active_category)
+            cached = st.session_state.get("resource_cost_breakdown")
+            if cached is None or cached[0] != breakdown_key:
+                cached = (breakdown_key, ResourceCostBreakdown(store, filtered_positions))
+                st.session_state["resource_cost_breakdown"] = cached
+            breakdown = cached[1]
+            cost_df = breakdown.frame
             
             # Format column names for better display
             column_config = {
@@ -550,7 +880,7 @@ with tab1:
             # Add a summary of total resource costs
             if not cost_df.empty:
                 st.subheader("Resource Cost Summary")
-                total_costs = cost_df.drop(["item_name", "category", "calculated_cost"], axis=1).sum()
+                total_costs = breakdown.totals
                 
                 # Create bar chart of total resource costs
                 resource_names = [
@@ -562,6 +892,7 @@ with tab1:
                     "energy_sources_cost", "biomatter_cost", "chemicals_cost"
                 ]
                 
+                go = plotly_go()
                 fig = go.Figure(data=[
                     go.Bar(
                         x=resource_names,
@@ -577,25 +908,61 @@ with tab1:
                 )
                 st.plotly_chart(fig, use_container_width=True)
         
-        # Update costs if data was edited
-        if not edited_df.equals(df):
-            updated_items = []
-            for _, row in edited_df.iterrows():
-                item = row.to_dict()
-                item['calculated_cost'] = calculate_cost(item['success_rate'], item['efficiency'], st.session_state["cost_max_value"])
-                updated_items.append(item)
-                
-            # Find the original items in the full list and update them
-            for updated_item in updated_items:
-                for i, original_item in enumerate(st.session_state["items"]):
-                    if original_item.get("item_name") == updated_item.get("item_name"):
-                        st.session_state["items"][i] = updated_item
-                        break
+        # Items whose resource shares drifted off 100% (imports, table edits)
+        with st.expander("🧮 Resource Share Repair"):
+            st.caption("Finds every item in the catalog (regardless of the category filter) whose resource "
+                       "shares don't add up to 100% and repairs them all in one write.")
+            repair_col1, repair_col2, repair_col3 = st.columns(3)
+            with repair_col1:
+                repair_strategy = st.selectbox("Strategy", list(REPAIR_STRATEGIES),
+                                               format_func=REPAIR_STRATEGIES.__getitem__, key="repair_strategy")
+            with repair_col2:
+                repair_tolerance = st.number_input("Tolerance (% points)", min_value=MIN_TOLERANCE, max_value=10.0,
+                                                   value=DEFAULT_TOLERANCE, step=0.1, format="%.3f",
+                                                   key="repair_tolerance")
+            with repair_col3:
+                repair_step = st.selectbox("Step size (%)", [0.5, 1.0, 2.5, 5.0, 10.0, 20.0], index=3,
+                                           disabled=repair_strategy != "snap", key="repair_step")
             
-            # Auto-save after updating items
-            auto_save_data()
-                
-            st.rerun()
+            # One vectorized pass per catalog version and settings
+            repair_key = (store, store.version, repair_strategy, repair_tolerance, repair_step)
+            cached = st.session_state.get("resource_repair")
+            if cached is None or cached[0] != repair_key:
+                cached = (repair_key, plan_repair(store, repair_strategy, repair_tolerance, repair_step))
+                st.session_state["resource_repair"] = cached
+            repair = cached[1]
+            
+            if len(repair.unrepairable):
+                st.warning(f"{len(repair.unrepairable):,} items have no resource shares at all and are left as they are.")
+            if len(repair.positions):
+                st.write(f"**{len(repair.positions):,} items** don't add up to 100% "
+                         f"(±{repair_tolerance:g}). Preview of the first 100:")
+                shown = repair.positions[:100]
+                preview = pd.DataFrame({
+                    "item_name": store.column("item_name", shown),
+                    "category": [store.value(position, "category") for position in shown],
+                    "total": repair.before[:100].sum(axis=1).round(2),
+                })
+                for i, field in enumerate(RESOURCE_FIELDS):
+                    preview[field] = [f"{before:.4g} → {after:.4g}" for before, after
+                                      in zip(repair.before[:100, i], repair.after[:100, i])]
+                st.dataframe(preview, use_container_width=True, hide_index=True)
+                if st.button(f"Repair {len(repair.positions):,} items", key="apply_resource_repair"):
+                    try:
+                        _, applied = catalog.repair_resources(repair_strategy, repair_tolerance, repair_step,
+                                                              base_version)
+                        st.session_state["catalog_notice"] = (
+                            f"Repaired the resource shares of {len(applied.positions):,} items "
+                            f"({REPAIR_STRATEGIES[repair_strategy].lower()})."
+                        )
+                        auto_save_data()
+                    except CatalogConflict:
+                        st.session_state["catalog_notice"] = (
+                            "⚠️ The catalog was replaced by another session in the meantime; nothing was repaired."
+                        )
+                    st.rerun()
+            elif not len(repair.unrepairable):
+                st.success("✅ The resource shares of every item add up to 100%.")
     else:
         st.info("No items added yet. Use the form above to add your first item.")
 
@@ -605,21 +972,17 @@ with tab1:
     
     with col_overview:
         st.subheader("📊 Overview of All Items")
-        if st.session_state["items"]:
-            df = pd.DataFrame(filtered_items)
+        if len(store):
+            df = analysis_frame()
 
             # Main scatter plot - Efficiency vs Success Rate
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=df['success_rate'],
-                y=df['efficiency'],
-                mode='markers+text',
-                text=df['item_name'],
-                textposition="top center",
+            # The landing chart, always shown
+            fig = plotly_go().Figure()
+            add_item_scatter(
+                fig, df, 'success_rate', 'efficiency', 'calculated_cost',
                 marker=dict(
                     # Use a fixed marker size so points don't grow/shrink with cost
                     size=12,
-                    color=df['calculated_cost'],
                     colorscale='Viridis',
                     showscale=True,
                     colorbar=dict(title="Calculated Cost"),
@@ -631,8 +994,9 @@ with tab1:
                              "Efficiency: %{y:.1f}%<br>" +
                              "Cost: %{marker.color:.0f}<br>" +
                              "<extra></extra>",
-                name="Items"
-            ))
+                x_range=(0, 105),
+                y_range=(0, 105)
+            )
             fig.update_layout(
                 title={'text': "Efficiency vs Success Rate", 'x': 0.5, 'xanchor': 'center'},
                 xaxis_title="Success Rate (%)",
@@ -654,8 +1018,8 @@ with tab1:
             # Summary statistics
             metrics_col1, metrics_col2 = st.columns(2)
             with metrics_col1:
-                if len(filtered_items) != len(st.session_state["items"]):
-                    st.metric("Filtered Items", f"{len(df)} of {len(st.session_state['items'])}")
+                if filtered_count != len(store):
+                    st.metric("Filtered Items", f"{len(df)} of {len(store)}")
                 else:
                     st.metric("Total Items", len(df))
                 st.metric("Avg Success Rate", f"{df['success_rate'].mean():.1f}%")
@@ -664,7 +1028,7 @@ with tab1:
                 st.metric("Avg Cost", f"{df['calculated_cost'].mean():.0f}")
             
             # Max cost indicator
-            st.info(f"💰 **Cost-Formula: (success × efficiency × {st.session_state['cost_max_value']})")
+            st.info(f"💰 **Cost formula:** `{current_formula}` (cost_max = {catalog.cost_max})")
         else:
             st.info("No items to visualize yet. Add your first item using the form on the right!")
 
@@ -749,13 +1113,12 @@ with tab1:
             # Use UUID if item name is empty
             item_name = new_item_name if new_item_name else 'no-name-' + str(uuid.uuid4())
             if abs(resource_sum - 100.0) <= 0.1:
-                calculated_cost = calculate_cost(new_success_rate, new_efficiency, st.session_state["cost_max_value"])
+                # calculated_cost is filled in by the catalog's cost formula
                 new_item = {
                     "item_name": item_name,
                     "category": new_category,
                     "success_rate": new_success_rate,
                     "efficiency": new_efficiency,
-                    "calculated_cost": calculated_cost,
                     "metals_alloys": new_metals,
                     "synthetic_materials": new_synthetic,
                     "tech_components": new_tech,
@@ -763,7 +1126,7 @@ with tab1:
                     "biomatter": new_bio,
                     "chemicals": new_chemicals
                 }
-                st.session_state["items"].append(new_item)
+                catalog.add_items([new_item])
                 st.success(f"Added {item_name}!")
                 
                 # Auto-save after adding new item
@@ -777,8 +1140,8 @@ with tab1:
 with tab2:
     st.header("Balance Analysis")
     
-    if st.session_state["items"]:
-        df = pd.DataFrame(filtered_items)
+    if len(store):
+        df = analysis_frame()
         
         # Resource composition analysis
         st.subheader("Resource Composition Analysis")
@@ -787,25 +1150,65 @@ with tab2:
         resource_names = ['Metals & Alloys', 'Synthetic Materials', 'Tech Components',
                          'Energy Sources', 'Biomatter', 'Chemicals']
         
-        fig2 = go.Figure()
         colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
-        
-        for i, (col, name) in enumerate(zip(resource_cols, resource_names)):
-            fig2.add_trace(go.Bar(
-                x=df['item_name'],
-                y=df[col],
-                name=name,
-                marker_color=colors[i % len(colors)]
-            ))
-            
-        fig2.update_layout(
-            barmode='stack',
-            title="Resource Distribution by Item",
-            xaxis_title="Items",
-            yaxis_title="Percentage (%)",
-            height=400,
-            template="plotly_white"
-        )
+
+        def resource_bar_figure(bars, x, title, xaxis_title, hovertext=None):
+            go = plotly_go()
+            fig = go.Figure()
+            for i, (col, name) in enumerate(zip(resource_cols, resource_names)):
+                fig.add_trace(go.Bar(
+                    x=bars[x],
+                    y=bars[col],
+                    name=name,
+                    hovertext=hovertext,
+                    marker_color=colors[i % len(colors)]
+                ))
+            fig.update_layout(
+                barmode='stack',
+                title=title,
+                xaxis_title=xaxis_title,
+                yaxis_title="Percentage (%)",
+                height=400,
+                template="plotly_white"
+            )
+            return fig
+
+        def item_bars(items, title):
+            if len(items) > RESOURCE_BAR_ITEMS:
+                st.caption(f"Showing the first {RESOURCE_BAR_ITEMS} of {len(items)} items.")
+                items = items.head(RESOURCE_BAR_ITEMS)
+            st.plotly_chart(resource_bar_figure(items, 'item_name', title, "Items"), use_container_width=True)
+
+        # One bar per item for small selections; otherwise one bar per bin
+        # (mean resource mix, computed here), with a drill-down into a bin
+        bar_groups = {"Item": None, "Category": "category", "Cost quantile": "cost",
+                      "Dominant resource": "resource"}
+        if show_chart("resource composition chart", "show_resource_chart"):
+            bar_by = st.radio(
+                "Resource mix per",
+                options=list(bar_groups),
+                index=0 if len(df) <= RESOURCE_BAR_ITEMS else 1,
+                horizontal=True,
+                key="resource_bar_by"
+            )
+            if bar_groups[bar_by] is None:
+                item_bars(df, "Resource Distribution by Item")
+            else:
+                mix = ResourceMix(store, filtered_positions, by=bar_groups[bar_by])
+                bins = mix.table.copy()
+                if bar_groups[bar_by] == "resource":
+                    bins['bin'] = bins['bin'].map(dict(zip(resource_cols, resource_names)))
+                st.plotly_chart(resource_bar_figure(
+                    bins, 'bin', f"Average Resource Distribution by {bar_by}", bar_by,
+                    hovertext=[f"{count} items" for count in bins['count']]
+                ), use_container_width=True)
+
+                drill_label = st.selectbox("Show the items of", options=["—"] + list(bins['bin']),
+                                           key="resource_bar_drill")
+                if drill_label in list(bins['bin']):
+                    raw_label = mix.table['bin'].iat[list(bins['bin']).index(drill_label)]
+                    item_bars(store.view_frame(mix.positions(raw_label)),
+                              f"Resource Distribution: {drill_label}")
         
         # Balance insights
         col1, col2 = st.columns(2)
@@ -813,20 +1216,22 @@ with tab2:
         with col1:
             st.subheader("Top Performers")
             if not df.empty:
-                best_efficiency = df.loc[df['efficiency'].idxmax()]
-                best_success = df.loc[df['success_rate'].idxmax()]
-                best_value = df.loc[(df['success_rate'] + df['efficiency'] - df['calculated_cost']/1000).idxmax()]
+                best = balance_report().top_performers
+                best_efficiency = df.loc[best['efficiency']]
+                best_success = df.loc[best['success_rate']]
+                best_value = df.loc[best['power_level']]
                 
                 st.metric("Most Efficient Item", best_efficiency['item_name'], f"{best_efficiency['efficiency']:.1f}%")
                 st.metric("Highest Success Rate", best_success['item_name'], f"{best_success['success_rate']:.1f}%")
-                st.metric("Best Value", best_value['item_name'], f"Score: {(best_value['success_rate'] + best_value['efficiency'] - best_value['calculated_cost']/1000):.1f}")
+                st.metric("Best Value", best_value['item_name'], f"Score: {best_value['power_level']:.1f}")
             
                 # Category distribution
                 st.subheader("Category Distribution")
-                if 'category' in df.columns:
-                    category_counts = df['category'].value_counts()
-                    fig_cat = go.Figure(data=[go.Pie(labels=category_counts.index, 
-                                                    values=category_counts.values, 
+                if 'category' in df.columns and show_chart("category distribution", "show_category_pie"):
+                    go = plotly_go()
+                    counts = category_counts()
+                    fig_cat = go.Figure(data=[go.Pie(labels=counts.index, 
+                                                    values=counts.values, 
                                                     hole=.3)])
                     fig_cat.update_layout(height=300)
                     st.plotly_chart(fig_cat, use_container_width=True)
@@ -834,35 +1239,30 @@ with tab2:
         with col2:
             st.subheader("Balance Recommendations")
             if not df.empty:
+                report = balance_report()
+
                 # Identify overpowered items
-                overpowered = df[(df['success_rate'] > 80) & (df['efficiency'] > 80) & (df['calculated_cost'] < 60000)]
-                if not overpowered.empty:
-                    st.warning(f"⚠️ Potentially overpowered: {', '.join(overpowered['item_name'])}")
+                overpowered_items = df.loc[report.overpowered]
+                if not overpowered_items.empty:
+                    st.warning(f"⚠️ Potentially overpowered: {', '.join(overpowered_items['item_name'])}")
                 
                 # Identify underpowered items
-                underpowered = df[(df['success_rate'] < 40) & (df['efficiency'] < 40) & (df['calculated_cost'] > 20000)]
-                if not underpowered.empty:
-                    st.info(f"💡 Consider buffing: {', '.join(underpowered['item_name'])}")
+                underpowered_items = df.loc[report.underpowered]
+                if not underpowered_items.empty:
+                    st.info(f"💡 Consider buffing: {', '.join(underpowered_items['item_name'])}")
                 
                 # Resource diversity
-                avg_resource_usage = df[resource_cols].mean()
-                underused_resources = avg_resource_usage[avg_resource_usage < 10].index
-                if len(underused_resources) > 0:
-                    underused_names = [resource_names[resource_cols.index(col)] for col in underused_resources]
+                underused = report.underused_resources
+                if len(underused) > 0:
+                    underused_names = [resource_names[resource_cols.index(col)] for col in underused]
                     st.info(f"🔍 Underused resources: {', '.join(underused_names)}")
                 
                 # Category balance analysis
                 if 'category' in df.columns:
                     # Group by category and compute averages
-                    cat_stats = df.groupby('category').agg({
-                        'success_rate': 'mean',
-                        'efficiency': 'mean',
-                        'calculated_cost': 'mean'
-                    }).reset_index()
+                    cat_stats = category_stats()
                     
                     # Find strongest and weakest categories
-                    cat_stats['power_level'] = cat_stats['success_rate'] + cat_stats['efficiency'] - cat_stats['calculated_cost']/1000
-                    
                     if len(cat_stats) > 1:
                         strongest = cat_stats.loc[cat_stats['power_level'].idxmax()]
                         weakest = cat_stats.loc[cat_stats['power_level'].idxmin()]
@@ -871,75 +1271,73 @@ with tab2:
                         st.info(f"💪 Strongest category: **{strongest['category']}** (Power: {strongest['power_level']:.1f})")
                         st.info(f"⚖️ Weakest category: **{weakest['category']}** (Power: {weakest['power_level']:.1f})")
                         
-                        # Display category comparison
-                        fig_cat_comp = go.Figure()
-                        fig_cat_comp.add_trace(go.Bar(
-                            x=cat_stats['category'],
-                            y=cat_stats['power_level'],
-                            marker_color='darkblue'
-                        ))
-                        fig_cat_comp.update_layout(
-                            title="Category Power Levels",
-                            xaxis_title="Category",
-                            yaxis_title="Power Level",
-                            height=300
-                        )
-                        st.plotly_chart(fig_cat_comp, use_container_width=True)
+                        if show_chart("category power levels", "show_category_power"):
+                            # Display category comparison
+                            go = plotly_go()
+                            fig_cat_comp = go.Figure()
+                            fig_cat_comp.add_trace(go.Bar(
+                                x=cat_stats['category'],
+                                y=cat_stats['power_level'],
+                                marker_color='darkblue'
+                            ))
+                            fig_cat_comp.update_layout(
+                                title="Category Power Levels",
+                                xaxis_title="Category",
+                                yaxis_title="Power Level",
+                                height=300
+                            )
+                            st.plotly_chart(fig_cat_comp, use_container_width=True)
     else:
         st.info("Add some items in the Data Input tab to see balance analysis.")
 
 with tab3:
     st.header("Advanced Metrics")
     
-    if st.session_state["items"]:
-        df = pd.DataFrame(filtered_items)
+    if len(store):
+        df = analysis_frame()
         
         # Cost vs Performance Analysis
         st.subheader("Cost vs Performance Analysis")
         
-        fig3 = go.Figure()
+        if show_chart("cost vs performance chart", "show_cost_performance"):
+            go = plotly_go()
+            fig3 = go.Figure()
         
-        # Create a performance score (combination of success rate and efficiency)
-        df['performance_score'] = (df['success_rate'] + df['efficiency']) / 2
-        
-        fig3.add_trace(go.Scatter(
-            x=df['calculated_cost'],
-            y=df['performance_score'],
-            mode='markers+text',
-            text=df['item_name'],
-            textposition="top center",
-            marker=dict(
-                size=15,
-                color=df['performance_score'],
-                colorscale='RdYlGn',
-                showscale=True,
-                colorbar=dict(title="Performance Score")
-            ),
-            name="Items"
-        ))
+            # performance_score (combination of success rate and efficiency) is
+            # one of the derived columns of the analysis frame
+            add_item_scatter(
+                fig3, df, 'calculated_cost', 'performance_score', 'performance_score',
+                marker=dict(
+                    size=15,
+                    colorscale='RdYlGn',
+                    showscale=True,
+                    colorbar=dict(title="Performance Score")
+                ),
+                rank_by='performance_score'
+            )
         
-        # Add ideal balance line (theoretical)
-        x_line = np.linspace(0, 1, 100)
-        y_ideal = x_line * 100  # Ideal: cost should scale with performance
+            # Add ideal balance line (theoretical)
+            x_line = np.linspace(0, 1, 100)
+            y_ideal = x_line * 100  # Ideal: cost should scale with performance
         
-        fig3.add_trace(go.Scatter(
-            x=x_line,
-            y=y_ideal,
-            mode='lines',
-            name='Ideal Balance Line',
-            line=dict(dash='dash', color='red', width=2),
-            opacity=0.7
-        ))
+            fig3.add_trace(go.Scatter(
+                x=x_line,
+                y=y_ideal,
+                mode='lines',
+                name='Ideal Balance Line',
+                line=dict(dash='dash', color='red', width=2),
+                opacity=0.7
+            ))
         
-        fig3.update_layout(
-            title="Cost vs Performance Balance",
-            xaxis_title="Calculated Cost",
-            yaxis_title="Performance Score (%)",
-            height=500,
-            template="plotly_white"
-        )
+            fig3.update_layout(
+                title="Cost vs Performance Balance",
+                xaxis_title="Calculated Cost",
+                yaxis_title="Performance Score (%)",
+                height=500,
+                template="plotly_white"
+            )
         
-        st.plotly_chart(fig3, use_container_width=True)
+            st.plotly_chart(fig3, use_container_width=True)
         
         # Statistical analysis
         col1, col2, col3 = st.columns(3)
@@ -949,81 +1347,78 @@ with tab3:
             st.metric("Cost Range", f"{df['calculated_cost'].min():.0f} - {df['calculated_cost'].max():.0f}")
             
         with col2:
-            correlation = df['calculated_cost'].corr(df['performance_score'])
-            st.metric("Cost-Performance Correlation", f"{correlation:.3f}")
-            balance_score = 100 - abs(correlation - 0.8) * 100  # Ideal correlation is ~0.8
-            st.metric("Balance Score", f"{max(balance_score, 0):.0f}/100")
+            report = balance_report()
+            st.metric("Cost-Performance Correlation", f"{report.correlation:.3f}")
+            # Ideal correlation is ~0.8
+            st.metric("Balance Score", f"{report.balance_score:.0f}/100")
             
         with col3:
-            if 'category' in df.columns and len(df['category'].unique()) > 1:
+            counts = category_counts()
+            if 'category' in df.columns and len(counts) > 1:
                 # Count items per category
-                category_counts = df['category'].value_counts()
-                st.metric("Most Common Category", category_counts.index[0], f"{category_counts.values[0]} items")
-                st.metric("Categories Present", f"{len(category_counts)} of {len(CATEGORIES)}")
+                st.metric("Most Common Category", counts.index[0], f"{counts.values[0]} items")
+                st.metric("Categories Present", f"{len(counts)} of {len(CATEGORIES)}")
             else:
                 st.metric("Items Analyzed", f"{len(df)}")
-                if len(filtered_items) != len(st.session_state["items"]):
-                    st.metric("Total Items", f"{len(filtered_items)} of {len(st.session_state['items'])}")
+                if filtered_count != len(store):
+                    st.metric("Total Items", f"{filtered_count} of {len(store)}")
                 else:
-                    st.metric("Total Items", f"{len(st.session_state['items'])}")
+                    st.metric("Total Items", f"{len(store)}")
             
         # Add category-based analysis if categories exist
-        if 'category' in df.columns and len(df['category'].unique()) > 1:
+        if 'category' in df.columns and len(counts) > 1:
             st.subheader("Category Performance Analysis")
             
             # Create category comparison dataframe
-            cat_stats = df.groupby('category').agg({
-                'success_rate': 'mean', 
-                'efficiency': 'mean',
-                'calculated_cost': 'mean',
-                'performance_score': 'mean'
-            }).reset_index()
+            cat_stats = category_stats()
             
-            # Bar chart comparing categories
-            fig_cat = go.Figure()
+            if show_chart("category performance chart", "show_category_performance"):
+                # Bar chart comparing categories
+                go = plotly_go()
+                fig_cat = go.Figure()
             
-            # Add performance score bars
-            fig_cat.add_trace(go.Bar(
-                x=cat_stats['category'],
-                y=cat_stats['performance_score'],
-                name='Performance Score',
-                marker_color='darkblue'
-            ))
+                # Add performance score bars
+                fig_cat.add_trace(go.Bar(
+                    x=cat_stats['category'],
+                    y=cat_stats['performance_score'],
+                    name='Performance Score',
+                    marker_color='darkblue'
+                ))
             
-            # Add cost line (on secondary y-axis)
-            fig_cat.add_trace(go.Scatter(
-                x=cat_stats['category'],
-                y=cat_stats['calculated_cost'],
-                name='Average Cost',
-                mode='lines+markers',
-                marker=dict(color='red'),
-                yaxis='y2'
-            ))
+                # Add cost line (on secondary y-axis)
+                fig_cat.add_trace(go.Scatter(
+                    x=cat_stats['category'],
+                    y=cat_stats['calculated_cost'],
+                    name='Average Cost',
+                    mode='lines+markers',
+                    marker=dict(color='red'),
+                    yaxis='y2'
+                ))
             
-            fig_cat.update_layout(
-                title='Category Performance vs Cost',
-                xaxis_title='Category',
-                yaxis_title='Performance Score',
-                yaxis2=dict(
-                    title='Cost',
-                    overlaying='y',
-                    side='right'
-                ),
-                legend=dict(
-                    orientation='h',
-                    yanchor='bottom',
-                    y=1.02,
-                    xanchor='right',
-                    x=1
-                ),
-                height=400
-            )
+                fig_cat.update_layout(
+                    title='Category Performance vs Cost',
+                    xaxis_title='Category',
+                    yaxis_title='Performance Score',
+                    yaxis2=dict(
+                        title='Cost',
+                        overlaying='y',
+                        side='right'
+                    ),
+                    legend=dict(
+                        orientation='h',
+                        yanchor='bottom',
+                        y=1.02,
+                        xanchor='right',
+                        x=1
+                    ),
+                    height=400
+                )
             
-            st.plotly_chart(fig_cat, use_container_width=True)
+                st.plotly_chart(fig_cat, use_container_width=True)
             
             # Show detailed stats in table
             st.dataframe(
-                cat_stats.round({
+                cat_stats.drop(columns='power_level').round({
                     'success_rate': 1, 
                     'efficiency': 1, 
                     'calculated_cost': 0,
@@ -1033,12 +1428,154 @@ with tab3:
                 hide_index=True
             )
             # Calculate how many items are above/below ideal line
-            expected_performance = df['calculated_cost'] * 100
-            overperforming = (df['performance_score'] > expected_performance * 1.1).sum()
-            underperforming = (df['performance_score'] < expected_performance * 0.9).sum()
+            overperforming, underperforming = report.overperforming, report.underperforming
             
             st.metric("Overperforming Items", overperforming)
             st.metric("Underperforming Items", underperforming)
+        
+        # What-if sweep: score many Max Cost / buff scenarios in one batch
+        st.subheader("What-if Sweep")
+        st.caption("Scores the (filtered) catalog for every combination of Max Cost and success/efficiency "
+                   "multipliers of one category, without changing any item.")
+        with st.form("whatif_sweep"):
+            sweep_col1, sweep_col2 = st.columns(2)
+            with sweep_col1:
+                sweep_cost_from = st.number_input("Max Cost from", min_value=1, max_value=10_000_000,
+                                                  value=max(1, int(catalog.cost_max // 2)), step=1000)
+                sweep_cost_to = st.number_input("Max Cost to", min_value=1, max_value=10_000_000,
+                                                value=int(catalog.cost_max * 2), step=1000)
+                sweep_cost_steps = st.number_input("Max Cost steps", min_value=1, max_value=100, value=10)
+            with sweep_col2:
+                sweep_category = st.selectbox("Buffed category", ["All items"] + list(category_counts().index))
+                sweep_success = st.slider("Success rate multiplier", 0.0, 3.0, (0.8, 1.2), step=0.05)
+                sweep_efficiency = st.slider("Efficiency multiplier", 0.0, 3.0, (1.0, 1.0), step=0.05)
+                sweep_multiplier_steps = st.number_input("Multiplier steps", min_value=1, max_value=25, value=5)
+            run_sweep = st.form_submit_button("Run sweep")
+        
+        def multiplier_values(bounds):
+            low, high = bounds
+            return np.linspace(low, high, sweep_multiplier_steps if high > low else 1).round(4)
+        
+        scenarios = scenario_grid(
+            np.linspace(sweep_cost_from, sweep_cost_to, sweep_cost_steps if sweep_cost_to != sweep_cost_from else 1),
+            multiplier_values(sweep_success),
+            multiplier_values(sweep_efficiency),
+            category=None if sweep_category == "All items" else sweep_category
+        )
+        sweep_key = (store, store.version, active_category, catalog.formula,
+                     tuple(sorted(catalog.formula_parameters.items())))
+        if run_sweep:
+            if len(scenarios) > WHATIF_MAX_SCENARIOS:
+                st.warning(f"{len(scenarios)} scenarios requested; reduce the steps to at most "
+                           f"{WHATIF_MAX_SCENARIOS} scenarios.")
+            else:
+                sweep = Sweep(df, catalog.formula, catalog.formula_parameters)
+                start = time.perf_counter()
+                results = sweep.run(scenarios)
+                st.session_state["whatif_results"] = (sweep_key, sweep, results, time.perf_counter() - start)
+        
+        cached_sweep = st.session_state.get("whatif_results")
+        if cached_sweep is not None and cached_sweep[0] == sweep_key:
+            _, sweep, results, seconds = cached_sweep
+            st.caption(f"{len(results)} scenarios over {len(df):,} items in {seconds:.2f} s")
+            labels = [f"S×{s:g} E×{e:g}" for s, e in zip(results['success_multiplier'],
+                                                         results['efficiency_multiplier'])]
+            power_columns = [column for column in results.columns if column.startswith('power: ')]
+            metric_names = {"Balance Score": 'balance_score', "Overpowered Items": 'overpowered',
+                            "Underpowered Items": 'underpowered', "Mean Cost": 'mean_cost'}
+            metric_names.update({f"Power of {column[7:]}": column for column in power_columns})
+            heatmap_metric = st.selectbox("Heatmap metric", list(metric_names), key="whatif_metric")
+            grid = results.assign(buff=labels).pivot_table(
+                index='buff', columns='cost_max', values=metric_names[heatmap_metric], sort=False
+            )
+            go = plotly_go()
+            fig_sweep = go.Figure(go.Heatmap(
+                z=grid.to_numpy(), x=grid.columns, y=grid.index,
+                colorscale='RdYlGn' if heatmap_metric == "Balance Score" else 'Viridis',
+                colorbar=dict(title=heatmap_metric)
+            ))
+            fig_sweep.update_layout(
+                title=f"{heatmap_metric} per Scenario ({sweep_category})",
+                xaxis_title="Max Cost", yaxis_title="Success × / Efficiency × multiplier",
+                height=400, template="plotly_white"
+            )
+            st.plotly_chart(fig_sweep, use_container_width=True)
+            st.dataframe(results.round(3), use_container_width=True, hide_index=True)
+            
+            # Flagged items of one scenario
+            scenario_labels = [f"Max Cost {c:g}, {label}" for c, label in zip(results['cost_max'], labels)]
+            picked = st.selectbox("Flagged items in scenario", range(len(results)),
+                                  format_func=scenario_labels.__getitem__, key="whatif_scenario")
+            over, under = sweep.flagged(results.iloc[picked])
+            for title, positions in (("Overpowered", over), ("Underpowered", under)):
+                names = df['item_name'].iloc[positions[:20]].tolist()
+                more = f" and {len(positions) - 20} more" if len(positions) > 20 else ""
+                st.write(f"**{title} ({len(positions)}):** {', '.join(names) or '-'}{more}")
+            
+        # Monte Carlo usage simulation: success_rate is the chance per use,
+        # efficiency the value a successful use delivers
+        st.subheader("Usage Simulation")
+        st.caption("Uses every (filtered) item many times, with success rate as the chance of a successful use "
+                   "and efficiency as the value it delivers, and reports the value per unit of cost. "
+                   "Bands are the 5th-95th percentile over sessions of uses.")
+        with st.form("usage_simulation"):
+            sim_col1, sim_col2, sim_col3 = st.columns(3)
+            with sim_col1:
+                sim_trials = st.number_input("Uses per item", min_value=100, max_value=1_000_000,
+                                             value=10_000, step=1000)
+            with sim_col2:
+                sim_session = st.selectbox("Uses per session", [10, 50, 100, 500, 1000], index=2)
+            with sim_col3:
+                sim_seed = st.number_input("Seed", min_value=0, value=0, step=1)
+            run_simulation = st.form_submit_button("Run simulation")
+        
+        simulation_key = (store, store.version, active_category)
+        if run_simulation:
+            # Round up to whole sessions
+            sim_trials = -(-int(sim_trials) // sim_session) * sim_session
+            if sim_trials * len(df) > SIMULATION_MAX_USES:
+                st.warning(f"{sim_trials * len(df):,} uses requested; the limit is {SIMULATION_MAX_USES:,}. "
+                           f"Reduce the uses per item or filter a category.")
+            else:
+                start = time.perf_counter()
+                simulation = simulate(df, sim_trials, sim_session, int(sim_seed))
+                st.session_state["simulation_results"] = (simulation_key, simulation,
+                                                          time.perf_counter() - start)
+        
+        cached_simulation = st.session_state.get("simulation_results")
+        if cached_simulation is not None and cached_simulation[0] == simulation_key:
+            _, simulation, seconds = cached_simulation
+            st.caption(f"{simulation.trials:,} uses of {len(df):,} items (seed {simulation.seed}) "
+                       f"in {seconds:.2f} s")
+            sim_categories = simulation.categories
+            go = plotly_go()
+            fig_sim = go.Figure(go.Bar(
+                x=sim_categories['category'],
+                y=sim_categories['value_per_cost'],
+                error_y=dict(
+                    type='data', symmetric=False,
+                    array=sim_categories['p95'] - sim_categories['value_per_cost'],
+                    arrayminus=sim_categories['value_per_cost'] - sim_categories['p5']
+                ),
+                marker_color='lightseagreen'
+            ))
+            fig_sim.update_layout(
+                title="Simulated Value per Unit of Cost by Category (5th-95th percentile)",
+                xaxis_title="Category", yaxis_title="Value per cost", yaxis_tickformat='.2e',
+                height=400, template="plotly_white"
+            )
+            st.plotly_chart(fig_sim, use_container_width=True)
+            st.dataframe(sim_categories, use_container_width=True, hide_index=True,
+                         column_config={field: st.column_config.NumberColumn(format="%.3e")
+                                        for field in ('value_per_cost', 'variance', 'p5', 'p50', 'p95')})
+            
+            sim_items = df[['item_name', 'category', 'success_rate', 'efficiency', 'calculated_cost']] \
+                .join(simulation.items).sort_values('value_per_cost', ascending=False)
+            for title, rows in (("Highest", sim_items.head(20)), ("Lowest", sim_items.dropna().tail(20)[::-1])):
+                st.write(f"**{title} simulated value per cost**")
+                st.dataframe(rows, use_container_width=True, hide_index=True,
+                             column_config={field: st.column_config.NumberColumn(format="%.3e")
+                                            for field in ('value_per_cost', 'variance', 'p5', 'p50', 'p95')})
             
     else:
         st.info("Add some items in the Data Input tab to see advanced metrics.")
@@ -1051,11 +1588,8 @@ st.sidebar.markdown("Balance your game items using data-driven insights!")
 # Export/Import functionality
 st.sidebar.markdown("### 📁 Data Management")
 if st.sidebar.button("Clear All Items"):
-    st.session_state["items"] = []
-    
-    # Auto-save after clearing (saves empty state)
-    auto_save_data()
-    
+    # Auto-saves after clearing (saves empty state)
+    replace_catalog(ItemStore(categories=CATEGORIES), "All items have been cleared.")
     st.rerun()
 
 if st.sidebar.button("Restore Sample Data"):
@@ -1065,14 +1599,12 @@ if st.sidebar.button("Restore Sample Data"):
 # Load / Save controls
 st.sidebar.markdown("*Local data operations (reads/writes to data.json in app folder)*")
 if st.sidebar.button("Load data.json"):
+    # Let pending background saves reach the disk first
+    get_auto_saver(DATA_FILE).flush(5.0)
     loaded = load_data_file()
     if loaded is not None:
-        st.session_state["items"] = loaded
-        st.success(f"Loaded {len(loaded)} items from file")
-        
-        # Auto-save after loading (to ensure consistency)
-        auto_save_data()
-        
+        # Auto-saves after loading (to ensure consistency)
+        replace_catalog(loaded, f"Loaded {len(loaded)} items from file")
         st.rerun()
     else:
         st.error(f"Failed to load data file")
@@ -1082,61 +1614,102 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("#### 💾 Data Persistence")
 st.sidebar.info(f"**Current data file:** `{DATA_FILE}`")
 st.sidebar.caption("Data is auto-saved when you make changes!")
+st.sidebar.caption(f"🔗 Shared catalog, version {catalog.version} (all sessions of this server see the same items)")
+
+save_status = get_auto_saver(DATA_FILE).status()
+if save_status.state in ("pending", "saving"):
+    st.sidebar.caption("⏳ Saving changes…")
+elif save_status.state == "failed":
+    st.sidebar.error(f"❌ Auto-save failed: {save_status.error}")
+    # Keep the data in session memory so it isn't lost
+    st.session_state.persistent_items = store.copy()
+elif save_status.state == "saved":
+    st.sidebar.caption(
+        f"✅ Saved {save_status.items} items to `{save_status.path}` "
+        f"{time.time() - save_status.saved_at:.0f}s ago ({save_status.latency * 1000:.0f} ms)"
+    )
 
 if st.sidebar.button("💾 Manual Save"):
-    save_data_file(st.session_state.get("items", []))
+    save_data_file(store)
 
-# Offer downloadable JSON blob as well
+columnar_file = DATA_FILE.with_suffix(COLUMNAR_SUFFIX)
+if st.sidebar.button(f"🗜️ Save columnar copy ({columnar_file.name})",
+                     help="Binary column file that loads memory-mapped; it is picked up on start when newer than the JSON file."):
+    try:
+        # Written to a temp file and renamed, so a store mapped from the old file keeps working
+        save_columnar(store, columnar_file)
+        st.sidebar.success(f"✅ Saved {len(store)} items to {columnar_file}")
+    except Exception as e:
+        st.sidebar.error(f"❌ Could not save {columnar_file}: {e}")
+
+# Offer downloadable JSON blob as well. The payload is only built when asked
+# for and then reused (by every session) until the catalog changes
 st.sidebar.markdown("---")
-st.sidebar.markdown("#### Export JSON")
+st.sidebar.markdown("#### Export JSON / Columnar")
+export_format = st.sidebar.selectbox(
+    "Export format", list(EXPORT_FORMATS),
+    format_func=lambda key: EXPORT_FORMATS[key].label, key="export_format"
+)
 try:
-    json_blob = json.dumps(st.session_state.get("items", []), indent=2, ensure_ascii=False)
-    st.sidebar.download_button("Download items.json", data=json_blob, file_name="items.json", mime="application/json")
+    export_cache = get_export_cache()
+    payload = export_cache.get(store, export_format, build=False)
+    if payload is None and st.sidebar.button("📦 Prepare export"):
+        payload = export_cache.get(store, export_format)
+    if payload is not None:
+        export = EXPORT_FORMATS[export_format]
+        st.sidebar.download_button(
+            f"Download {export.file_name} ({len(payload) / 1024:,.0f} KB)",
+            data=payload, file_name=export.file_name, mime=export.mime
+        )
 except Exception:
     # download_button may fail in some environments; ignore
     pass
 
 # Import external JSON file (uploaded by user)
 st.sidebar.markdown("---")
-st.sidebar.markdown("#### Import JSON File")
-uploaded = st.sidebar.file_uploader("Choose a JSON file to import", type=["json"], key="uploader")
-if uploaded is not None:
+st.sidebar.markdown("#### Import JSON / Columnar File")
+uploaded = st.sidebar.file_uploader("Choose a JSON or .npz file to import", type=["json", "npz"], key="uploader")
+# The uploader keeps returning the file on every run; import each upload once
+upload_id = None if uploaded is None else getattr(uploaded, "file_id", f"{uploaded.name}:{uploaded.size}")
+if uploaded is not None and st.session_state.get("imported_upload") != upload_id:
+    st.session_state["imported_upload"] = upload_id
+    progress = st.sidebar.progress(0.0, "Importing…")
+    rejected_note = st.sidebar.empty()
+    total_bytes = max(uploaded.size, 1)
+
+    def show_import_progress(stats):
+        progress.progress(
+            min(stats.bytes_read / total_bytes, 1.0),
+            f"Importing… {stats.accepted:,} items"
+        )
+        if stats.rejected:
+            rejected_note.caption(f"⚠️ {stats.rejected:,} rows rejected so far")
+
     try:
-        # uploaded is a BytesIO-like object
-        data = json.load(uploaded)
-        if isinstance(data, list):
-            items = data
-        elif isinstance(data, dict) and "items" in data and isinstance(data["items"], list):
-            items = data["items"]
+        # Items are parsed and validated in batches straight into a new store,
+        # so the upload is never held as Python objects in full
+        if uploaded.name.endswith(COLUMNAR_SUFFIX):
+            imported = load_columnar(uploaded, categories=CATEGORIES)
+            stats = ImportStats()
+            stats.accepted = len(imported)
         else:
-            st.error("Uploaded JSON must be an array of items or an object with an 'items' list")
-            items = None
-
-        if items is not None:
-            # Validate each item has required fields and add category if missing
-            valid_items = []
-            for item in items:
-                if isinstance(item, dict) and "item_name" in item:
-                    # If no category is set, default to first category
-                    if "category" not in item:
-                        item["category"] = CATEGORIES[0]
-                    valid_items.append(item)
-            
-            if valid_items:
-                st.session_state["items"] = valid_items
-                st.success(f"Imported {len(valid_items)} items from uploaded file")
-                
-                # Auto-save after importing
-                auto_save_data()
-                
-                st.rerun()
-            else:
-                st.error("No valid items found in the uploaded file")
+            imported, stats = import_items(uploaded, categories=CATEGORIES, on_progress=show_import_progress)
+        progress.empty()
+        if len(imported):
+            message = f"Imported {stats.accepted} items from uploaded file"
+            if stats.rejected:
+                message += f" ({stats.rejected} invalid rows skipped)"
+            # Auto-saves after importing
+            replace_catalog(imported, message)
+            st.rerun()
+        else:
+            st.error("No valid items found in the uploaded file")
     except Exception as e:
-        st.error(f"Failed to parse uploaded JSON: {e}")
+        progress.empty()
+        st.error(f"Failed to parse uploaded file: {e}")
 
 # Show current item count
-if st.session_state["items"]:
-    st.sidebar.info(f"Currently managing {len(st.session_state['items'])} items")
+if len(store):
+    st.sidebar.info(f"Currently managing {len(store)} items")
 else:
     st.sidebar.info("No items loaded")
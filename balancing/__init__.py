@@ -0,0 +1,23 @@
+"""Data and computation layer of the Item Balancing Tool.
+
+Nothing in this package imports Streamlit; app.py is the UI on top of it.
+"""
+from balancing.catalog import CatalogConflict, SharedCatalog
+from balancing.costs import (
+    RESOURCE_COST_FIELDS,
+    CostEngine,
+    ResourceCostBreakdown,
+    calculate_cost,
+    calculate_resource_costs,
+    compute_costs,
+)
+from balancing.engine import BalanceReport, analyze
+from balancing.formulas import CostFormula, FormulaError, compile_formula
+from balancing.store import FLOAT_FIELDS, ITEM_FIELDS, RESOURCE_FIELDS, ItemStore
+
+__all__ = [
+    "FLOAT_FIELDS", "ITEM_FIELDS", "RESOURCE_COST_FIELDS", "RESOURCE_FIELDS",
+    "BalanceReport", "CatalogConflict", "CostEngine", "CostFormula", "FormulaError", "ItemStore",
+    "ResourceCostBreakdown", "SharedCatalog", "analyze", "calculate_cost", "calculate_resource_costs",
+    "compile_formula", "compute_costs",
+]
@@ -0,0 +1,155 @@
+"""Per-category aggregates kept up to date as the catalog changes.
+
+``CategoryAggregates`` follows one ItemStore as a StoreListener and keeps,
+per category code, the item count and the sum and sum of squares of every
+numeric field. Adds, edits and deletes adjust those in time proportional to
+the number of touched rows, and a new Max Cost (a rescale of
+calculated_cost) in time proportional to the number of categories; only
+whole-column writes (a new cost formula, an import) rebuild them from
+the columns. Reading the per-category table is then independent of the
+catalog size.
+"""
+import numpy as np
+import pandas as pd
+
+from balancing.engine import performance_score, power_level
+from balancing.store import FLOAT_FIELDS, StoreListener
+
+AGGREGATE_FIELDS = list(FLOAT_FIELDS)
+_FIELD_INDEX = {field: i for i, field in enumerate(AGGREGATE_FIELDS)}
+
+
+class CategoryAggregates(StoreListener):
+    """Running count, sums and sums of squares per category of one store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.rebuild()
+        store.add_listener(self)
+
+    def detach(self):
+        self.store.remove_listener(self)
+
+    def rebuild(self):
+        """Recompute everything from the store's columns."""
+        store = self.store
+        size = len(store)
+        codes = store.column("category_code")[:size]
+        width = max(len(store.categories), 1)
+        self.counts = np.bincount(codes, minlength=width).astype(np.int64)
+        self.sums = np.zeros((width, len(AGGREGATE_FIELDS)))
+        self.squares = np.zeros((width, len(AGGREGATE_FIELDS)))
+        for i, field in enumerate(AGGREGATE_FIELDS):
+            values = store.column(field)[:size].astype(np.float64)
+            self.sums[:, i] = np.bincount(codes, weights=values, minlength=width)
+            self.squares[:, i] = np.bincount(codes, weights=values * values, minlength=width)
+
+    def _grow(self, code):
+        if code < len(self.counts):
+            return
+        extra = code + 1 - len(self.counts)
+        self.counts = np.r_[self.counts, np.zeros(extra, dtype=np.int64)]
+        self.sums = np.vstack([self.sums, np.zeros((extra, len(AGGREGATE_FIELDS)))])
+        self.squares = np.vstack([self.squares, np.zeros((extra, len(AGGREGATE_FIELDS)))])
+
+    def _apply(self, codes, rows, sign):
+        """Add (sign=1) or remove (sign=-1) ``rows`` (n x fields) under ``codes``."""
+        if len(codes) == 0:
+            return
+        self._grow(int(codes.max()))
+        np.add.at(self.counts, codes, sign)
+        np.add.at(self.sums, codes, sign * rows)
+        np.add.at(self.squares, codes, sign * rows * rows)
+        # Don't leave rounding residue behind in emptied categories
+        empty = codes[self.counts[codes] == 0]
+        self.sums[empty] = 0.0
+        self.squares[empty] = 0.0
+
+    def _rows(self, positions):
+        positions = np.asarray(positions, dtype=np.intp)
+        rows = np.column_stack([
+            self.store.column(field, positions).astype(np.float64) for field in AGGREGATE_FIELDS
+        ])
+        return self.store.column("category_code", positions), rows.reshape(len(positions), -1)
+
+    # ------------------------------------------------------------------
+    # StoreListener hooks
+    # ------------------------------------------------------------------
+    def on_add(self, store, positions):
+        self._apply(*self._rows(positions), 1)
+
+    def on_update(self, store, position, before):
+        codes, new_row = self._rows([position])
+        old_row = new_row.copy()
+        for field, value in before.items():
+            if field in _FIELD_INDEX:
+                # Back to the column dtype, so exactly the stored value is removed
+                old_row[0, _FIELD_INDEX[field]] = FLOAT_FIELDS[field](value or 0.0)
+        old_codes = codes
+        if "category" in before:
+            old_codes = np.array([store.category_code(before["category"])], dtype=codes.dtype)
+        self._apply(old_codes, old_row, -1)
+        self._apply(codes, new_row, 1)
+
+    def on_delete(self, store, positions):
+        self._apply(*self._rows(positions), -1)
+
+    def on_clear(self, store):
+        self.rebuild()
+
+    def on_bulk_change(self, store, fields, positions, before=None):
+        if positions is None or before is None or not set(fields) <= set(before):
+            self.rebuild()
+            return
+        codes = store.column("category_code", positions)
+        for field in fields:
+            i = _FIELD_INDEX.get(field)
+            if i is None:
+                continue
+            old = np.asarray(before[field], dtype=np.float64)
+            new = store.column(field, positions).astype(np.float64)
+            self._grow(int(codes.max()) if len(codes) else 0)
+            np.add.at(self.sums[:, i], codes, new - old)
+            np.add.at(self.squares[:, i], codes, new * new - old * old)
+
+    def on_rescale(self, store, field, factor):
+        i = _FIELD_INDEX[field]
+        self.sums[:, i] *= factor
+        self.squares[:, i] *= factor * factor
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def table(self, category=None):
+        """Per-category count, mean and standard deviation of every field.
+
+        Also includes the means of the derived performance_score and
+        power_level (both linear in the fields). Only categories with items
+        are listed, sorted by name like a groupby; ``category`` restricts the
+        table to one of them.
+        """
+        categories = self.store.categories
+        codes = np.flatnonzero(self.counts[:len(categories)] > 0)
+        if category is not None:
+            codes = codes[[categories[c] == category for c in codes]]
+        codes = np.array(sorted(codes, key=lambda c: categories[c]), dtype=np.intp)
+        counts = self.counts[codes].astype(np.float64)
+        means = self.sums[codes] / counts[:, np.newaxis]
+        variances = self.squares[codes] / counts[:, np.newaxis] - means * means
+        # Sample standard deviation, like pandas' std()
+        corrected = np.where(counts > 1, counts / np.maximum(counts - 1, 1), np.nan)
+        stds = np.sqrt(np.clip(variances, 0, None) * corrected[:, np.newaxis])
+
+        table = pd.DataFrame({
+            "category": [categories[c] for c in codes],
+            "count": self.counts[codes],
+        })
+        for field, i in _FIELD_INDEX.items():
+            table[field] = means[:, i]
+        for field, i in _FIELD_INDEX.items():
+            table[f"{field}_std"] = stds[:, i]
+        success = means[:, _FIELD_INDEX["success_rate"]]
+        efficiency = means[:, _FIELD_INDEX["efficiency"]]
+        table["performance_score"] = performance_score(success, efficiency)
+        table["power_level"] = power_level(success, efficiency, means[:, _FIELD_INDEX["calculated_cost"]])
+        return table
@@ -0,0 +1,349 @@
+"""Storage backends: where the catalog lives on disk.
+
+``JsonBackend`` is the classic data.json file (plus its change journal).
+``SqliteBackend`` keeps items in an indexed SQLite table, writes every store
+change through as a small transaction and can answer filters and aggregates
+with SQL without loading the catalog.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from balancing.engine import power_level
+from balancing.journal import discard_journals, replay_journal
+from balancing.persistence import write_json_atomic
+from balancing.store import FLOAT_FIELDS, ITEM_FIELDS, ItemStore, StoreListener
+
+
+class StorageBackend:
+    """Interface shared by the storage backends.
+
+    ``load``/``save`` move a whole catalog. ``listener`` returns a
+    StoreListener that writes individual changes through, or None if the
+    backend only supports full saves. Backends with ``supports_queries`` also
+    implement ``count``, ``item_ids`` and ``category_stats``.
+    """
+
+    supports_queries = False
+
+    def exists(self):
+        raise NotImplementedError
+
+    def load(self, category=None, categories=None):
+        """Return the catalog (or one category of it) as an ItemStore, or None."""
+        raise NotImplementedError
+
+    def save(self, store):
+        """Replace the stored catalog with ``store``."""
+        raise NotImplementedError
+
+    def listener(self):
+        return None
+
+
+class JsonBackend(StorageBackend):
+    """A JSON data file holding a list of items (or {"items": [...]})."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def exists(self):
+        return self.path.exists()
+
+    def load(self, category=None, categories=None):
+        if not self.path.exists():
+            return None
+        with self.path.open("r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if isinstance(data, dict) and isinstance(data.get("items"), list):
+            data = data["items"]
+        if not isinstance(data, list):
+            raise ValueError(f"{self.path.name} must hold a list of items or {{'items': [...]}}")
+        store = ItemStore.from_records(data, categories=categories)
+        replay_journal(store, self.path)
+        if category is not None:
+            store = ItemStore.from_records(store.to_records(store.filter(category)), categories=categories)
+        return store
+
+    def save(self, store):
+        write_json_atomic(self.path, store.to_records())
+        discard_journals(self.path)
+
+
+# calculated_cost is kept as the store keeps it: a cost factor per row and
+# one cost scale in the meta table (calculated_cost = cost_factor * scale)
+_SQL_NAMES = {"calculated_cost": "cost_factor"}
+_SQL_FIELDS = [_SQL_NAMES.get(field, field) for field in ITEM_FIELDS]
+_COLUMNS = ["item_id", "seq"] + _SQL_FIELDS[1:]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    item_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    {float_columns}
+);
+CREATE INDEX IF NOT EXISTS idx_items_seq ON items (seq);
+CREATE INDEX IF NOT EXISTS idx_items_category ON items (category);
+CREATE INDEX IF NOT EXISTS idx_items_name ON items (item_name);
+CREATE INDEX IF NOT EXISTS idx_items_cost ON items (cost_factor);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+""".format(float_columns=",\n    ".join(
+    f"{_SQL_NAMES.get(field, field)} REAL NOT NULL DEFAULT 0" for field in FLOAT_FIELDS
+))
+
+
+class SqliteBackend(StorageBackend):
+    """Items in an SQLite database (WAL mode, indexed by category, name and cost).
+
+    ``seq`` keeps the catalog order; item_id is the primary key. One
+    connection is shared by all threads and guarded by a lock. The ``meta``
+    table holds the cost scale and records that a catalog was saved, so an
+    emptied catalog is told apart from a database that still has to be
+    filled. A new Max Cost only rewrites the cost scale, never the rows.
+    """
+
+    supports_queries = True
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def exists(self):
+        return self.path.exists()
+
+    def initialized(self):
+        """Whether a catalog (possibly an empty one) was ever saved here."""
+        if not self.path.exists():
+            return False
+        with self._lock:
+            conn = self._connection()
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone():
+                return True
+            # Databases written before the meta row: any row means saved
+            return conn.execute("SELECT 1 FROM items LIMIT 1").fetchone() is not None
+
+    def cost_scale(self):
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM meta WHERE key = 'cost_scale'").fetchone()
+        return float(row[0]) if row else 1.0
+
+    def load(self, category=None, categories=None):
+        if not self.path.exists():
+            return None
+        query = f"SELECT {', '.join(_SQL_FIELDS)} FROM items"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        with self._lock:
+            cursor = self._connection().execute(query + " ORDER BY seq", params)
+            records = [dict(zip(ITEM_FIELDS, row)) for row in cursor]
+            scale = self.cost_scale()
+        # Read in as factors (scale 1), then scaled without touching the rows
+        store = ItemStore.from_records(records, categories=categories)
+        store.set_cost_scale(scale)
+        return store
+
+    def save(self, store):
+        rows = _rows(store)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM items")
+                conn.executemany(_INSERT, rows)
+                _set_meta(conn, "cost_scale", store.cost_scale)
+                _set_meta(conn, "initialized", 1)
+
+    def sync_costs(self, store):
+        """Write the cost scale of ``store`` and every cost factor that differs.
+
+        For a store loaded from here whose costs were recomputed since;
+        returns the number of rows written.
+        """
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute("SELECT item_id, cost_factor FROM items ORDER BY seq").fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            stored = np.array([row[1] for row in rows], dtype=np.float64)
+            positions = store.positions_of(ids)
+            known = positions >= 0
+            factors = store.cost_factors(positions[known])
+            changed = factors != stored[known]
+            with conn:
+                conn.executemany(
+                    "UPDATE items SET cost_factor = ? WHERE item_id = ?",
+                    zip(factors[changed].tolist(), ids[known][changed].tolist())
+                )
+                _set_meta(conn, "cost_scale", store.cost_scale)
+            return int(changed.sum())
+
+    def listener(self):
+        return SqliteWriter(self)
+
+    # ------------------------------------------------------------------
+    # Queries answered by SQLite
+    # ------------------------------------------------------------------
+    def count(self, category=None):
+        with self._lock:
+            if category is None:
+                return self._connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM items WHERE category = ?", (category,)
+            ).fetchone()[0]
+
+    def item_ids(self, category=None):
+        """Ids of the items (of ``category``) in catalog order, as an array."""
+        query = "SELECT item_id FROM items"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY seq", params).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def category_stats(self, category=None):
+        """Per-category item count and mean success_rate, efficiency,
+        calculated_cost, performance_score and power_level, as a DataFrame."""
+        query = """
+            SELECT category,
+                   COUNT(*) AS count,
+                   AVG(success_rate) AS success_rate,
+                   AVG(efficiency) AS efficiency,
+                   AVG(cost_factor) * ? AS calculated_cost,
+                   AVG((success_rate + efficiency) / 2.0) AS performance_score
+            FROM items
+        """
+        with self._lock:
+            params = (self.cost_scale(),)
+            if category is not None:
+                query += " WHERE category = ?"
+                params += (category,)
+            query += " GROUP BY category ORDER BY category"
+            stats = pd.read_sql_query(query, self._connection(), params=params)
+        # Linear in the fields, so the power level of the means is the mean power level
+        stats["power_level"] = power_level(stats["success_rate"], stats["efficiency"], stats["calculated_cost"])
+        return stats
+
+    # ------------------------------------------------------------------
+    # Write-through of single changes
+    # ------------------------------------------------------------------
+    def _execute(self, statement, params=(), many=False):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                if many:
+                    conn.executemany(statement, params)
+                else:
+                    conn.execute(statement, params)
+
+
+_INSERT = f"INSERT OR REPLACE INTO items ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, repr(value)))
+
+
+def _values(store, fields, positions):
+    """Columns of ``fields`` at ``positions`` as stored in SQLite (lists of plain values)."""
+    records = store.to_records(positions)
+    columns = [[r[field] for r in records] for field in fields]
+    if "calculated_cost" in fields:
+        columns[fields.index("calculated_cost")] = store.cost_factors(positions).tolist()
+    return columns
+
+
+def _rows(store, positions=None, first_seq=0):
+    """Return store rows as tuples in _COLUMNS order."""
+    if positions is None:
+        positions = np.arange(len(store))
+    columns = _values(store, ITEM_FIELDS, positions)
+    return [(row[0], first_seq + i) + row[1:] for i, row in enumerate(zip(*columns))]
+
+
+class SqliteWriter(StoreListener):
+    """Writes each store change to SQLite as its own transaction."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def on_add(self, store, positions):
+        with self.backend._lock:
+            next_seq = self.backend._connection().execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM items"
+            ).fetchone()[0]
+            self.backend._execute(_INSERT, _rows(store, positions, next_seq), many=True)
+
+    def on_update(self, store, position, before):
+        self._update(store, [field for field in before if field != "item_id"], [position])
+
+    def on_delete(self, store, positions):
+        ids = store.column("item_id", positions).tolist()
+        self.backend._execute("DELETE FROM items WHERE item_id = ?", [(i,) for i in ids], many=True)
+
+    def on_clear(self, store):
+        self.backend._execute("DELETE FROM items")
+
+    def on_bulk_change(self, store, fields, positions, before=None):
+        if positions is None:
+            positions = np.arange(len(store))
+        self._update(store, [field for field in fields if field != "item_id"], positions)
+
+    def on_rescale(self, store, field, factor):
+        # The rows hold cost factors; only the scale changed
+        with self.backend._lock:
+            conn = self.backend._connection()
+            with conn:
+                _set_meta(conn, "cost_scale", store.cost_scale)
+
+    def _update(self, store, fields, positions):
+        if not fields:
+            return
+        assignments = ", ".join(f"{_SQL_NAMES.get(field, field)} = ?" for field in fields)
+        columns = _values(store, fields + ["item_id"], positions)
+        self.backend._execute(
+            f"UPDATE items SET {assignments} WHERE item_id = ?", list(zip(*columns)), many=True
+        )
+
+
+def migrate_json_to_sqlite(json_path, db_path, categories=None):
+    """One-shot migration of a JSON data file into a new SQLite database.
+
+    Returns the number of migrated items. The JSON file is left in place.
+    """
+    store = JsonBackend(json_path).load(categories=categories)
+    if store is None:
+        return 0
+    backend = SqliteBackend(db_path)
+    try:
+        backend.save(store)
+    finally:
+        backend.close()
+    return len(store)
@@ -0,0 +1,170 @@
+"""Score item catalogs from the command line, streaming them in chunks.
+
+    python -m balancing.batch items.jsonl --cost-max 100000 \\
+        --output scored.jsonl --summary summary.json
+
+The input is a JSON array of items (or ``{"items": [...]}``) or JSON Lines,
+read incrementally. Every chunk of ``--chunk-size`` items gets the app's
+calculated_cost, the resource cost breakdown and the performance score and
+power level, is written out as JSON Lines, and is folded into a mergeable
+CatalogSummary; nothing else is kept, so memory stays flat however large
+the input. Invalid items are counted and skipped.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+from balancing.costs import RESOURCE_COST_FIELDS, resource_cost_matrix
+from balancing.engine import add_scores, frame_from_records
+from balancing.importer import iter_json_items, validate_item
+from balancing.store import RESOURCE_FIELDS
+from balancing.summary import CatalogSummary
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_COST_MAX = 100000
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+
+class BatchStats:
+    """Running totals of a batch run."""
+
+    def __init__(self):
+        self.items = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def items_per_second(self):
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+
+def iter_json_lines(fh):
+    """Yield one item per non-empty line; lines that aren't JSON yield None."""
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def iter_chunks(items, chunk_size, stats, default_category=""):
+    """Group the valid items into lists of ``chunk_size``, counting rejects in ``stats``."""
+    chunk = []
+    for item in items:
+        item = validate_item(item, default_category)
+        if item is None:
+            stats.rejected += 1
+            continue
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def score_chunk(items, cost_max):
+    """Return the items as a DataFrame with costs, resource costs and scores added."""
+    df = add_scores(frame_from_records(items), cost_max)
+    costs = resource_cost_matrix(df[RESOURCE_FIELDS].to_numpy(), df["calculated_cost"].to_numpy())
+    for i, field in enumerate(RESOURCE_COST_FIELDS):
+        df[field] = costs[:, i]
+    return df
+
+
+def score_catalog(items, cost_max=DEFAULT_COST_MAX, chunk_size=DEFAULT_CHUNK_SIZE, output=None,
+                  on_chunk=None, default_category=""):
+    """Score an iterable of item dicts; return (CatalogSummary, BatchStats).
+
+    Scored records are written to the text stream ``output`` as JSON Lines
+    if it is given. ``on_chunk(stats)`` is called after every chunk.
+    """
+    summary = CatalogSummary()
+    stats = BatchStats()
+    for chunk in iter_chunks(items, chunk_size, stats, default_category):
+        df = score_chunk(chunk, cost_max)
+        summary.add(df)
+        if output is not None:
+            lines = df.to_json(orient="records", lines=True, force_ascii=False)
+            # Older pandas versions leave out the final newline
+            output.write(lines if lines.endswith("\n") else lines + "\n")
+        stats.items += len(df)
+        if on_chunk is not None:
+            on_chunk(stats)
+    return summary, stats
+
+
+def open_items(path, input_format=None):
+    """Return (text stream, item iterator) for ``path`` ("-" is stdin)."""
+    if input_format is None:
+        input_format = "jsonl" if path.lower().endswith(JSON_LINES_SUFFIXES) else "json"
+    if path == "-":
+        fh = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+    else:
+        fh = open(path, "r", encoding="utf-8-sig")
+    items = iter_json_lines(fh) if input_format == "jsonl" else iter_json_items(fh)
+    return fh, items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m balancing.batch",
+        description="Score an item catalog (JSON or JSON Lines) in streaming chunks."
+    )
+    parser.add_argument("input", help="item file, or - for stdin")
+    parser.add_argument("--format", choices=["json", "jsonl"],
+                        help="input format (default: from the file name, JSON unless .jsonl/.ndjson)")
+    parser.add_argument("-o", "--output", help="write the scored items as JSON Lines here (- for stdout)")
+    parser.add_argument("--summary", help="write the summary JSON here instead of to stdout")
+    parser.add_argument("--cost-max", type=float, default=DEFAULT_COST_MAX, help="Max Cost of the cost formula")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="items per chunk")
+    parser.add_argument("--default-category", default="", help="category of items without one")
+    parser.add_argument("--quiet", action="store_true", help="don't report progress on stderr")
+    args = parser.parse_args(argv)
+
+    def report_progress(stats):
+        if not args.quiet:
+            print(f"\r{stats.items:,} items, {stats.items_per_second:,.0f} items/s",
+                  end="", file=sys.stderr, flush=True)
+
+    fh, items = open_items(args.input, args.format)
+    output = None
+    try:
+        if args.output == "-":
+            output = sys.stdout
+        elif args.output:
+            output = open(args.output, "w", encoding="utf-8")
+        summary, stats = score_catalog(items, args.cost_max, args.chunk_size, output,
+                                       report_progress, args.default_category)
+    finally:
+        if output is not None and output is not sys.stdout:
+            output.close()
+        if args.input == "-":
+            fh.detach()
+        else:
+            fh.close()
+
+    if not args.quiet:
+        print(f"\r{stats.items:,} items scored ({stats.rejected:,} rejected) in {stats.seconds:.1f} s, "
+              f"{stats.items_per_second:,.0f} items/s", file=sys.stderr)
+    result = dict(summary.report(), rejected=stats.rejected)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as out:
+            json.dump(result, out, indent=2, ensure_ascii=False)
+    elif args.output != "-":
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Resource mix per group of items, for charts of large catalogs.
+
+Instead of one stacked bar per item, the resource chart can show one bar
+per bin: a category, a cost quantile or the dominant resource of the items.
+The per-bin means are computed with bincount over the store's columns, so
+the result (and the figure built from it) grows with the number of bins,
+not with the number of items.
+"""
+import numpy as np
+import pandas as pd
+
+from balancing.costs import resource_shares
+from balancing.store import RESOURCE_FIELDS
+
+BIN_BY = ["category", "cost", "resource"]
+
+
+def bin_codes(store, positions=None, by="category", quantiles=10):
+    """Return ``(labels, codes)``: the bin labels and each item's bin index.
+
+    ``by`` is one of BIN_BY. Cost bins are quantiles of calculated_cost
+    (fewer than ``quantiles`` when many items share a cost); resource bins
+    are labelled with the resource field names.
+    """
+    if by == "category":
+        return list(store.categories), store.column("category_code", positions).astype(np.intp)
+    if by == "resource":
+        shares = resource_shares(store, positions)
+        return list(RESOURCE_FIELDS), np.argmax(shares, axis=1) if len(shares) else np.empty(0, dtype=np.intp)
+    if by == "cost":
+        cost = store.column("calculated_cost", positions).astype(np.float64)
+        if len(cost) == 0:
+            return [], np.empty(0, dtype=np.intp)
+        edges = np.unique(np.quantile(cost, np.linspace(0, 1, quantiles + 1)))
+        if len(edges) == 1:
+            return [f"{edges[0]:,.0f}"], np.zeros(len(cost), dtype=np.intp)
+        codes = np.searchsorted(edges[1:-1], cost, side="right")
+        labels = [
+            f"Q{i + 1}: {low:,.0f}–{high:,.0f}"
+            for i, (low, high) in enumerate(zip(edges[:-1], edges[1:]))
+        ]
+        return labels, codes
+    raise ValueError(f"unknown binning {by!r}")
+
+
+class ResourceMix:
+    """Item count and mean resource shares per bin of the items at ``positions``.
+
+    ``table`` has one row per non-empty bin: bin, count and one column per
+    resource field. ``positions(label)`` returns the store positions of the
+    items in a bin, for drilling down to item level.
+    """
+
+    def __init__(self, store, positions=None, by="category", quantiles=10):
+        # Fixed positions keep the columns aligned if another session appends meanwhile
+        positions = np.arange(len(store)) if positions is None else np.asarray(positions, dtype=np.intp)
+        labels, codes = bin_codes(store, positions, by, quantiles)
+        width = len(labels)
+        counts = np.bincount(codes, minlength=width)
+        table = pd.DataFrame({"bin": labels, "count": counts})
+        for field in RESOURCE_FIELDS:
+            sums = np.bincount(codes, weights=store.column(field, positions).astype(np.float64), minlength=width)
+            table[field] = np.divide(sums, counts, out=np.zeros(width), where=counts > 0)
+        self.table = table[counts > 0].reset_index(drop=True)
+        self._store_positions = positions
+        self._codes = codes
+        self._labels = labels
+
+    def positions(self, label):
+        """Store positions of the items in the bin called ``label``."""
+        return self._store_positions[self._codes == self._labels.index(label)]
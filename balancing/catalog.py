@@ -0,0 +1,234 @@
+"""The item catalog shared by all sessions of the app process.
+
+Sessions read ``catalog.store`` directly instead of keeping their own copy.
+Writes go through the catalog, under its lock, and carry the catalog
+version the writer last saw (optimistic concurrency):
+
+- edits of different items, or of different fields of one item, merge;
+- an edit of a field that someone else changed after ``base_version`` is
+  rejected with CatalogConflict, as is any edit based on a catalog that has
+  been replaced since;
+- replacing the whole catalog requires ``base_version`` to be current.
+
+Replacing or clearing the catalog installs a new ItemStore instead of
+compacting the current one in place, so sessions that are still rendering
+from the old store keep a consistent view of it.
+"""
+import threading
+
+import numpy as np
+
+from balancing.aggregates import CategoryAggregates
+from balancing.costs import CostEngine
+from balancing.formulas import FormulaError
+from balancing.resources import DEFAULT_STEP, DEFAULT_TOLERANCE, plan_repair
+from balancing.store import RESOURCE_FIELDS, ItemStore
+
+
+class CatalogConflict(Exception):
+    """A write was based on a catalog version that has changed since."""
+
+    def __init__(self, message, item_id=None, fields=()):
+        super().__init__(message)
+        self.item_id = item_id
+        self.fields = list(fields)
+
+
+class SharedCatalog:
+    """One ItemStore plus the version counter and cost settings of the catalog.
+
+    ``version`` grows by one with every write made through the catalog.
+    ``cost_max``, the cost ``formula`` (a CostFormula, None for the standard
+    formula) and its ``formula_parameters`` are catalog-wide settings:
+    calculated_cost is kept up to date for them by the catalog's own
+    CostEngine. ``aggregates`` holds the per-category aggregates of the
+    current store.
+    """
+
+    def __init__(self, store=None, cost_max=100000):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.loaded = False
+        self.cost_max = cost_max
+        self.formula = None
+        self.formula_parameters = {}
+        self._store = store if store is not None else ItemStore()
+        self._cost_engine = CostEngine()
+        self.aggregates = CategoryAggregates(self._store)
+        self._replaced_version = 0
+        # (item_id, field) -> catalog version of the last write to that field
+        self._field_versions = {}
+        # (catalog version, sorted item ids, fields) of bulk writes
+        self._bulk_writes = []
+        self._listeners = []
+        self._replace_callbacks = []
+
+    @property
+    def store(self):
+        return self._store
+
+    def add_listener(self, listener):
+        """Attach a StoreListener to the current store and every later one."""
+        with self.lock:
+            self._listeners.append(listener)
+            self._store.add_listener(listener)
+
+    def on_replace(self, callback):
+        """Call ``callback(store)`` whenever the catalog is replaced."""
+        with self.lock:
+            self._replace_callbacks.append(callback)
+
+    def _bump(self):
+        self.version += 1
+        return self.version
+
+    def load(self, store):
+        """Install the initial catalog. Returns False if it was loaded already."""
+        with self.lock:
+            if self.loaded:
+                return False
+            self._refresh_costs(store)
+            self._install(store)
+            self.loaded = True
+            return True
+
+    def _install(self, store):
+        for listener in self._listeners:
+            self._store.remove_listener(listener)
+            store.add_listener(listener)
+        self.aggregates.detach()
+        self.aggregates = CategoryAggregates(store)
+        self._store = store
+        self._replaced_version = self._bump()
+        self._field_versions = {}
+        self._bulk_writes = []
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _refresh_costs(self, store):
+        return self._cost_engine.refresh(store, self.cost_max, self.formula, self.formula_parameters)
+
+    def refresh_costs(self):
+        """Recompute stale calculated_cost values; return the number recomputed."""
+        with self.lock:
+            return self._refresh_costs(self._store)
+
+    def set_cost_max(self, cost_max):
+        """Change the catalog-wide Max Cost and return the new version."""
+        with self.lock:
+            if cost_max != self.cost_max:
+                self.cost_max = cost_max
+                self._refresh_costs(self._store)
+                self._bump()
+            return self.version
+
+    def set_formula(self, formula, parameters=None):
+        """Switch the catalog-wide cost formula and its parameters; return the new version."""
+        parameters = dict(parameters or {})
+        if formula is not None:
+            missing = [name for name in formula.parameters if name != "cost_max" and name not in parameters]
+            if missing:
+                raise FormulaError(f"no value for {', '.join(missing)}")
+        with self.lock:
+            if formula is not self.formula or parameters != self.formula_parameters:
+                self.formula = formula
+                self.formula_parameters = parameters
+                self._refresh_costs(self._store)
+                self._bump()
+            return self.version
+
+    def update_item(self, item_id, changes, base_version):
+        """Apply ``changes`` to item ``item_id`` and return the new version.
+
+        Fields that already hold the given value are skipped. Raises
+        CatalogConflict if a changed field was written by someone else after
+        ``base_version``, if the item is gone, or if the catalog was replaced.
+        """
+        with self.lock:
+            if base_version < self._replaced_version:
+                raise CatalogConflict("the catalog was replaced", item_id)
+            try:
+                position = self._store.position_of(item_id)
+            except KeyError:
+                raise CatalogConflict(f"item {item_id} no longer exists", item_id)
+            changes = self._store.changed_fields(position, changes)
+            if not changes:
+                return self.version
+            conflicting = [
+                field for field in changes
+                if self._field_versions.get((item_id, field), 0) > base_version
+                or self._bulk_written(item_id, field, base_version)
+            ]
+            if conflicting:
+                raise CatalogConflict(
+                    f"{', '.join(conflicting)} of item {item_id} changed in the meantime",
+                    item_id, conflicting
+                )
+            self._store.update(position, changes)
+            self._refresh_costs(self._store)
+            version = self._bump()
+            for field in changes:
+                self._field_versions[(item_id, field)] = version
+            return version
+
+    def _bulk_written(self, item_id, field, base_version):
+        """Whether a bulk write after ``base_version`` changed ``field`` of the item."""
+        for version, ids, fields in reversed(self._bulk_writes):
+            if version <= base_version:
+                return False
+            if field in fields:
+                i = np.searchsorted(ids, item_id)
+                if i < len(ids) and ids[i] == item_id:
+                    return True
+        return False
+
+    def repair_resources(self, strategy, tolerance=DEFAULT_TOLERANCE, step=DEFAULT_STEP, base_version=None):
+        """Repair the resource shares of every item off 100% in one write.
+
+        See balancing.resources for the strategies. Returns the new version
+        and the applied ResourceRepair. Raises CatalogConflict if the catalog
+        was replaced after ``base_version``.
+        """
+        with self.lock:
+            if base_version is not None and base_version < self._replaced_version:
+                raise CatalogConflict("the catalog was replaced")
+            repair = plan_repair(self._store, strategy, tolerance, step)
+            if len(repair.positions) == 0:
+                return self.version, repair
+            self._store.set_columns(
+                {field: repair.after[:, i] for i, field in enumerate(RESOURCE_FIELDS)}, repair.positions
+            )
+            self._refresh_costs(self._store)
+            version = self._bump()
+            ids = np.sort(self._store.column("item_id", repair.positions))
+            self._bulk_writes.append((version, ids, frozenset(RESOURCE_FIELDS)))
+            return version, repair
+
+    def add_items(self, records):
+        """Append item dicts (never conflicts); return their ids."""
+        with self.lock:
+            ids = self._store.extend(records)
+            self._refresh_costs(self._store)
+            self._bump()
+            return ids
+
+    def replace(self, store, base_version=None):
+        """Make ``store`` the catalog and return the new version.
+
+        Raises CatalogConflict if ``base_version`` is given and the catalog
+        changed after it.
+        """
+        with self.lock:
+            if base_version is not None and base_version != self.version:
+                raise CatalogConflict("the catalog changed in the meantime")
+            self._refresh_costs(store)
+            self._install(store)
+            self.loaded = True
+            for callback in self._replace_callbacks:
+                callback(store)
+            return self.version
+
+    def clear(self, base_version=None):
+        """Replace the catalog with an empty one (keeping the categories)."""
+        return self.replace(ItemStore(categories=self._store.categories), base_version)
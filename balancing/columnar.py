@@ -0,0 +1,156 @@
+"""Binary columnar catalog files (``.npz``).
+
+A columnar file is an uncompressed NumPy ``.npz`` archive with one ``.npy``
+member per column:
+
+- ``item_id`` (int64), ``category_code`` (int32) and one array per
+  FLOAT_FIELDS field in the store's own dtype;
+- ``categories``: the category table the codes index into;
+- ``item_name_text`` (UTF-8 bytes of all names) and ``item_name_offsets``
+  (n + 1 character offsets into the decoded text);
+- ``meta``: format version and the next free item id.
+
+Because the members are stored uncompressed, ``load_columnar`` maps the
+numeric columns straight from the file (copy-on-write) instead of reading
+them: opening a large catalog only decodes the names and builds the
+indexes, and column pages are read when something touches them. Archives
+written by other tools (for example compressed ones) are read normally.
+"""
+import io
+import struct
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from balancing.persistence import write_atomic
+from balancing.store import FLOAT_FIELDS, ItemStore
+
+COLUMNAR_SUFFIX = ".npz"
+FORMAT_VERSION = 1
+
+# Local file header of a ZIP member: fixed part, then name and extra field
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def columnar_arrays(store):
+    """Return the arrays of a columnar file for ``store`` as a dict."""
+    names = store.column("item_name").tolist()
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in names], out=offsets[1:])
+    arrays = {
+        "meta": np.array([FORMAT_VERSION, store.next_id], dtype=np.int64),
+        "categories": np.array(store.categories, dtype=str),
+        "item_id": store.column("item_id"),
+        "category_code": store.column("category_code"),
+        "item_name_text": np.frombuffer("".join(names).encode("utf-8"), dtype=np.uint8),
+        "item_name_offsets": offsets,
+    }
+    for field in FLOAT_FIELDS:
+        arrays[field] = store.column(field)
+    return arrays
+
+
+def write_columnar(store, fh):
+    """Write ``store`` as a columnar file to the binary file object ``fh``."""
+    np.savez(fh, **columnar_arrays(store))
+
+
+def columnar_bytes(store):
+    """Return ``store`` as the bytes of a columnar file (for downloads)."""
+    buffer = io.BytesIO()
+    write_columnar(store, buffer)
+    return buffer.getvalue()
+
+
+def save_columnar(store, path):
+    """Atomically write ``store`` to ``path`` as a columnar file."""
+    write_atomic(path, lambda fh: write_columnar(store, fh))
+
+
+def is_columnar_file(path):
+    """Tell whether ``path`` looks like a columnar catalog file."""
+    path = Path(path)
+    return path.suffix == COLUMNAR_SUFFIX and zipfile.is_zipfile(path)
+
+
+def load_columnar(source, categories=None):
+    """Load a columnar file (a path or a binary file object) as an ItemStore.
+
+    Paths are memory-mapped where possible; ``categories`` gives the order of
+    the store's category table (categories only found in the file follow).
+    """
+    if isinstance(source, (str, Path)):
+        arrays = _map_members(Path(source))
+    else:
+        with np.load(source, allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+    return _store_from_arrays(arrays, categories)
+
+
+def _store_from_arrays(arrays, categories):
+    missing = {"meta", "categories", "item_id", "category_code", "item_name_text",
+               "item_name_offsets"} - set(arrays)
+    if missing:
+        raise ValueError(f"not a columnar catalog file (missing {', '.join(sorted(missing))})")
+    version, next_id = (int(value) for value in arrays["meta"][:2])
+    if version > FORMAT_VERSION:
+        raise ValueError(f"columnar format version {version} is newer than this app supports")
+
+    count = len(arrays["item_id"])
+    text = arrays["item_name_text"].tobytes().decode("utf-8")
+    offsets = arrays["item_name_offsets"].tolist()
+    names = np.empty(count, dtype=object)
+    names[:] = [text[start:stop] for start, stop in zip(offsets, offsets[1:])]
+
+    file_categories = arrays["categories"].tolist()
+    store_categories = list(categories or [])
+    store_categories += [c for c in file_categories if c not in store_categories]
+    codes = arrays["category_code"]
+    if store_categories[:len(file_categories)] != file_categories:
+        lookup = {category: code for code, category in enumerate(store_categories)}
+        mapping = np.array([lookup[c] for c in file_categories], dtype=np.int32)
+        codes = mapping[codes]
+
+    columns = {}
+    for field, dtype in FLOAT_FIELDS.items():
+        columns[field] = arrays[field] if field in arrays else np.zeros(count, dtype=dtype)
+    return ItemStore.from_columns(
+        arrays["item_id"], names, codes, columns, store_categories, next_id=next_id
+    )
+
+
+def _map_members(path):
+    """Return the members of an .npz file, memory-mapping the uncompressed ones."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, path.open("rb") as fh:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            array = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                array = _map_member(path, fh, info)
+            if array is None:
+                with archive.open(info) as member:
+                    array = np.lib.format.read_array(member, allow_pickle=False)
+            arrays[name] = array
+    return arrays
+
+
+def _map_member(path, fh, info):
+    fh.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(fh.read(_LOCAL_HEADER.size))
+    name_length, extra_length = header[-2:]
+    fh.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+    version = np.lib.format.read_magic(fh)
+    reader = _HEADER_READERS.get(version)
+    if reader is None:
+        return None
+    shape, fortran_order, dtype = reader(fh)
+    if dtype.hasobject or fortran_order or 0 in shape:
+        return None
+    # Copy-on-write: edits change the store, never the file
+    return np.memmap(path, dtype=dtype, mode="c", offset=fh.tell(), shape=shape)
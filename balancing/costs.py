@@ -0,0 +1,134 @@
+"""Item cost formula, the batch cost engine and the resource cost breakdown."""
+import numpy as np
+import pandas as pd
+
+from balancing.store import RESOURCE_FIELDS
+
+
+def calculate_cost(success_rate, efficiency, cost_max):
+    """Calculate item cost as (success_rate * efficiency / 10000) * cost_max
+
+    success_rate and efficiency are percentages (0-100). The product is divided
+    by 10000 to map 100*100 -> 1.0, then scaled by cost_max. Works on scalars
+    as well as on NumPy arrays.
+    """
+    cost_factor = (success_rate * efficiency) / 10000.0
+    final_cost = cost_factor * cost_max
+    return final_cost
+
+
+def compute_costs(store, cost_max, positions=None, formula=None, parameters=None):
+    """Return calculated_cost for the whole store (or ``positions``) as one array.
+
+    ``formula`` is a CostFormula (see ``balancing.formulas``) evaluated with
+    ``parameters`` plus ``cost_max``; without one the standard formula of
+    calculate_cost is used.
+    """
+    if formula is None:
+        return calculate_cost(
+            store.column("success_rate", positions),
+            store.column("efficiency", positions),
+            float(cost_max)
+        )
+    columns = {
+        field: store.column("category_code" if field == "category" else field, positions)
+        for field in formula.fields
+    }
+    count = len(store) if positions is None else len(positions)
+    return formula.evaluate(columns, dict(parameters or {}, cost_max=float(cost_max)), store.categories, count)
+
+
+class CostEngine:
+    """Keeps a store's calculated_cost column in sync with its inputs.
+
+    ``refresh`` is cheap to call on every rerun: it does nothing unless
+    cost_max, the formula or its parameters changed, the store was replaced,
+    or some rows had a cost input written since the last refresh. In the
+    last case only those rows are recomputed.
+
+    Costs of a formula proportional to cost_max (the standard one, and any
+    formula of the form ``... * cost_max``) are stored as the cost at
+    cost_max = 1, with cost_max as the store's cost scale, so a new Max Cost
+    only changes the scale and touches no row.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._settings = None
+
+    def refresh(self, store, cost_max, formula=None, parameters=None):
+        """Bring calculated_cost up to date and return the number of rows recomputed."""
+        scaled = cost_max > 0 and (formula is None or formula.proportional_to_cost_max)
+        basis = 1.0 if scaled else cost_max
+        settings = (formula, dict(parameters or {}), None if scaled else cost_max)
+        if store is not self._store or settings != self._settings:
+            if not scaled:
+                store.set_cost_scale(1.0)
+            store.set_cost_factors(compute_costs(store, basis, None, formula, parameters))
+            recomputed = len(store)
+        else:
+            stale = store.stale_cost_positions()
+            recomputed = len(stale)
+            if recomputed:
+                store.set_cost_factors(compute_costs(store, basis, stale, formula, parameters), positions=stale)
+        if scaled:
+            store.set_cost_scale(cost_max)
+
+        store.mark_costs_fresh()
+        self._store = store
+        self._settings = settings
+        return recomputed
+
+
+RESOURCE_COST_FIELDS = [f"{field}_cost" for field in RESOURCE_FIELDS]
+
+
+def resource_shares(store, positions=None):
+    """Return the resource shares of the items as an (n_items x 6) float64 matrix."""
+    return np.column_stack([
+        store.column(field, positions).astype(np.float64) for field in RESOURCE_FIELDS
+    ]).reshape(-1, len(RESOURCE_FIELDS))
+
+
+def calculate_resource_costs(store, positions=None):
+    """Split each item's calculated_cost over its resources.
+
+    Every row of the resource share matrix is normalized by its own sum (so
+    shares that don't add up to 100% still split the whole cost) and then
+    multiplied by the item's calculated_cost. Items without any resources get
+    zero cost for every resource. Returns an (n_items x 6) matrix.
+    """
+    return resource_cost_matrix(resource_shares(store, positions), store.column("calculated_cost", positions))
+
+
+def resource_cost_matrix(shares, calculated_cost):
+    """The split of calculate_resource_costs for plain arrays.
+
+    ``shares`` is an (n_items x 6) matrix of resource shares in
+    RESOURCE_FIELDS order, ``calculated_cost`` the n item costs.
+    """
+    shares = np.asarray(shares, dtype=np.float64)
+    totals = shares.sum(axis=1, keepdims=True)
+    # Avoid division by zero
+    normalized = np.divide(shares, totals, out=np.zeros_like(shares), where=totals > 0)
+    return normalized * np.asarray(calculated_cost)[:, np.newaxis]
+
+
+class ResourceCostBreakdown:
+    """Per-item and per-resource cost breakdown computed in one matrix pass.
+
+    ``frame`` is the per-item table (item_name, category, calculated_cost and
+    one ``<resource>_cost`` column per resource), ``totals`` a Series with the
+    catalog-wide cost per resource.
+    """
+
+    def __init__(self, store, positions=None):
+        matrix = calculate_resource_costs(store, positions)
+        self.frame = pd.DataFrame({
+            "item_name": store.column("item_name", positions),
+            "category": np.array(store.categories, dtype=object)[store.column("category_code", positions)],
+            "calculated_cost": store.column("calculated_cost", positions),
+        })
+        for i, field in enumerate(RESOURCE_COST_FIELDS):
+            self.frame[field] = matrix[:, i]
+        self.totals = pd.Series(matrix.sum(axis=0), index=RESOURCE_COST_FIELDS)
@@ -0,0 +1,85 @@
+"""Analysis frames with derived columns, built once per catalog version and filter.
+
+Every tab reads the same frame from a ``FrameCache`` instead of building
+its own, and the derived columns are computed once when the frame is
+built:
+
+- ``performance_score``: mean of success_rate and efficiency;
+- ``power_level``: success_rate + efficiency - calculated_cost / 1000, the
+  score behind "Best Value" (its per-category mean is the category power
+  level).
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from balancing.engine import add_scores
+
+DERIVED_COLUMNS = ["performance_score", "power_level"]
+
+DEFAULT_MAX_FRAMES = 8
+
+
+def add_derived_columns(df):
+    """Add the DERIVED_COLUMNS to ``df`` in place and return it."""
+    return add_scores(df)
+
+
+class FrameCache:
+    """LRU cache of analysis frames keyed by (store, version, category).
+
+    Frames are shared with every caller (and every session), so they must be
+    treated as read-only. Each frame is built from a copy of the store's
+    columns taken under the catalog lock, so edits made later (by any
+    session) never show up in a frame that is already being rendered, and
+    its derived columns always match the rest. ``df.attrs["version"]`` is
+    the store version the frame shows.
+
+    At most ``max_frames`` are kept, and a new frame replaces the older
+    versions of the same store and category; stores are referenced weakly
+    so a replaced catalog isn't kept alive.
+    """
+
+    def __init__(self, max_frames=DEFAULT_MAX_FRAMES):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def frame(self, store, category=None, lock=None, find=None):
+        """Return the frame of ``store`` (restricted to ``category``) with derived columns.
+
+        ``lock`` is the lock writers of ``store`` hold. ``find(category)``
+        returns the positions of the category's items (default
+        ``store.filter``); it is called under ``lock``.
+        """
+        with lock if lock is not None else nullcontext():
+            version = store.version
+            key = (id(store), version, category)
+            with self._lock:
+                entry = self._frames.get(key)
+                if entry is not None and entry[0]() is store:
+                    self._frames.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            if category is None:
+                positions = None
+            else:
+                positions = (find or store.filter)(category)
+            # Positions gather copies; the whole catalog is a view to copy
+            df = store.view_frame(positions)
+            if positions is None:
+                df = df.copy()
+        df = add_derived_columns(df)
+        df.attrs["version"] = version
+
+        with self._lock:
+            for old in [k for k in self._frames if k[0] == key[0] and k[2] == category]:
+                del self._frames[old]
+            self._frames[key] = (weakref.ref(store), df)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return df
@@ -0,0 +1,185 @@
+"""Balance analysis of an item catalog, independent of the UI.
+
+Everything here works on NumPy arrays (or pandas Series) of the item
+columns, or on a DataFrame with them, and nothing imports Streamlit, so
+batch jobs can score a catalog without starting the app::
+
+    import json
+    from balancing.engine import analyze, frame_from_records
+
+    with open("data.json") as fh:
+        report = analyze(frame_from_records(json.load(fh)), cost_max=100000)
+    print(report.balance_score, report.category_stats)
+
+app.py shows the same numbers through these functions.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from balancing.costs import calculate_cost
+from balancing.store import FLOAT_FIELDS, RESOURCE_FIELDS
+
+# Rule thresholds (percentages and cost units)
+OVERPOWERED_MIN_RATE = 80
+OVERPOWERED_MAX_COST = 60000
+UNDERPOWERED_MAX_RATE = 40
+UNDERPOWERED_MIN_COST = 20000
+UNDERUSED_SHARE = 10
+IDEAL_CORRELATION = 0.8
+IDEAL_TOLERANCE = 0.1
+
+CATEGORY_STATS_FIELDS = ["success_rate", "efficiency", "calculated_cost", "performance_score", "power_level"]
+
+BalanceReport = namedtuple("BalanceReport", [
+    "item_count", "mean_success_rate", "mean_efficiency", "mean_cost",
+    "overpowered", "underpowered", "underused_resources",
+    "correlation", "balance_score", "overperforming", "underperforming",
+    "top_performers", "category_stats",
+])
+
+
+def performance_score(success_rate, efficiency):
+    """Mean of success_rate and efficiency."""
+    return (success_rate + efficiency) / 2
+
+
+def power_level(success_rate, efficiency, calculated_cost):
+    """success_rate + efficiency - calculated_cost / 1000: the "Best Value" score.
+
+    Linear in its inputs, so the power level of a category's mean item is
+    the mean power level of the category.
+    """
+    return success_rate + efficiency - calculated_cost / 1000
+
+
+def overpowered(success_rate, efficiency, calculated_cost):
+    """Boolean mask of items that are very good at both rates but cheap."""
+    return ((np.asarray(success_rate) > OVERPOWERED_MIN_RATE)
+            & (np.asarray(efficiency) > OVERPOWERED_MIN_RATE)
+            & (np.asarray(calculated_cost) < OVERPOWERED_MAX_COST))
+
+
+def underpowered(success_rate, efficiency, calculated_cost):
+    """Boolean mask of items that are poor at both rates but not cheap."""
+    return ((np.asarray(success_rate) < UNDERPOWERED_MAX_RATE)
+            & (np.asarray(efficiency) < UNDERPOWERED_MAX_RATE)
+            & (np.asarray(calculated_cost) > UNDERPOWERED_MIN_COST))
+
+
+def underused_resources(mean_shares):
+    """Resource fields whose mean share is below UNDERUSED_SHARE percent.
+
+    ``mean_shares`` maps resource fields to their mean share (a dict or a
+    Series); the fields are returned in that order.
+    """
+    return [field for field, share in dict(mean_shares).items() if share < UNDERUSED_SHARE]
+
+
+def correlation(x, y):
+    """Pearson correlation of two arrays, ignoring pairs with a NaN.
+
+    NaN for fewer than two pairs or a constant input, like pandas' corr().
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if valid.sum() < 2:
+        return float("nan")
+    x = x[valid] - x[valid].mean()
+    y = y[valid] - y[valid].mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    if denominator == 0:
+        return float("nan")
+    return float((x * y).sum() / denominator)
+
+
+def balance_score(cost_performance_correlation):
+    """0-100 score of how close the cost-performance correlation is to the ideal 0.8.
+
+    100 - |correlation - 0.8| * 100, floored at 0 as the app always showed
+    it. NaN for a NaN correlation. Also works on an array of correlations.
+    """
+    score = np.maximum(100 - np.abs(np.asarray(cost_performance_correlation, dtype=np.float64)
+                                    - IDEAL_CORRELATION) * 100, 0)
+    return float(score) if score.ndim == 0 else score
+
+
+def ideal_line_counts(performance, calculated_cost):
+    """Return (overperforming, underperforming): items more than 10% off the ideal balance line."""
+    performance = np.asarray(performance, dtype=np.float64)
+    expected = np.asarray(calculated_cost, dtype=np.float64) * 100
+    over = int((performance > expected * (1 + IDEAL_TOLERANCE)).sum())
+    under = int((performance < expected * (1 - IDEAL_TOLERANCE)).sum())
+    return over, under
+
+
+def frame_from_records(records):
+    """Build an analysis DataFrame from item dicts in the data.json layout."""
+    df = pd.DataFrame.from_records(records)
+    for field in FLOAT_FIELDS:
+        df[field] = pd.to_numeric(df[field], errors="coerce").fillna(0.0) if field in df else 0.0
+    for field in ("item_name", "category"):
+        if field not in df:
+            df[field] = ""
+    return df
+
+
+def add_scores(df, cost_max=None):
+    """Add performance_score and power_level to ``df`` in place and return it.
+
+    With ``cost_max`` the calculated_cost column is recomputed first.
+    """
+    success_rate = df["success_rate"].to_numpy()
+    efficiency = df["efficiency"].to_numpy()
+    if cost_max is not None:
+        df["calculated_cost"] = calculate_cost(success_rate, efficiency, float(cost_max))
+    df["performance_score"] = performance_score(success_rate, efficiency)
+    df["power_level"] = power_level(success_rate, efficiency, df["calculated_cost"].to_numpy())
+    return df
+
+
+def top_performers(df):
+    """Index labels of the items with the highest efficiency, success_rate and power_level."""
+    return {field: df[field].idxmax() for field in ("efficiency", "success_rate", "power_level")}
+
+
+def category_stats(df):
+    """Per-category item count and means of CATEGORY_STATS_FIELDS (df needs the scores)."""
+    stats = df.groupby("category", observed=True)[CATEGORY_STATS_FIELDS].mean()
+    stats.insert(0, "count", df.groupby("category", observed=True).size())
+    return stats.reset_index()
+
+
+def analyze(df, cost_max=None):
+    """Run the whole balance analysis over the items of ``df``.
+
+    ``df`` is left untouched (and not copied if it has the scores already
+    and no ``cost_max`` is given). With ``cost_max``, calculated_cost is
+    recomputed with the app's cost formula. ``overpowered`` and
+    ``underpowered`` are the index labels of the flagged items;
+    ``top_performers`` maps efficiency, success_rate and power_level to the
+    label of the best item (empty for an empty catalog).
+    """
+    if cost_max is not None or not {"performance_score", "power_level"} <= set(df.columns):
+        df = add_scores(df.copy(), cost_max)
+    rates = (df["success_rate"], df["efficiency"], df["calculated_cost"])
+    resources = [field for field in RESOURCE_FIELDS if field in df]
+    cost_performance = correlation(df["calculated_cost"], df["performance_score"])
+    over, under = ideal_line_counts(df["performance_score"], df["calculated_cost"])
+    return BalanceReport(
+        item_count=len(df),
+        mean_success_rate=float(df["success_rate"].mean()),
+        mean_efficiency=float(df["efficiency"].mean()),
+        mean_cost=float(df["calculated_cost"].mean()),
+        overpowered=list(df.index[overpowered(*rates)]),
+        underpowered=list(df.index[underpowered(*rates)]),
+        underused_resources=underused_resources(df[resources].mean()),
+        correlation=cost_performance,
+        balance_score=balance_score(cost_performance),
+        overperforming=over,
+        underperforming=under,
+        top_performers=top_performers(df) if len(df) else {},
+        category_stats=category_stats(df),
+    )
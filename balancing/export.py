@@ -0,0 +1,61 @@
+"""Catalog export payloads, built on demand and cached per catalog version."""
+import gzip
+import json
+import threading
+import weakref
+from collections import namedtuple
+
+from balancing.columnar import columnar_bytes
+
+ExportFormat = namedtuple("ExportFormat", "label file_name mime")
+
+EXPORT_FORMATS = {
+    "json": ExportFormat("JSON (readable)", "items.json", "application/json"),
+    "json-compact": ExportFormat("JSON (compact)", "items.min.json", "application/json"),
+    "json-gzip": ExportFormat("JSON (gzip-compressed)", "items.json.gz", "application/gzip"),
+    "npz": ExportFormat("Columnar (.npz)", "items.npz", "application/octet-stream"),
+}
+
+
+def serialize(store, export_format):
+    """Return the catalog in ``export_format`` (a key of EXPORT_FORMATS) as bytes."""
+    if export_format == "npz":
+        return columnar_bytes(store)
+    if export_format == "json":
+        return json.dumps(store.to_records(), indent=2, ensure_ascii=False).encode("utf-8")
+    compact = json.dumps(store.to_records(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if export_format == "json-compact":
+        return compact
+    if export_format == "json-gzip":
+        return gzip.compress(compact, compresslevel=6)
+    raise ValueError(f"unknown export format {export_format!r}")
+
+
+class ExportCache:
+    """Keeps the last payload built per format, keyed by store and version.
+
+    Only one payload per format is held, and the store is referenced weakly,
+    so a replaced catalog is freed as usual. Safe to share between sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, store, export_format, build=True):
+        """Return the payload for the store's current version.
+
+        With ``build=False`` only a cached payload is returned (or None).
+        """
+        with self._lock:
+            entry = self._entries.get(export_format)
+            if entry is not None:
+                store_ref, version, payload = entry
+                if store_ref() is store and version == store.version:
+                    return payload
+            if not build:
+                return None
+            version = store.version
+            payload = serialize(store, export_format)
+            self._entries[export_format] = (weakref.ref(store), version, payload)
+            return payload
@@ -0,0 +1,302 @@
+"""User-defined cost formulas, compiled once into vectorized NumPy plans.
+
+A formula is a Python-style arithmetic expression over the item fields
+(success_rate, efficiency, the resource shares and category) and global
+parameters (``cost_max`` and any other name), for example::
+
+    success_rate * efficiency / 10000 * cost_max * (1 + tech_components / 100 * premium)
+
+The expression is parsed with ``ast`` and only a small whitelist is
+accepted: numbers, + - * / // % **, comparisons, ``and``/``or``/``not``,
+``a if condition else b`` and the functions in FUNCTIONS. ``category`` can
+only be compared with string constants (``category == "Weapons"``,
+``category in ("Armor", "Tools")``), which is how per-category formulas
+are written. Nothing is ever passed to eval.
+
+Compiling turns the syntax tree into a tree of closures over NumPy ufuncs,
+so evaluating a formula costs a handful of array operations however many
+items there are. ``compile_formula`` caches the compiled formulas by
+expression.
+"""
+import ast
+import functools
+from collections import namedtuple
+
+import numpy as np
+
+from balancing.store import COST_INPUT_FIELDS
+
+# The item fields a formula can read
+FORMULA_FIELDS = COST_INPUT_FIELDS
+
+# Longer expressions are rejected before parsing
+MAX_FORMULA_LENGTH = 2000
+
+STANDARD_FORMULA = "success_rate * efficiency / 10000 * cost_max"
+
+# name -> (ufunc, number of arguments)
+FUNCTIONS = {
+    "abs": (np.abs, 1),
+    "sqrt": (np.sqrt, 1),
+    "exp": (np.exp, 1),
+    "log": (np.log, 1),
+    "log10": (np.log10, 1),
+    "floor": (np.floor, 1),
+    "ceil": (np.ceil, 1),
+    "round": (np.round, 1),
+    "min": (np.minimum, 2),
+    "max": (np.maximum, 2),
+    "clip": (np.clip, 3),
+    "where": (np.where, 3),
+}
+
+_BINARY = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+_UNARY = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+    ast.Not: np.logical_not,
+}
+_COMPARE = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+
+FormulaPreset = namedtuple("FormulaPreset", "expression parameters")
+
+# Formulas offered in the app, with the default values of their parameters
+FORMULA_PRESETS = {
+    "Standard": FormulaPreset(STANDARD_FORMULA, {}),
+    "Resource premiums": FormulaPreset(
+        "success_rate * efficiency / 10000 * cost_max"
+        " * (1 + (tech_components * tech_premium + energy_sources * energy_premium) / 100)",
+        {"tech_premium": 0.5, "energy_premium": 0.25},
+    ),
+    "Exponential": FormulaPreset(
+        "(success_rate * efficiency / 10000) ** exponent * cost_max",
+        {"exponent": 1.5},
+    ),
+    "Tiered": FormulaPreset(
+        "success_rate * efficiency / 10000 * cost_max"
+        " * (top_tier if success_rate * efficiency >= 6400"
+        " else mid_tier if success_rate * efficiency >= 2500 else 1)",
+        {"top_tier": 1.5, "mid_tier": 1.2},
+    ),
+    "Per category": FormulaPreset(
+        "success_rate * efficiency / 10000 * cost_max"
+        " * (weapon_markup if category in ('Weapons', 'Armor') else 1)",
+        {"weapon_markup": 1.3},
+    ),
+}
+
+
+class FormulaError(ValueError):
+    """A cost formula that doesn't parse or uses something not allowed."""
+
+
+class CostFormula:
+    """A validated cost formula and its compiled evaluation plan.
+
+    ``fields`` are the item fields the formula reads, ``parameters`` the
+    other names it uses (including ``cost_max``), both sorted.
+    ``proportional_to_cost_max`` tells whether scaling cost_max scales every
+    cost by the same factor, so costs can be stored for cost_max = 1.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        if len(self.expression) > MAX_FORMULA_LENGTH:
+            raise FormulaError(f"formulas are limited to {MAX_FORMULA_LENGTH} characters")
+        self._names = set()
+        try:
+            tree = ast.parse(self.expression, mode="eval").body
+            self._plan = self._compile(tree)
+        except SyntaxError as exc:
+            raise FormulaError(f"invalid syntax: {exc.msg}") from None
+        except RecursionError:
+            raise FormulaError("the formula is nested too deeply") from None
+        self.fields = sorted(name for name in self._names if name in FORMULA_FIELDS)
+        self.parameters = sorted(name for name in self._names if name not in FORMULA_FIELDS)
+        self.proportional_to_cost_max = _proportional(tree, "cost_max")
+
+    def __repr__(self):
+        return f"CostFormula({self.expression!r})"
+
+    def evaluate(self, columns, parameters, categories=(), count=None):
+        """Costs of the items as a float64 array.
+
+        ``columns`` maps the item fields to arrays (category as codes into
+        ``categories``), ``parameters`` maps parameter names to numbers.
+        ``count`` is the number of items, needed only if the formula reads no
+        field. Items for which the formula is undefined (a division by zero,
+        the log of a negative number) cost 0.
+
+        Columns and parameters may also be arrays that broadcast against
+        each other, such as (scenarios x items) rates and a (scenarios x 1)
+        cost_max; the result then has the broadcast shape.
+        """
+        missing = [name for name in self.parameters if name not in parameters]
+        if missing:
+            raise FormulaError(f"no value for {', '.join(missing)}")
+        env = {name: np.asarray(parameters[name], dtype=np.float64) for name in self.parameters}
+        env.update((field, columns[field]) for field in self.fields)
+        env["__categories__"] = list(categories)
+        if count is None:
+            count = np.shape(columns[self.fields[0]])[-1] if self.fields else 1
+        with np.errstate(all="ignore"):
+            costs = np.asarray(self._plan(env), dtype=np.float64)
+        costs = np.broadcast_to(costs, np.broadcast_shapes(costs.shape, (count,)))
+        return np.where(np.isfinite(costs), costs, 0.0)
+
+    # ------------------------------------------------------------------
+    # Compilation: every node becomes a function of the environment
+    # ------------------------------------------------------------------
+    def _compile(self, node):
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+                value = float(node.value)
+                return lambda env: value
+            raise FormulaError(f"unexpected constant {node.value!r}")
+        if isinstance(node, ast.Name):
+            if node.id == "category":
+                raise FormulaError('category can only be compared with category names, as in category == "Weapons"')
+            if node.id in FUNCTIONS or node.id.startswith("_"):
+                raise FormulaError(f"{node.id!r} can't be used as a value")
+            name = node.id
+            self._names.add(name)
+            return lambda env: env[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            func = _BINARY[type(node.op)]
+            left, right = self._compile(node.left), self._compile(node.right)
+            return lambda env: func(left(env), right(env))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            func = _UNARY[type(node.op)]
+            operand = self._compile(node.operand)
+            return lambda env: func(operand(env))
+        if isinstance(node, ast.BoolOp):
+            func = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            values = [self._compile(value) for value in node.values]
+            return lambda env: functools.reduce(func, (value(env) for value in values))
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+        if isinstance(node, ast.IfExp):
+            test, body, orelse = self._compile(node.test), self._compile(node.body), self._compile(node.orelse)
+            return lambda env: np.where(test(env), body(env), orelse(env))
+        if isinstance(node, ast.Call):
+            return self._compile_call(node)
+        raise FormulaError(f"{type(node).__name__} expressions are not allowed")
+
+    def _compile_call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            allowed = ", ".join(sorted(FUNCTIONS))
+            raise FormulaError(f"unknown function (allowed: {allowed})")
+        func, arity = FUNCTIONS[node.func.id]
+        if node.keywords or len(node.args) != arity:
+            raise FormulaError(f"{node.func.id}() takes {arity} argument{'s' if arity > 1 else ''}")
+        args = [self._compile(arg) for arg in node.args]
+        return lambda env: func(*(arg(env) for arg in args))
+
+    def _compile_compare(self, node):
+        operands = [node.left] + list(node.comparators)
+        tests = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if _is_category(left) or _is_category(right):
+                tests.append(self._compile_category_test(op, left, right))
+            elif type(op) in _COMPARE:
+                tests.append(_comparison(_COMPARE[type(op)], self._compile(left), self._compile(right)))
+            else:
+                raise FormulaError("in / not in only work with category")
+        if len(tests) == 1:
+            return tests[0]
+        return lambda env: functools.reduce(np.logical_and, (test(env) for test in tests))
+
+    def _compile_category_test(self, op, left, right):
+        other = right if _is_category(left) else left
+        if isinstance(op, (ast.Eq, ast.NotEq)) and _is_string(other):
+            names = [other.value]
+        elif isinstance(op, (ast.In, ast.NotIn)) and _is_category(left) and isinstance(other, (ast.Tuple, ast.List)) \
+                and all(_is_string(element) for element in other.elts):
+            names = [element.value for element in other.elts]
+        else:
+            raise FormulaError('category can only be compared with category names, as in category == "Weapons"')
+        self._names.add("category")
+        negate = isinstance(op, (ast.NotEq, ast.NotIn))
+
+        def test(env):
+            categories = env["__categories__"]
+            codes = [categories.index(name) for name in names if name in categories]
+            matches = np.isin(env["category"], codes)
+            return ~matches if negate else matches
+        return test
+
+
+def _uses(node, name):
+    return any(isinstance(child, ast.Name) and child.id == name for child in ast.walk(node))
+
+
+def _proportional(node, name):
+    """Whether ``node`` is f(...) * ``name`` for some f that doesn't use ``name``
+    (for positive values of ``name``)."""
+    if isinstance(node, ast.Name):
+        return node.id == name
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Mult):
+            return ((_proportional(node.left, name) and not _uses(node.right, name))
+                    or (_proportional(node.right, name) and not _uses(node.left, name)))
+        if isinstance(node.op, ast.Div):
+            return _proportional(node.left, name) and not _uses(node.right, name)
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            return _proportional(node.left, name) and _proportional(node.right, name)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _proportional(node.operand, name)
+    if isinstance(node, ast.IfExp):
+        return (not _uses(node.test, name)
+                and _proportional(node.body, name) and _proportional(node.orelse, name))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        args = node.args
+        if node.func.id in ("min", "max", "abs"):
+            return all(_proportional(arg, name) for arg in args)
+        if node.func.id == "where" and len(args) == 3:
+            return not _uses(args[0], name) and _proportional(args[1], name) and _proportional(args[2], name)
+    return False
+
+
+def _comparison(func, left, right):
+    return lambda env: func(left(env), right(env))
+
+
+def _is_category(node):
+    return isinstance(node, ast.Name) and node.id == "category"
+
+
+def _is_string(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_formula(expression):
+    """The CostFormula of ``expression``, compiled once per expression.
+
+    Raises FormulaError if the expression isn't a valid formula.
+    """
+    return CostFormula(expression)
+
+
+def preset_name(expression):
+    """Name of the preset with this expression, or None for a custom formula."""
+    expression = expression.strip()
+    for name, preset in FORMULA_PRESETS.items():
+        if preset.expression == expression:
+            return name
+    return None
@@ -0,0 +1,208 @@
+"""Incremental import of item JSON files of any size.
+
+``iter_json_items`` reads the file in chunks and yields the items of either
+accepted layout (a top-level list, or an object with an "items" list) one
+at a time, so only one chunk plus one item is ever held as text.
+``import_items`` validates them in batches and appends each batch straight
+to an ItemStore.
+"""
+import io
+import json
+import re
+
+from balancing.store import FLOAT_FIELDS, ItemStore
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_BATCH_SIZE = 5000
+# An item that doesn't fit in this many characters is treated as malformed
+MAX_ITEM_CHARS = 16 << 20
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+_NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+# What raw_decode leaves of a number cut off by the chunk end ("1." of "1.5")
+_NUMBER_TAIL = re.compile(r"\.|[eE][+-]?")
+
+
+class _ChunkReader:
+    """A text buffer over a file that is refilled one chunk at a time."""
+
+    def __init__(self, fh, chunk_size):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read one more chunk; return False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character ("" at the end)."""
+        while True:
+            match = _NON_WHITESPACE.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            found = self.peek() or "end of file"
+            raise ValueError(f"expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def value(self, decoder):
+        """Decode the next JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if len(self.buffer) - self.pos > MAX_ITEM_CHARS or not self.fill():
+                    raise
+                continue
+            if end < len(self.buffer) and self.buffer[end] in _DELIMITERS:
+                self.pos = end
+                return value
+            # A value up to the chunk end may go on in the next chunk ("12" of
+            # "12.5"), and so may a number followed by a partial fraction or
+            # exponent; anything else after a value is an error
+            if end == len(self.buffer):
+                if len(self.buffer) - self.pos > MAX_ITEM_CHARS:
+                    raise ValueError(f"a JSON value is longer than {MAX_ITEM_CHARS} characters")
+                if not self.fill():
+                    self.pos = end
+                    return value
+            elif isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and _NUMBER_TAIL.fullmatch(self.buffer, end) and self.fill():
+                continue
+            else:
+                raise ValueError(f"unexpected {self.buffer[end]!r} after a JSON value")
+
+
+def iter_json_items(fh, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the items of a JSON item file without loading it as a whole.
+
+    ``fh`` is a text or binary file object holding a list of items or an
+    object with an "items" list. Raises ValueError for any other layout.
+    """
+    wrapper = None
+    if not isinstance(fh, io.TextIOBase):
+        fh = wrapper = io.TextIOWrapper(fh, encoding="utf-8-sig")
+    try:
+        yield from _iter_items(_ChunkReader(fh, chunk_size), json.JSONDecoder())
+    finally:
+        if wrapper is not None:
+            # Don't let the wrapper close the caller's file
+            wrapper.detach()
+
+
+def _iter_items(reader, decoder):
+    first = reader.peek()
+    if first == "{":
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise ValueError("the JSON object has no 'items' list")
+            key = reader.value(decoder)
+            reader.expect(":")
+            if key == "items" and reader.peek() == "[":
+                break
+            reader.value(decoder)  # skip other members
+            if reader.peek() == ",":
+                reader.expect(",")
+    elif first != "[":
+        raise ValueError("expected a list of items or an object with an 'items' list")
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value(decoder)
+        if reader.peek() == "]":
+            return
+        reader.expect(",")
+
+
+class ImportStats:
+    """Progress of an import: accepted and rejected items, bytes read."""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.bytes_read = 0
+
+
+def validate_item(item, default_category):
+    """Return ``item`` ready for the store, or None if it must be rejected.
+
+    An item needs an item_name; numeric fields must be numbers (or numeric
+    strings). A missing category becomes ``default_category``.
+    """
+    if not isinstance(item, dict) or "item_name" not in item:
+        return None
+    for field in FLOAT_FIELDS:
+        value = item.get(field)
+        if value is None or type(value) in (float, int):
+            continue
+        if isinstance(value, bool):
+            return None
+        try:
+            item[field] = float(value)
+        except (TypeError, ValueError):
+            return None
+    if "category" not in item:
+        item["category"] = default_category
+    return item
+
+
+def import_items(fh, categories=None, default_category=None, batch_size=DEFAULT_BATCH_SIZE,
+                 chunk_size=DEFAULT_CHUNK_SIZE, on_progress=None):
+    """Import a JSON item file into a new ItemStore.
+
+    Items are validated and appended in batches of ``batch_size``; after
+    each batch ``on_progress(stats)`` is called. Returns (store, stats).
+    """
+    store = ItemStore(categories=categories)
+    if default_category is None:
+        default_category = categories[0] if categories else ""
+    stats = ImportStats()
+    batch = []
+
+    def flush():
+        store.extend(batch)
+        stats.accepted += len(batch)
+        stats.bytes_read = _bytes_read(fh)
+        batch.clear()
+        if on_progress is not None:
+            on_progress(stats)
+
+    for seen, item in enumerate(iter_json_items(fh, chunk_size), 1):
+        item = validate_item(item, default_category)
+        if item is None:
+            stats.rejected += 1
+        else:
+            batch.append(item)
+        if seen % batch_size == 0:
+            flush()
+    flush()
+    return store, stats
+
+
+def _bytes_read(fh):
+    try:
+        return fh.tell()
+    except (OSError, ValueError):
+        return 0
@@ -0,0 +1,251 @@
+"""In-memory lookup indexes over the columns of an ItemStore.
+
+The store owns one ``ItemIndex`` and keeps it up to date on every mutation.
+Appends, single-row edits and deletes are applied incrementally; only the
+first fill of an empty store and the occasional compaction rebuild it from
+the store's columns.
+
+Rows are tracked by *slot*: the position a row had when it was indexed.
+Deleting rows only records their slots as tombstones, and a slot's current
+position is its slot minus the number of tombstones before it. Once the
+tombstones reach a quarter of the rows the store rebuilds the index, which
+keeps deletes amortized O(log n) on top of the store's own compaction.
+"""
+import numpy as np
+
+# Tombstones tolerated before a rebuild, at least this many or a quarter of the rows
+_MIN_TOMBSTONES = 1024
+
+
+class _Buffer:
+    """A NumPy array that grows by doubling, so appends are amortized O(1).
+
+    ``view()`` hands out the filled part; later appends never change what an
+    earlier view shows.
+    """
+
+    def __init__(self, dtype, values=None):
+        values = np.empty(0, dtype=dtype) if values is None else np.asarray(values, dtype=dtype)
+        self._array = values
+        self.size = len(values)
+
+    def extend(self, values):
+        needed = self.size + len(values)
+        if needed > len(self._array):
+            grown = np.empty(max(needed, 2 * len(self._array), 16), dtype=self._array.dtype)
+            grown[:self.size] = self._array[:self.size]
+            self._array = grown
+        self._array[self.size:needed] = values
+        self.size = needed
+
+    def view(self):
+        return self._array[:self.size]
+
+
+class _Category:
+    """Slots of the rows of one category.
+
+    Slots are appended as rows join; rows that leave are only noted in
+    ``removed``. The sorted positions are materialized on the next read
+    after a change and then extended in place by plain appends.
+    """
+
+    def __init__(self, slots):
+        self.slots = _Buffer(np.intp, slots)
+        self.removed = set()
+        self.ordered = True
+        self.positions = None
+        self.tombstones = 0
+
+    def add(self, slots, tombstones):
+        if self.ordered and self.slots.size and slots[0] < self.slots.view()[-1]:
+            self.ordered = False
+        self.slots.extend(slots)
+        if self.positions is not None and self.ordered and not self.removed \
+                and self.tombstones == len(tombstones) and (not len(tombstones) or slots[0] > tombstones[-1]):
+            # Slots after every tombstone: their positions just follow
+            self.positions.extend(slots - len(tombstones))
+        else:
+            self.positions = None
+
+
+class ItemIndex:
+    """id -> position, name -> ids and category code -> positions lookups.
+
+    Ids are kept as a sorted id array plus the matching slots, so a lookup
+    is one binary search. Category members are sorted position arrays that
+    the filter hands out as-is. The name index is only built on first use.
+    """
+
+    def __init__(self):
+        self.rebuild(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32))
+
+    def rebuild(self, ids, codes):
+        """Rebuild every index from the store's id and category columns."""
+        order = np.argsort(ids, kind="stable")
+        self._sorted_ids = _Buffer(np.int64, ids[order])
+        self._id_slots = _Buffer(np.intp, order)
+        self._slot_count = len(ids)
+        self._tombstones = np.empty(0, dtype=np.intp)
+
+        self._categories = {}
+        if len(codes):
+            by_code = np.argsort(codes, kind="stable")
+            sorted_codes = codes[by_code]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            for start, stop in zip(starts, np.r_[starts[1:], len(codes)]):
+                self._categories[int(sorted_codes[start])] = _Category(by_code[start:stop])
+
+        # The name index is rebuilt lazily on the next name lookup
+        self._ids_by_name = None
+
+    def clear(self):
+        self.rebuild(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32))
+
+    # ------------------------------------------------------------------
+    # Slots and positions
+    # ------------------------------------------------------------------
+    def _slots_of(self, positions):
+        """Slots of the rows now at ``positions``."""
+        positions = np.asarray(positions, dtype=np.intp)
+        if not len(self._tombstones):
+            return positions
+        # The p-th live slot is p plus the tombstones at or before it
+        shifted = self._tombstones - np.arange(len(self._tombstones))
+        return positions + np.searchsorted(shifted, positions, side="right")
+
+    def _positions_of_slots(self, slots):
+        return slots - np.searchsorted(self._tombstones, slots)
+
+    def _dead(self, slots):
+        if not len(self._tombstones):
+            return np.zeros(len(slots), dtype=bool)
+        at = np.minimum(np.searchsorted(self._tombstones, slots), len(self._tombstones) - 1)
+        return self._tombstones[at] == slots
+
+    def compaction_due(self):
+        """Whether enough rows were deleted that a rebuild pays off."""
+        return len(self._tombstones) > max(_MIN_TOMBSTONES, (self._slot_count - len(self._tombstones)) // 4)
+
+    # ------------------------------------------------------------------
+    # Changes
+    # ------------------------------------------------------------------
+    def append(self, start, ids, names, codes):
+        """Index rows appended at positions ``start .. start + len(ids)``."""
+        slots = np.arange(self._slot_count, self._slot_count + len(ids), dtype=np.intp)
+        self._slot_count += len(ids)
+        order = np.argsort(ids, kind="stable")
+        if not self._sorted_ids.size or not len(ids) or ids[order[0]] > self._sorted_ids.view()[-1]:
+            self._sorted_ids.extend(ids[order])
+            self._id_slots.extend(slots[order])
+        else:
+            # Imported ids below the current maximum: merge them in, dropping
+            # deleted rows so a reused id can't be shadowed by its old entry
+            sorted_ids, id_slots = self._sorted_ids.view(), self._id_slots.view()
+            live = ~self._dead(id_slots)
+            merged_ids = np.r_[sorted_ids[live], ids]
+            merged = np.argsort(merged_ids, kind="stable")
+            self._sorted_ids = _Buffer(np.int64, merged_ids[merged])
+            self._id_slots = _Buffer(np.intp, np.r_[id_slots[live], slots][merged])
+
+        for code in np.unique(codes).tolist():
+            added = slots[codes == code]
+            category = self._categories.get(code)
+            if category is None:
+                self._categories[code] = _Category(added)
+            else:
+                category.add(added, self._tombstones)
+
+        if self._ids_by_name is not None:
+            for name, item_id in zip(names.tolist(), ids.tolist()):
+                self._ids_by_name.setdefault(name, set()).add(item_id)
+
+    def rename(self, item_id, old_name, new_name):
+        if self._ids_by_name is None or old_name == new_name:
+            return
+        self._forget_name(item_id, old_name)
+        self._ids_by_name.setdefault(new_name, set()).add(item_id)
+
+    def _forget_name(self, item_id, name):
+        ids = self._ids_by_name.get(name)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del self._ids_by_name[name]
+
+    def recategorize(self, position, old_code, new_code):
+        if old_code == new_code:
+            return
+        slot = int(self._slots_of([position])[0])
+        old = self._categories.get(old_code)
+        if old is not None:
+            old.removed.add(slot)
+            old.positions = None
+        new = self._categories.get(new_code)
+        if new is None:
+            self._categories[new_code] = _Category([slot])
+        elif slot in new.removed:
+            # Moving back: the slot is still in the list
+            new.removed.discard(slot)
+            new.positions = None
+        else:
+            new.add(np.array([slot], dtype=np.intp), self._tombstones)
+
+    def delete(self, positions, ids, names):
+        """Forget the rows at ``positions`` (sorted, before the store removed them)."""
+        slots = self._slots_of(positions)
+        self._tombstones = np.union1d(self._tombstones, slots).astype(np.intp)
+        if self._ids_by_name is not None:
+            for item_id, name in zip(ids.tolist(), names.tolist()):
+                self._forget_name(item_id, name)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def positions_of(self, ids):
+        """Return the positions of ``ids``; unknown ids map to -1."""
+        ids = np.asarray(ids, dtype=np.int64)
+        sorted_ids = self._sorted_ids.view()
+        if not len(sorted_ids):
+            return np.full(ids.shape, -1, dtype=np.intp)
+        at = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        slots = self._id_slots.view()[at]
+        found = (sorted_ids[at] == ids) & ~self._dead(slots.ravel()).reshape(slots.shape)
+        return np.where(found, self._positions_of_slots(slots), -1)
+
+    def contains(self, ids):
+        """Return a boolean mask telling which of ``ids`` are indexed."""
+        return self.positions_of(ids) >= 0
+
+    def category_positions(self, code):
+        """Sorted positions of the items with category ``code`` (do not modify)."""
+        category = self._categories.get(code)
+        if category is None:
+            return np.empty(0, dtype=np.intp)
+        tombstones = len(self._tombstones)
+        if category.positions is None or category.tombstones != tombstones:
+            slots = category.slots.view()
+            keep = ~self._dead(slots)
+            if category.removed:
+                keep &= ~np.isin(slots, np.fromiter(category.removed, dtype=np.intp, count=len(category.removed)))
+            slots = slots[keep]
+            if not category.ordered:
+                slots = np.sort(slots)
+            category.slots = _Buffer(np.intp, slots)
+            category.removed = set()
+            category.ordered = True
+            category.positions = _Buffer(np.intp, self._positions_of_slots(slots))
+            category.tombstones = tombstones
+        return category.positions.view()
+
+    def ids_named(self, name, names, ids):
+        """Return the set of ids of the items called ``name``.
+
+        ``names`` and ``ids`` are the store's current columns, used to build
+        the name index the first time it is needed.
+        """
+        if self._ids_by_name is None:
+            self._ids_by_name = {}
+            for item_name, item_id in zip(names.tolist(), ids.tolist()):
+                self._ids_by_name.setdefault(item_name, set()).add(item_id)
+        return set(self._ids_by_name.get(name, ()))
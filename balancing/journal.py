@@ -0,0 +1,271 @@
+"""Append-only change journal for the JSON data file.
+
+In journaled storage mode the full catalog (the snapshot, data.json) is only
+written on compaction. In between, every add, edit and delete is appended as
+one compact JSON line to ``data.json.journal``; a write of numeric columns
+at a set of rows (such as a resource share repair) is one ``set`` line:
+
+    {"op":"add","item":{...}}
+    {"op":"update","id":12,"set":{"efficiency":42.0}}
+    {"op":"set","ids":[3,4],"set":{"metal":[60.0,35.0],"energy":[40.0,65.0]}}
+    {"op":"delete","ids":[3,4]}
+    {"op":"clear"}
+
+Loading replays the journal over the snapshot. Compaction first rotates the
+journal to ``data.json.journal.<n>`` (new changes go to a fresh journal),
+then writes the snapshot in the background and finally removes the rotated
+journals up to ``n``. A crash anywhere in between is safe: rotated journals
+are replayed too, and replaying entries that are already in the snapshot is
+harmless because adds are upserts by item_id and the other entries address ids.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from balancing.store import FLOAT32_DECIMALS, FLOAT_FIELDS, StoreListener
+
+# calculated_cost is derived from the other fields and recomputed on load
+DERIVED_FIELDS = {"calculated_cost"}
+
+DEFAULT_MAX_JOURNAL_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_JOURNAL_RECORDS = 50_000
+
+
+def journal_path_for(data_path):
+    """Return the journal file that belongs to ``data_path``."""
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.name + ".journal")
+
+
+def rotated_journals(data_path):
+    """Return the rotated journals of ``data_path`` as sorted (generation, path) pairs."""
+    journal_path = journal_path_for(data_path)
+    rotated = []
+    for path in journal_path.parent.glob(journal_path.name + ".*"):
+        suffix = path.name[len(journal_path.name) + 1:]
+        if suffix.isdigit():
+            rotated.append((int(suffix), path))
+    return sorted(rotated)
+
+
+class ChangeJournal:
+    """Journal file next to a data file, plus its rotated predecessors."""
+
+    def __init__(self, data_path, fsync=True):
+        self.data_path = Path(data_path)
+        self.path = journal_path_for(data_path)
+        self.fsync = fsync
+        self.records = 0
+        self.bytes = 0
+        if self.path.exists():
+            self.bytes = self.path.stat().st_size
+            with self.path.open("rb") as fh:
+                self.records = sum(1 for _ in fh)
+
+    def append(self, entries):
+        """Append entries (dicts) as JSON lines and make them durable."""
+        if not entries:
+            return
+        payload = "".join(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries
+        ).encode("utf-8")
+        with self.path.open("ab") as fh:
+            fh.write(payload)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        self.records += len(entries)
+        self.bytes += len(payload)
+
+    def needs_compaction(self, max_bytes=DEFAULT_MAX_JOURNAL_BYTES, max_records=DEFAULT_MAX_JOURNAL_RECORDS):
+        return self.bytes >= max_bytes or self.records >= max_records
+
+    def rotate(self):
+        """Move the current journal aside so a snapshot can absorb it.
+
+        Returns the generation number of the rotated file. Older rotated
+        journals whose snapshot hasn't finished yet are left alone.
+        """
+        rotated = rotated_journals(self.data_path)
+        generation = rotated[-1][0] + 1 if rotated else 1
+        if self.path.exists():
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.{generation}"))
+        self.records = 0
+        self.bytes = 0
+        return generation
+
+    def discard_rotated(self, generation):
+        """Remove the rotated journals up to ``generation`` once a snapshot holds them."""
+        for number, path in rotated_journals(self.data_path):
+            if number <= generation:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def discard_journals(data_path):
+    """Remove the journal files of ``data_path`` (after a full snapshot save)."""
+    paths = [path for _, path in rotated_journals(data_path)] + [journal_path_for(data_path)]
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def replay_journal(store, data_path):
+    """Apply the journal(s) of ``data_path`` to ``store``; return the entry count.
+
+    A truncated last line (crash during an append) is ignored.
+    """
+    paths = [path for _, path in rotated_journals(data_path)] + [journal_path_for(data_path)]
+    replayed = 0
+    for path in paths:
+        if not path.exists():
+            continue
+        with path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                apply_entry(store, entry)
+                replayed += 1
+    return replayed
+
+
+def apply_entry(store, entry):
+    """Apply one journal entry to ``store``."""
+    op = entry.get("op")
+    if op == "add":
+        item = entry["item"]
+        position = int(store.positions_of([item.get("item_id", 0)])[0])
+        if position >= 0:
+            store.update(position, item)
+        else:
+            store.add(item)
+    elif op == "update":
+        position = int(store.positions_of([entry["id"]])[0])
+        if position >= 0:
+            store.update(position, entry["set"])
+    elif op == "set":
+        positions = store.positions_of(entry["ids"])
+        found = positions >= 0
+        if found.any():
+            store.set_columns(
+                {field: np.asarray(values, dtype=np.float64)[found] for field, values in entry["set"].items()},
+                positions[found],
+            )
+    elif op == "delete":
+        positions = store.positions_of(entry["ids"])
+        store.delete(positions[positions >= 0])
+    elif op == "clear":
+        store.clear()
+
+
+class JournalRecorder(StoreListener):
+    """Turns store change notifications into journal entries.
+
+    Bulk writes of numeric columns at given rows become one ``set`` entry.
+    Other bulk changes to non-derived fields (whole columns, names or
+    categories) can't be journaled compactly; they set ``needs_snapshot`` so
+    the owner writes a full snapshot instead. The same happens if appending
+    to the journal fails.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.needs_snapshot = False
+        self.error = None
+
+    def _append(self, entries):
+        try:
+            self.journal.append(entries)
+        except OSError as e:
+            self.error = str(e)
+            self.needs_snapshot = True
+
+    def on_add(self, store, positions):
+        self._append([{"op": "add", "item": item} for item in store.to_records(positions)])
+
+    def on_update(self, store, position, before):
+        changed = {field: store.value(position, field) for field in before if field not in DERIVED_FIELDS}
+        if changed:
+            item_id = int(store.column("item_id")[position])
+            self._append([{"op": "update", "id": item_id, "set": changed}])
+
+    def on_delete(self, store, positions):
+        self._append([{"op": "delete", "ids": store.column("item_id", positions).tolist()}])
+
+    def on_clear(self, store):
+        self._append([{"op": "clear"}])
+
+    def on_bulk_change(self, store, fields, positions, before=None):
+        fields = [field for field in fields if field not in DERIVED_FIELDS]
+        if not fields:
+            return
+        if positions is None or not all(field in FLOAT_FIELDS for field in fields):
+            self.needs_snapshot = True
+            return
+        values = {}
+        for field in fields:
+            column = store.column(field, positions)
+            if column.dtype == np.float32:
+                column = column.astype(np.float64).round(FLOAT32_DECIMALS)
+            values[field] = column.tolist()
+        self._append([{"op": "set", "ids": store.column("item_id", positions).tolist(), "set": values}])
+
+
+class JournaledStorage:
+    """Journaled persistence of one store to ``data_path``.
+
+    Changes reach the journal as they happen (through the recorder). Call
+    ``commit`` after each user-level change: it attaches to a new store,
+    and writes a snapshot through ``saver`` (an AutoSaver) when one is due.
+    ``lock`` is the lock writers of the store hold: compaction rotates the
+    journal and copies the store under it, so the snapshot holds exactly the
+    changes of the rotated journals.
+    """
+
+    def __init__(self, saver, data_path, max_bytes=DEFAULT_MAX_JOURNAL_BYTES,
+                 max_records=DEFAULT_MAX_JOURNAL_RECORDS, lock=None):
+        self.saver = saver
+        self.lock = lock if lock is not None else threading.RLock()
+        self.journal = ChangeJournal(data_path)
+        self.recorder = JournalRecorder(self.journal)
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self._store = None
+
+    def attach(self, store, synced=False):
+        """Start journaling changes of ``store``.
+
+        ``synced`` says the store was just loaded from the snapshot and
+        journal on disk. Otherwise (sample data, import, a replaced catalog)
+        it can't be expressed as journal entries and a fresh snapshot is
+        written.
+        """
+        if self._store is not None:
+            self._store.remove_listener(self.recorder)
+        store.add_listener(self.recorder)
+        self._store = store
+        if not synced:
+            self.compact()
+
+    def commit(self, store):
+        """Record that ``store`` is the current catalog; compact if needed."""
+        if store is not self._store:
+            self.attach(store)
+        elif self.recorder.needs_snapshot or self.journal.needs_compaction(self.max_bytes, self.max_records):
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a new snapshot written in the background."""
+        with self.lock:
+            self.recorder.needs_snapshot = False
+            generation = self.journal.rotate()
+            self.saver.schedule(self._store, on_saved=lambda: self.journal.discard_rotated(generation))
@@ -0,0 +1,90 @@
+"""Where data.json lives, resolved once and remembered in a marker file.
+
+The candidate directories are tried in order: the Docker volume
+(``/app/data``, only if it is mounted), a directory in /tmp and one in the
+home directory. The first start probes them with a real write test and
+records the chosen data file in a small marker file; later starts only
+check that the recorded directory is still writable, without creating or
+writing anything. A stale marker (the directory is gone, or the Docker
+volume has appeared since) triggers a new probe.
+
+The marker lives next to the app, or in ITEM_BALANCING_STATE_DIR if that is
+set, so it survives restarts that wipe the temp directory.
+"""
+import os
+from pathlib import Path
+
+MARKER_NAME = ".item_balancing_tool.location"
+
+
+def default_marker():
+    """The marker file in ITEM_BALANCING_STATE_DIR, or in the app directory."""
+    state_dir = os.environ.get("ITEM_BALANCING_STATE_DIR")
+    directory = Path(state_dir) if state_dir else Path(__file__).resolve().parent.parent
+    return directory / MARKER_NAME
+
+
+def candidate_dirs():
+    """(directory, create) pairs in order of preference."""
+    candidates = [(Path("/app/data"), False), (Path("/tmp/item_balancing_data"), True)]
+    try:
+        candidates.append((Path.home() / ".item_balancing_tool", True))
+    except RuntimeError:
+        # No home directory could be determined
+        pass
+    return candidates
+
+
+def _writable(directory, create):
+    try:
+        if create:
+            directory.mkdir(exist_ok=True)
+        elif not directory.is_dir():
+            return False
+        test_file = directory / ".write_test"
+        test_file.touch()
+        test_file.unlink()
+        return True
+    except OSError:
+        return False
+
+
+def probe_data_file(fallback):
+    """Return data.json in the first writable candidate directory, or ``fallback``."""
+    for directory, create in candidate_dirs():
+        if _writable(directory, create):
+            return directory / "data.json"
+    return Path(fallback)
+
+
+def _remembered(marker):
+    try:
+        data_file = Path(marker.read_text(encoding="utf-8").strip())
+    except OSError:
+        return None
+    directory = data_file.parent
+    if not data_file.name or not directory.is_dir() or not os.access(directory, os.W_OK):
+        return None
+    # A preferred directory that must not be created (the Docker volume) may
+    # have been mounted since the marker was written
+    for candidate, create in candidate_dirs():
+        if candidate == directory:
+            break
+        if not create and candidate.is_dir():
+            return None
+    return data_file
+
+
+def resolve_data_file(fallback, marker=None):
+    """Return the data file path, probing the candidates only without a valid marker."""
+    marker = default_marker() if marker is None else Path(marker)
+    data_file = _remembered(marker)
+    if data_file is not None:
+        return data_file
+    data_file = probe_data_file(fallback)
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(str(data_file), encoding="utf-8")
+    except OSError:
+        pass
+    return data_file
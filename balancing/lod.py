@@ -0,0 +1,88 @@
+"""Level-of-detail reduction for the item scatter plots.
+
+Small catalogs are drawn as they are, with a text label per item. Past
+``webgl_threshold`` points the plots switch to WebGL markers and label only
+the top-ranked items (the others are named on hover). Past
+``density_threshold`` points the items are binned here, on the server, into
+a 2D density grid, and only the points in the sparsest cells (the outliers)
+are sent individually, so the payload is bounded by the grid size and
+``max_outliers`` rather than by the catalog size.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_WEBGL_THRESHOLD = 2000
+DEFAULT_DENSITY_THRESHOLD = 50000
+DEFAULT_LABEL_COUNT = 20
+DEFAULT_GRID_SIZE = 80
+DEFAULT_MAX_OUTLIERS = 1000
+
+DensityGrid = namedtuple("DensityGrid", "x_centers y_centers counts outliers")
+
+
+def scatter_mode(count, webgl_threshold=DEFAULT_WEBGL_THRESHOLD, density_threshold=DEFAULT_DENSITY_THRESHOLD):
+    """How to draw ``count`` points: "svg", "webgl" or "density"."""
+    if count > density_threshold:
+        return "density"
+    if count > webgl_threshold:
+        return "webgl"
+    return "svg"
+
+
+def top_positions(scores, count):
+    """Row offsets of the ``count`` highest scores, highest first (NaNs last)."""
+    scores = np.nan_to_num(np.asarray(scores, dtype=np.float64), nan=-np.inf)
+    if count <= 0:
+        return np.empty(0, dtype=np.intp)
+    if count < len(scores):
+        candidates = np.argpartition(-scores, count - 1)[:count]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _edges(values, value_range, bins):
+    if value_range is None:
+        low, high = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    else:
+        low, high = value_range
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+    return float(low), float(high)
+
+
+def density_grid(x, y, x_range=None, y_range=None, bins=DEFAULT_GRID_SIZE, max_outliers=DEFAULT_MAX_OUTLIERS):
+    """Bin the points into a ``bins`` x ``bins`` grid.
+
+    ``counts`` is indexed [y bin, x bin], as a heatmap's z. ``outliers``
+    are the row offsets of at most ``max_outliers`` points from the
+    sparsest non-empty cells. Points outside the ranges count towards the
+    edge cells; points with a NaN coordinate are left out.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    rows = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    x, y = x[rows], y[rows]
+    x_low, x_high = _edges(x, x_range, bins)
+    y_low, y_high = _edges(y, y_range, bins)
+
+    x_bins = np.clip(((x - x_low) * (bins / (x_high - x_low))).astype(np.intp), 0, bins - 1)
+    y_bins = np.clip(((y - y_low) * (bins / (y_high - y_low))).astype(np.intp), 0, bins - 1)
+    cells = y_bins * bins + x_bins
+    counts = np.bincount(cells, minlength=bins * bins)
+
+    if len(rows) > max_outliers:
+        sparsest = np.argsort(counts[cells], kind="stable")[:max_outliers]
+        outliers = rows[np.sort(sparsest)]
+    else:
+        outliers = rows
+
+    x_step = (x_high - x_low) / bins
+    y_step = (y_high - y_low) / bins
+    return DensityGrid(
+        x_low + x_step * (np.arange(bins) + 0.5),
+        y_low + y_step * (np.arange(bins) + 0.5),
+        counts.reshape(bins, bins),
+        outliers,
+    )
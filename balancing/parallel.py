@@ -0,0 +1,171 @@
+"""Balance analysis of large catalogs on several cores.
+
+``AnalysisPool.analyze`` gives the same BalanceReport as engine.analyze,
+but splits the items into row-range shards that are analyzed in a thread
+(or process) pool. Every shard returns partial results: a CatalogSummary
+(counts, means and co-moments), its best item per top-performer field and
+the positions of its rule hits. The parent merges them in shard order, so
+counts, rule hits and top performers (including ties, which go to the
+first item) match the serial analysis exactly, and the means and
+correlation up to floating-point rounding.
+
+Catalogs smaller than ``min_parallel_items`` are analyzed serially, where
+shipping the shards would cost more than it saves, and so is everything on
+a single usable CPU.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from balancing.engine import (
+    CATEGORY_STATS_FIELDS,
+    BalanceReport,
+    add_scores,
+    analyze,
+    balance_score,
+    overpowered,
+    underpowered,
+    underused_resources,
+)
+from balancing.store import RESOURCE_FIELDS
+from balancing.summary import SUMMARY_FIELDS, CatalogSummary
+
+DEFAULT_MIN_PARALLEL_ITEMS = 200_000
+TOP_FIELDS = ("efficiency", "success_rate", "power_level")
+
+
+def usable_cpus():
+    """Number of CPUs this process may run on (its affinity mask, where known)."""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        # No affinity masks on this platform (macOS, Windows)
+        return os.cpu_count() or 1
+
+
+def _analyze_shard(offset, codes, names, columns):
+    """Partial analysis of one shard; positions are offset into the whole catalog.
+
+    ``columns`` holds one array per SUMMARY_FIELDS, ``codes`` index ``names``.
+    """
+    summary = CatalogSummary()
+    summary.add_columns(codes, names, columns)
+    column = dict(zip(SUMMARY_FIELDS, columns))
+    best = {}
+    for field in TOP_FIELDS:
+        values = column[field]
+        if len(values) and not np.isnan(values).all():
+            position = int(np.nanargmax(values))
+            best[field] = (float(values[position]), offset + position)
+    rates = (column["success_rate"], column["efficiency"], column["calculated_cost"])
+    return (summary, best,
+            offset + np.flatnonzero(overpowered(*rates)),
+            offset + np.flatnonzero(underpowered(*rates)))
+
+
+class AnalysisPool:
+    """A reusable pool of ``workers`` threads (or processes) for balance analysis.
+
+    ``workers`` defaults to the number of usable CPUs. Threads share the frame,
+    while processes need every shard pickled to them, which cost more than
+    it saved in benchmarks/bench_parallel.py. Processes are started with
+    "spawn", which is safe from a multi-threaded server, and only on the
+    first parallel analysis.
+    """
+
+    def __init__(self, workers=None, kind="thread", min_parallel_items=DEFAULT_MIN_PARALLEL_ITEMS):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"unknown pool kind {kind!r}")
+        self.workers = workers or usable_cpus()
+        self.kind = kind
+        self.min_parallel_items = min_parallel_items
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def analyze(self, df, cost_max=None):
+        """engine.analyze, run on the pool for large catalogs."""
+        if self.workers <= 1 or len(df) < self.min_parallel_items:
+            return analyze(df, cost_max)
+        if cost_max is not None or not {"performance_score", "power_level"} <= set(df.columns):
+            df = add_scores(df.copy(), cost_max)
+
+        categorical = isinstance(df["category"].dtype, pd.CategoricalDtype)
+        if categorical:
+            codes, categories = df["category"].cat.codes.to_numpy(), df["category"].cat.categories
+        else:
+            codes, categories = pd.factorize(df["category"].fillna(""))
+        categories = list(categories)
+        columns = [
+            df[field].to_numpy(dtype=np.float64) if field in df else np.zeros(len(df))
+            for field in SUMMARY_FIELDS
+        ]
+
+        # Threads share the arrays; processes get their row range pickled
+        bounds = np.linspace(0, len(df), self.workers + 1).astype(int)
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_analyze_shard, int(start), codes[start:stop], categories,
+                            [values[start:stop] for values in columns])
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return self._merge(df, categorical, categories, [future.result() for future in futures])
+
+    @staticmethod
+    def _merge(df, categorical, categories, parts):
+        summary = CatalogSummary()
+        best = {}
+        for part_summary, part_best, _, _ in parts:
+            summary.merge(part_summary)
+            for field, (value, position) in part_best.items():
+                # Shards come in row order, so ties keep the first item like idxmax
+                if field not in best or value > best[field][0]:
+                    best[field] = (value, position)
+        over = np.concatenate([part[2] for part in parts])
+        under = np.concatenate([part[3] for part in parts])
+
+        means = dict(zip(SUMMARY_FIELDS, summary.overall.mean))
+        # Same category order as a groupby: categorical order, else sorted names
+        names = [name for name in categories if name in summary.categories]
+        if not categorical:
+            names.sort()
+        stats = pd.DataFrame({
+            "category": names,
+            "count": [summary.categories[name].count for name in names],
+        })
+        for i, field in enumerate(SUMMARY_FIELDS):
+            if field in CATEGORY_STATS_FIELDS:
+                stats[field] = [summary.categories[name].mean[i] for name in names]
+        if categorical:
+            stats["category"] = pd.Categorical(stats["category"], categories=categories)
+
+        correlation = summary.cost_performance.correlation()
+        return BalanceReport(
+            item_count=summary.count,
+            mean_success_rate=float(means["success_rate"]),
+            mean_efficiency=float(means["efficiency"]),
+            mean_cost=float(means["calculated_cost"]),
+            overpowered=list(df.index[over]),
+            underpowered=list(df.index[under]),
+            underused_resources=underused_resources({field: means[field] for field in RESOURCE_FIELDS}),
+            correlation=correlation,
+            balance_score=balance_score(correlation),
+            overperforming=summary.overperforming,
+            underperforming=summary.underperforming,
+            top_performers={field: df.index[position] for field, (_, position) in best.items()},
+            category_stats=stats,
+        )
@@ -0,0 +1,216 @@
+"""Crash-safe file writes and the background auto-saver."""
+import atexit
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def write_json_atomic(path, data):
+    """Write ``data`` as JSON to ``path`` without ever exposing a partial file."""
+    def write(fh):
+        text = io.TextIOWrapper(fh, encoding="utf-8")
+        json.dump(data, text, indent=2, ensure_ascii=False)
+        text.flush()
+        text.detach()
+
+    write_atomic(path, write)
+
+
+def write_atomic(path, write):
+    """Replace ``path`` with what ``write(fh)`` writes to a binary file object.
+
+    The data goes to a temp file in the same directory, is fsynced, and then
+    ``os.replace``d over ``path``, so readers see either the old or the new
+    file. The directory is fsynced too so the rename survives a crash.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates the file as 0600; keep the permissions of the file we replace
+        try:
+            os.chmod(tmp_name, path.stat().st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_name, 0o644)
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory):
+    # Not supported on Windows; the rename itself is still atomic there
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SaveStatus:
+    """Snapshot of what the auto-saver is doing, for display in the UI."""
+
+    def __init__(self, state="idle", path=None, items=0, saved_at=None, latency=None,
+                 coalesced=0, error=None):
+        self.state = state          # idle, pending, saving, saved or failed
+        self.path = path            # file the last successful save went to
+        self.items = items          # number of items in the last save
+        self.saved_at = saved_at    # time.time() of the last successful save
+        self.latency = latency      # seconds the last save took
+        self.coalesced = coalesced  # save requests folded into the last write
+        self.error = error          # message of the last failure
+
+    def copy(self):
+        return SaveStatus(**vars(self))
+
+
+class AutoSaver:
+    """Write-behind saver that persists item store snapshots on a worker thread.
+
+    ``schedule`` only copies the store (cheap array copies) and returns. The
+    worker waits until no new request has arrived for ``debounce`` seconds
+    (but never longer than ``max_delay`` after the first one), so a burst of
+    edits becomes a single write of the latest snapshot. Writes are atomic;
+    if ``path`` can't be written, ``fallback_path`` is tried.
+    """
+
+    def __init__(self, path, debounce=1.0, max_delay=None, fallback_path=None):
+        self.path = Path(path)
+        self.fallback_path = Path(fallback_path) if fallback_path else None
+        self.debounce = float(debounce)
+        self.max_delay = float(max_delay) if max_delay is not None else max(10 * self.debounce, 5.0)
+        self._cond = threading.Condition()
+        self._pending = None
+        self._on_saved = []
+        self._requests = 0
+        self._first_request = None
+        self._last_request = None
+        self._writing = False
+        self._flushing = False
+        self._status = SaveStatus(path=self.path)
+        self._thread = threading.Thread(target=self._run, name="item-auto-saver", daemon=True)
+        self._thread.start()
+        # Don't lose the last burst of edits when the process exits normally
+        atexit.register(self.flush, 5.0)
+
+    def schedule(self, store, on_saved=None, lock=None):
+        """Queue a snapshot of ``store``; replaces any snapshot not yet written.
+
+        ``on_saved`` is called (on the worker thread) once a snapshot at least
+        as new as this one has been written to ``path`` itself. ``lock`` is
+        the lock writers of ``store`` hold; the copy is taken under it so a
+        concurrent change can't leave the snapshot half-applied.
+        """
+        if lock is not None:
+            with lock:
+                snapshot = store.copy()
+        else:
+            snapshot = store.copy()
+        with self._cond:
+            now = time.monotonic()
+            if self._pending is None:
+                self._first_request = now
+            self._pending = snapshot
+            if on_saved is not None:
+                self._on_saved.append(on_saved)
+            self._requests += 1
+            self._last_request = now
+            if not self._writing:
+                self._status.state = "pending"
+            self._cond.notify_all()
+
+    def status(self):
+        """Return a copy of the current SaveStatus."""
+        with self._cond:
+            return self._status.copy()
+
+    def flush(self, timeout=None):
+        """Write any pending snapshot right away and wait for it.
+
+        Returns False if the write did not finish within ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            try:
+                while self._pending is not None or self._writing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing = False
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                # Debounce: keep absorbing requests until the burst is over
+                while not self._flushing:
+                    deadline = min(self._last_request + self.debounce, self._first_request + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                snapshot, coalesced, on_saved = self._pending, self._requests, self._on_saved
+                self._pending = None
+                self._on_saved = []
+                self._requests = 0
+                self._writing = True
+                self._status.state = "saving"
+
+            status = self._write(snapshot, coalesced)
+            if status.state == "saved" and status.path == self.path:
+                for callback in on_saved:
+                    try:
+                        callback()
+                    except Exception as e:
+                        status.error = f"post-save step failed: {e}"
+
+            with self._cond:
+                self._writing = False
+                if self._pending is not None:
+                    status.state = "pending"
+                self._status = status
+                self._cond.notify_all()
+
+    def _write(self, snapshot, coalesced):
+        start = time.perf_counter()
+        records = snapshot.to_records()
+        errors = []
+        for path in [self.path, self.fallback_path]:
+            if path is None:
+                continue
+            try:
+                write_json_atomic(path, records)
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+                continue
+            return SaveStatus(
+                state="saved", path=path, items=len(records), saved_at=time.time(),
+                latency=time.perf_counter() - start, coalesced=coalesced
+            )
+        failed = self._status.copy()
+        failed.state = "failed"
+        failed.error = "; ".join(errors)
+        return failed
@@ -0,0 +1,100 @@
+"""Repair of resource shares that don't add up to 100%.
+
+The Add New Items form keeps the six resource sliders at 100%, but imported
+and edited items can drift off. ``plan_repair`` finds every item whose
+shares (with negative or missing shares counted as 0) are more than
+``tolerance`` points off 100 with one vectorized row sum over the share
+matrix, and computes their repaired shares with one of REPAIR_STRATEGIES:
+
+- ``proportional``: scale all shares by 100 / total;
+- ``dominant``: add the remainder (100 - total) to the largest share, or
+  rescale proportionally when an excess would use up that whole share;
+- ``snap``: rescale proportionally, then round every share to a multiple of
+  ``step`` so they still add up to exactly 100 (largest remainder first).
+
+Items without any resource share can't be repaired and are left alone.
+``SharedCatalog.repair_resources`` writes a repair to the catalog.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from balancing.costs import resource_shares
+
+DEFAULT_TOLERANCE = 0.1
+# Six float32 shares rounded to FLOAT32_DECIMALS can miss 100 by about 3e-4,
+# so a smaller tolerance would flag items that do add up
+MIN_TOLERANCE = 1e-3
+DEFAULT_STEP = 5.0
+
+# strategy -> label shown in the app
+REPAIR_STRATEGIES = {
+    "proportional": "Proportional rescale",
+    "dominant": "Remainder into dominant resource",
+    "snap": "Snap to step size",
+}
+
+# Shares of the items at ``positions`` as (n x 6) matrices in RESOURCE_FIELDS
+# order, before and after the repair; ``unrepairable`` are the positions of
+# items without any share
+ResourceRepair = namedtuple("ResourceRepair", "positions before after unrepairable")
+
+
+def off_total(shares, tolerance=DEFAULT_TOLERANCE):
+    """Boolean mask of the rows of ``shares`` that need a repair.
+
+    A row needs one if its total is more than ``tolerance`` (at least
+    MIN_TOLERANCE) off 100 or if it has a negative or non-finite share.
+    """
+    tolerance = max(tolerance, MIN_TOLERANCE)
+    shares = np.asarray(shares, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        return (np.abs(shares.sum(axis=1) - 100) > tolerance) \
+            | ~np.isfinite(shares).all(axis=1) | (shares < 0).any(axis=1)
+
+
+def repair_shares(shares, strategy="proportional", step=DEFAULT_STEP):
+    """Repaired copy of the (n x 6) ``shares``; rows that add up to 0 stay 0."""
+    if strategy not in REPAIR_STRATEGIES:
+        raise ValueError(f"unknown repair strategy {strategy!r}")
+    units = 100 / step if step > 0 else 0
+    if strategy == "snap" and (step <= 0 or abs(units - round(units)) > 1e-9):
+        raise ValueError(f"the step must divide 100, not {step}")
+    shares = np.nan_to_num(np.asarray(shares, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0).clip(0, None)
+    totals = shares.sum(axis=1, keepdims=True)
+    proportional = np.divide(shares * 100, totals, out=np.zeros_like(shares), where=totals > 0)
+    if strategy == "proportional":
+        return proportional
+    if strategy == "dominant":
+        rows = np.arange(len(shares))
+        dominant = shares.argmax(axis=1)
+        repaired = shares.copy()
+        repaired[rows, dominant] += 100 - totals[:, 0]
+        # An excess that eats the whole dominant share would zero it (or worse)
+        fallback = (repaired[rows, dominant] <= 0) | (totals[:, 0] <= 0)
+        repaired[fallback] = proportional[fallback]
+        return repaired
+
+    scaled = proportional / step
+    snapped = np.floor(scaled)
+    missing = np.where(totals[:, 0] > 0, round(units) - snapped.sum(axis=1), 0)
+    # Rank the shares by the part floor() cut off; the largest get a step back
+    order = np.argsort(snapped - scaled, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(shares.shape[1]), axis=1)
+    return (snapped + (rank < missing[:, np.newaxis])) * step
+
+
+def plan_repair(store, strategy="proportional", tolerance=DEFAULT_TOLERANCE, step=DEFAULT_STEP, positions=None):
+    """The ResourceRepair of the items of ``store`` (or of ``positions``) off 100%."""
+    shares = resource_shares(store, positions)
+    rows = np.flatnonzero(off_total(shares, tolerance))
+    selected = rows if positions is None else np.asarray(positions, dtype=np.intp)[rows]
+    before = shares[rows]
+    empty = ~(np.nan_to_num(before).clip(0, None).sum(axis=1) > 0)
+    return ResourceRepair(
+        positions=selected[~empty],
+        before=before[~empty],
+        after=repair_shares(before[~empty], strategy, step),
+        unrepairable=selected[empty],
+    )
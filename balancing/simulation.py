@@ -0,0 +1,122 @@
+"""Monte Carlo simulation of item usage.
+
+Every use of an item succeeds with probability success_rate / 100 and then
+delivers efficiency / 100 units of value (nothing on a failure). An item is
+used ``trials`` times, grouped into sessions of ``session`` consecutive
+uses; the value per unit of calculated_cost of each session is what the
+variance and percentile bands describe.
+
+The uses are drawn as (uses x items) boolean arrays in blocks of
+``block_size`` elements and reduced right away to per-item histograms of
+the successes per session, so memory stays bounded for any number of
+trials. Items are seeded in fixed groups of STREAM_ITEMS by position, so a
+given seed gives the same results whatever the block size.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BLOCK_SIZE = 4_000_000
+DEFAULT_TRIALS = 10_000
+DEFAULT_SESSION = 100
+STREAM_ITEMS = 1024
+PERCENTILES = (5, 50, 95)
+
+BAND_FIELDS = [f"p{q}" for q in PERCENTILES]
+ITEM_RESULT_FIELDS = ["hit_rate", "expected_value", "value_per_cost", "variance"] + BAND_FIELDS
+CATEGORY_RESULT_FIELDS = ["count", "calculated_cost", "expected_value", "value_per_cost", "variance"] + BAND_FIELDS
+
+SimulationReport = namedtuple("SimulationReport", "items categories trials session seed")
+
+
+def _per_cost(value, cost):
+    """value / cost, NaN where the cost isn't positive."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cost > 0, value / cost, np.nan)
+
+
+def _band(histogram, sessions, q):
+    """Per row of ``histogram`` (session counts per number of successes), the
+    number of successes at percentile ``q`` (inverted CDF, like np.percentile)."""
+    return np.argmax(np.cumsum(histogram, axis=1) * 100 >= q * sessions, axis=1)
+
+
+def simulate(df, trials=DEFAULT_TRIALS, session=DEFAULT_SESSION, seed=0, block_size=DEFAULT_BLOCK_SIZE):
+    """Simulate ``trials`` uses of every item of ``df``; return a SimulationReport.
+
+    ``df`` needs success_rate, efficiency, calculated_cost and category.
+    ``items`` has ITEM_RESULT_FIELDS for every row of ``df`` (same index):
+    the observed success rate in percent, the mean value per use, that per
+    unit of cost, and the variance and percentile bands of the value per
+    cost over the sessions. ``categories`` has CATEGORY_RESULT_FIELDS per
+    category, taking each session of a category as the value of all its
+    items over their total cost. Items without a positive cost get NaN.
+    """
+    if session < 1 or trials < session or trials % session:
+        raise ValueError("trials must be a positive multiple of the session length")
+    count = len(df)
+    sessions = trials // session
+    probability = (df["success_rate"].to_numpy(dtype=np.float64).clip(0, 100) / 100).astype(np.float32)
+    value = df["efficiency"].to_numpy(dtype=np.float64) / 100
+    cost = df["calculated_cost"].to_numpy(dtype=np.float64)
+    codes, names = pd.factorize(df["category"].astype(object).fillna(""), sort=True)
+
+    hits = np.zeros(count, dtype=np.int64)
+    squares = np.zeros(count)
+    bands = np.zeros((len(PERCENTILES), count), dtype=np.int64)
+    # Value of every session summed per category
+    category_value = np.zeros((sessions, len(names)))
+    for start in range(0, count, STREAM_ITEMS):
+        stop = min(start + STREAM_ITEMS, count)
+        width = stop - start
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(start // STREAM_ITEMS,)))
+        onehot = np.zeros((width, len(names)))
+        onehot[np.arange(width), codes[start:stop]] = 1
+        onehot *= value[start:stop, np.newaxis] / session
+        histogram = np.zeros((width, session + 1), dtype=np.int64)
+        offsets = np.arange(width) * (session + 1)
+        # Whole sessions per block, so a block never splits one
+        rows = max(1, block_size // (width * session)) * session
+        for first in range(0, trials, rows):
+            uses = min(rows, trials - first)
+            draws = rng.random((uses, width), dtype=np.float32) < probability[start:stop]
+            successes = draws.reshape(uses // session, session, width).sum(axis=1, dtype=np.int64)
+            histogram += np.bincount((successes + offsets).ravel(), minlength=width * (session + 1)) \
+                .reshape(width, session + 1)
+            category_value[first // session:(first + uses) // session] += successes @ onehot
+        levels = np.arange(session + 1)
+        hits[start:stop] = histogram @ levels
+        squares[start:stop] = histogram @ (levels * levels)
+        for i, q in enumerate(PERCENTILES):
+            bands[i, start:stop] = _band(histogram, sessions, q)
+
+    # Session value per cost = successes / session * value / cost
+    scale = _per_cost(value, cost) / session
+    items = pd.DataFrame(index=df.index)
+    items["hit_rate"] = hits / trials * 100
+    items["expected_value"] = hits / trials * value
+    items["value_per_cost"] = _per_cost(items["expected_value"].to_numpy(), cost)
+    mean = hits / sessions
+    spread = (squares - sessions * mean * mean) / max(sessions - 1, 1)
+    items["variance"] = spread * scale * scale
+    for field, band in zip(BAND_FIELDS, bands):
+        items[field] = band * scale
+
+    category_cost = np.bincount(codes, weights=cost, minlength=len(names))
+    per_cost = _per_cost(category_value, category_cost)
+    categories = pd.DataFrame({
+        "category": names,
+        "count": np.bincount(codes, minlength=len(names)),
+        "calculated_cost": category_cost,
+        "expected_value": np.bincount(codes, weights=items["expected_value"].to_numpy(), minlength=len(names)),
+    })
+    categories["value_per_cost"] = _per_cost(categories["expected_value"].to_numpy(), category_cost)
+    categories["variance"] = per_cost.var(axis=0, ddof=1) if sessions > 1 else 0.0
+    if len(names):
+        for field, band in zip(BAND_FIELDS, np.percentile(per_cost, PERCENTILES, axis=0, method="inverted_cdf")):
+            categories[field] = band
+    else:
+        for field in BAND_FIELDS:
+            categories[field] = np.zeros(0)
+    return SimulationReport(items, categories, trials, session, seed)
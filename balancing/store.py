@@ -0,0 +1,572 @@
+"""Columnar, NumPy-backed storage for the item catalog.
+
+Instead of a list of dicts, every numeric item field lives in its own typed
+array and categories are stored as small integer codes into a category table.
+Item names are interned so repeated names share one string object.
+
+Every item carries a persistent integer ``item_id`` that is saved with it and
+survives save/load/import; lookups by id, name and category go through the
+store's ``ItemIndex``.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from balancing.indexes import ItemIndex
+
+
+RESOURCE_FIELDS = [
+    "metals_alloys", "synthetic_materials", "tech_components",
+    "energy_sources", "biomatter", "chemicals"
+]
+
+# success_rate/efficiency drive the cost formula and calculated_cost is an
+# absolute value, so they keep full precision. Resource shares are plain
+# percentages where float32 is more than enough.
+FLOAT_FIELDS = {
+    "success_rate": np.float64,
+    "efficiency": np.float64,
+    "calculated_cost": np.float64,
+}
+FLOAT_FIELDS.update({field: np.float32 for field in RESOURCE_FIELDS})
+
+ITEM_FIELDS = ["item_id", "item_name", "category"] + list(FLOAT_FIELDS)
+
+# Writes to these columns make calculated_cost stale for the touched rows:
+# every field a cost formula may read (see balancing.formulas)
+COST_INPUT_FIELDS = ("success_rate", "efficiency") + tuple(RESOURCE_FIELDS) + ("category",)
+
+# float32 keeps roughly 7 significant digits, so values up to 100% are exact
+# to about 4 decimals. Records are rounded to that to avoid 33.29999923...
+FLOAT32_DECIMALS = 4
+
+_MIN_CAPACITY = 16
+_MAX_ID = 2 ** 62
+
+
+class StoreListener:
+    """Base class for objects that follow the changes made to an ItemStore.
+
+    Hooks run after the change, except ``on_delete`` which runs before the
+    rows are removed so their values can still be read.
+    """
+
+    def on_add(self, store, positions):
+        """Items were appended at ``positions``."""
+
+    def on_update(self, store, position, before):
+        """One item changed; ``before`` maps each changed field to its old value."""
+
+    def on_delete(self, store, positions):
+        """The items at ``positions`` are about to be removed."""
+
+    def on_clear(self, store):
+        """All items were removed."""
+
+    def on_bulk_change(self, store, fields, positions, before=None):
+        """``fields`` were overwritten for ``positions`` (None means all rows).
+
+        For partial writes of numeric columns, ``before`` maps each field to
+        an array of its old values at ``positions``; otherwise it is None.
+        """
+
+    def on_rescale(self, store, field, factor):
+        """Every value of ``field`` was multiplied by ``factor`` (> 0)."""
+
+
+class ItemStore:
+    """Catalog of items stored as typed column arrays.
+
+    Rows are addressed by position (0 .. len(store) - 1). Every mutation bumps
+    ``version`` so callers can cache derived data per catalog version.
+
+    Rows whose cost inputs were written are flagged as cost-stale until a
+    cost engine calls ``mark_costs_fresh``; see ``balancing.costs``.
+
+    calculated_cost is stored as a cost factor times ``cost_scale``: the
+    column holds the factors and every read multiplies them by the scale, so
+    ``set_cost_scale`` rescales all costs in constant time. Values written
+    to calculated_cost are absolute costs and are divided by the scale.
+
+    Registered StoreListeners are told about every change. Listeners belong
+    to one store object and are not carried over by ``copy``.
+    """
+
+    def __init__(self, categories=None, capacity=0):
+        self._size = 0
+        self._capacity = max(int(capacity), _MIN_CAPACITY)
+        self._ids = np.zeros(self._capacity, dtype=np.int64)
+        self._next_id = 1
+        self._names = np.empty(self._capacity, dtype=object)
+        self._category_codes = np.zeros(self._capacity, dtype=np.int32)
+        self._columns = {
+            field: np.zeros(self._capacity, dtype=dtype)
+            for field, dtype in FLOAT_FIELDS.items()
+        }
+        self._stale_costs = np.zeros(self._capacity, dtype=bool)
+        self._has_stale_costs = False
+        self._cost_scale = 1.0
+        self._categories = []
+        self._category_lookup = {}
+        for category in categories or []:
+            self.category_code(category)
+        self._index = ItemIndex()
+        self._listeners = []
+        self.version = 0
+
+    @classmethod
+    def from_records(cls, records, categories=None):
+        """Build a store from a list of item dicts in one bulk pass."""
+        store = cls(categories=categories, capacity=len(records))
+        store.extend(records)
+        return store
+
+    @classmethod
+    def from_columns(cls, ids, names, category_codes, columns, categories, next_id=1):
+        """Build a store around existing column arrays without copying them.
+
+        The arrays (for example copy-on-write memory maps) become the store's
+        backing storage, so they must be writable. ``category_codes`` index
+        into ``categories``; ``columns`` maps every FLOAT_FIELDS field to its
+        array. Appending moves the store to freshly allocated arrays.
+        """
+        count = len(ids)
+        store = cls(categories=categories)
+        store._capacity = count
+        store._ids = np.asarray(ids, dtype=np.int64)
+        store._names = np.asarray(names, dtype=object)
+        store._category_codes = np.asarray(category_codes, dtype=np.int32)
+        store._columns = {field: np.asarray(columns[field], dtype=dtype) for field, dtype in FLOAT_FIELDS.items()}
+        store._stale_costs = np.zeros(count, dtype=bool)
+        store._size = count
+        store._next_id = max(int(next_id), int(store._ids.max()) + 1 if count else 1)
+        store._rebuild_index()
+        return store
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def cost_scale(self):
+        return self._cost_scale
+
+    # ------------------------------------------------------------------
+    # Category and name tables
+    # ------------------------------------------------------------------
+    @property
+    def categories(self):
+        """Category table; ``category codes`` index into this list."""
+        return list(self._categories)
+
+    @property
+    def next_id(self):
+        """The id the next added item without a usable item_id will get."""
+        return self._next_id
+
+    def category_code(self, category):
+        """Return the code for ``category``, adding it to the table if new."""
+        category = sys.intern(str(category))
+        code = self._category_lookup.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(category)
+            self._category_lookup[category] = code
+        return code
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+    def _reserve(self, size):
+        """Grow the backing arrays (amortized doubling) to hold ``size`` rows."""
+        if size <= self._capacity:
+            return
+        capacity = max(size, self._capacity * 2)
+
+        def grow(array):
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            return grown
+
+        self._ids = grow(self._ids)
+        self._names = grow(self._names)
+        self._category_codes = grow(self._category_codes)
+        self._columns = {field: grow(array) for field, array in self._columns.items()}
+        self._stale_costs = grow(self._stale_costs)
+        self._capacity = capacity
+
+    def _touch(self):
+        self.version += 1
+
+    def add_listener(self, listener):
+        """Register a StoreListener (registering the same one twice is a no-op)."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, hook, *args):
+        for listener in self._listeners:
+            getattr(listener, hook)(self, *args)
+
+    def _mark_costs_stale(self, index):
+        self._stale_costs[index] = True
+        self._has_stale_costs = True
+
+    def add(self, item):
+        """Append one item dict and return its position."""
+        self.extend([item])
+        return self._size - 1
+
+    def _assign_ids(self, records):
+        """Return ids for new records, keeping valid unused ``item_id`` values.
+
+        Records without an id, with an id already in the store, or repeating
+        an id earlier in the batch get a fresh one.
+        """
+        count = len(records)
+        ids = np.fromiter((_coerce_id(r.get("item_id")) for r in records), dtype=np.int64, count=count)
+        valid = ids > 0
+        valid &= ~self._index.contains(ids)
+        _, first = np.unique(ids, return_index=True)
+        repeated = np.ones(count, dtype=bool)
+        repeated[first] = False
+        valid &= ~repeated
+
+        if valid.any():
+            self._next_id = max(self._next_id, int(ids[valid].max()) + 1)
+        fresh = np.flatnonzero(~valid)
+        ids[fresh] = np.arange(self._next_id, self._next_id + len(fresh), dtype=np.int64)
+        self._next_id += len(fresh)
+        return ids
+
+    def extend(self, records):
+        """Append a list of item dicts and return their ids.
+
+        Missing numeric fields default to 0; see ``_assign_ids`` for item_id.
+        """
+        count = len(records)
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+        start, stop = self._size, self._size + count
+        self._reserve(stop)
+
+        ids = self._assign_ids(records)
+        self._ids[start:stop] = ids
+        self._names[start:stop] = [sys.intern(str(r.get("item_name", ""))) for r in records]
+        self._category_codes[start:stop] = np.fromiter(
+            (self.category_code(r.get("category", "")) for r in records),
+            dtype=np.int32, count=count
+        )
+        for field, array in self._columns.items():
+            array[start:stop] = self._stored(field, np.fromiter(
+                (r.get(field) or 0.0 for r in records), dtype=np.float64, count=count
+            ))
+        self._size = stop
+        if start == 0:
+            self._rebuild_index()
+        else:
+            self._index.append(start, ids, self._names[start:stop], self._category_codes[start:stop])
+        self._mark_costs_stale(slice(start, stop))
+        self._touch()
+        self._notify("on_add", np.arange(start, stop))
+        return ids
+
+    def update(self, position, changes):
+        """Update the fields in ``changes`` (a dict) for the item at ``position``."""
+        position = self._check_position(position)
+        before = {field: self.value(position, field) for field in changes if field in ITEM_FIELDS}
+        for field, value in changes.items():
+            if field == "item_name":
+                name = sys.intern(str(value))
+                self._index.rename(int(self._ids[position]), self._names[position], name)
+                self._names[position] = name
+            elif field == "category":
+                code = self.category_code(value)
+                self._index.recategorize(position, int(self._category_codes[position]), code)
+                self._category_codes[position] = code
+            elif field in self._columns:
+                self._columns[field][position] = self._stored(field, value if value is not None else 0.0)
+        if any(field in changes for field in COST_INPUT_FIELDS):
+            self._mark_costs_stale(position)
+        self._touch()
+        self._notify("on_update", position, before)
+
+    def value(self, position, field):
+        """Return one stored field of one item as a plain Python value."""
+        if field == "item_id":
+            return int(self._ids[position])
+        if field == "item_name":
+            return self._names[position]
+        if field == "category":
+            return self._categories[self._category_codes[position]]
+        return self._plain_values(field, [position]).item()
+
+    def changed_fields(self, position, changes):
+        """Return the part of ``changes`` that differs from the stored item.
+
+        Values are compared in the column's own dtype, so re-applying an edit
+        that is already stored yields an empty dict.
+        """
+        position = self._check_position(position)
+        changed = {}
+        for field, value in changes.items():
+            if field == "item_name":
+                differs = self._names[position] != str(value)
+            elif field == "category":
+                differs = self._categories[self._category_codes[position]] != str(value)
+            elif field in self._columns:
+                stored = self._read(field, [position], self._size)[0]
+                differs = self._columns[field].dtype.type(value if value is not None else 0.0) != stored
+            else:
+                continue
+            if differs:
+                changed[field] = value
+        return changed
+
+    def set_column(self, field, values, positions=None):
+        """Overwrite one numeric column, either entirely or at ``positions``."""
+        self._write_columns({field: self._stored(field, values)}, positions)
+
+    def set_columns(self, columns, positions=None):
+        """Overwrite several numeric columns (a dict of field -> values) in one change."""
+        self._write_columns({field: self._stored(field, values) for field, values in columns.items()}, positions)
+
+    def set_cost_factors(self, factors, positions=None):
+        """Overwrite the stored cost factors (calculated_cost = factor * cost_scale)."""
+        self._write_columns({"calculated_cost": factors}, positions)
+
+    def cost_factors(self, positions=None):
+        """Return the stored cost factors, without the cost scale applied."""
+        values = self._columns["calculated_cost"][:self._size]
+        if positions is None:
+            values = values.view()
+            values.flags.writeable = False
+            return values
+        return values[np.asarray(positions, dtype=np.intp)]
+
+    def _write_columns(self, columns, positions):
+        index = slice(0, self._size) if positions is None else np.asarray(positions, dtype=np.intp)
+        before = None
+        if positions is not None and self._listeners:
+            before = {field: self._read(field, index, self._size).astype(np.float64) for field in columns}
+        for field, stored in columns.items():
+            self._columns[field][index] = stored
+        if any(field in COST_INPUT_FIELDS for field in columns):
+            self._mark_costs_stale(index)
+        self._touch()
+        self._notify("on_bulk_change", list(columns), positions, before)
+
+    def set_cost_scale(self, scale):
+        """Multiply every calculated_cost by ``scale`` / ``cost_scale`` without touching the rows."""
+        scale = float(scale)
+        if not scale > 0:
+            raise ValueError(f"the cost scale must be positive, not {scale}")
+        if scale == self._cost_scale:
+            return
+        factor = scale / self._cost_scale
+        self._cost_scale = scale
+        self._touch()
+        self._notify("on_rescale", "calculated_cost", factor)
+
+    def _stored(self, field, values):
+        """``values`` of ``field`` as they are kept in the column."""
+        if field == "calculated_cost" and self._cost_scale != 1.0:
+            return np.asarray(values, dtype=np.float64) / self._cost_scale
+        return values
+
+    def delete(self, positions):
+        """Remove the items at ``positions``, keeping the order of the rest."""
+        positions = np.unique(np.asarray(positions, dtype=np.intp))
+        if len(positions) == 0:
+            return
+        self._notify("on_delete", positions)
+        self._index.delete(positions, self._ids[positions], self._names[positions])
+        keep = np.ones(self._size, dtype=bool)
+        keep[positions] = False
+        kept = int(keep.sum())
+        self._ids[:kept] = self._ids[:self._size][keep]
+        self._names[:kept] = self._names[:self._size][keep]
+        self._names[kept:self._size] = None
+        self._category_codes[:kept] = self._category_codes[:self._size][keep]
+        for array in self._columns.values():
+            array[:kept] = array[:self._size][keep]
+        self._stale_costs[:kept] = self._stale_costs[:self._size][keep]
+        self._stale_costs[kept:self._size] = False
+        self._size = kept
+        if self._index.compaction_due():
+            self._rebuild_index()
+        self._touch()
+
+    def clear(self):
+        """Remove all items (the category table is kept)."""
+        self._names[:self._size] = None
+        self._stale_costs[:self._size] = False
+        self._has_stale_costs = False
+        self._size = 0
+        self._index.clear()
+        self._touch()
+        self._notify("on_clear")
+
+    def stale_cost_positions(self):
+        """Positions whose cost inputs changed since the last ``mark_costs_fresh``."""
+        if not self._has_stale_costs:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self._stale_costs[:self._size])
+
+    def mark_costs_fresh(self):
+        """Clear the cost-stale flags once calculated_cost has been recomputed."""
+        if self._has_stale_costs:
+            self._stale_costs[:self._size] = False
+            self._has_stale_costs = False
+
+    def _rebuild_index(self):
+        self._index.rebuild(self._ids[:self._size], self._category_codes[:self._size])
+
+    def _check_position(self, position):
+        position = int(position)
+        if position < 0 or position >= self._size:
+            raise IndexError(f"item position {position} out of range for {self._size} items")
+        return position
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def filter(self, category=None):
+        """Return the sorted positions of the items in ``category`` (do not modify).
+
+        Served from the category index, so no scan over the catalog happens.
+        """
+        if category is None:
+            return np.arange(self._size)
+        code = self._category_lookup.get(category)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return self._index.category_positions(code)
+
+    def position_of(self, item_id):
+        """Return the position of the item with ``item_id``."""
+        position = int(self._index.positions_of([item_id])[0])
+        if position < 0:
+            raise KeyError(f"no item with id {item_id}")
+        return position
+
+    def positions_of(self, item_ids):
+        """Return the positions of ``item_ids`` as an array; unknown ids give -1."""
+        return self._index.positions_of(item_ids)
+
+    def ids_named(self, name):
+        """Return the set of ids of the items called ``name``."""
+        return self._index.ids_named(name, self._names[:self._size], self._ids[:self._size])
+
+    def column(self, field, positions=None):
+        """Return a read-only view of a column (or a copy gathered at ``positions``).
+
+        calculated_cost is returned as a new array with the cost scale applied.
+        """
+        return self._read(field, positions, self._size)
+
+    def _read(self, field, positions, size):
+        # Readers that gather several columns pass the size they saw first, so
+        # an append from another thread can't give them columns of different lengths
+        if field == "item_id":
+            array = self._ids
+        elif field == "item_name":
+            array = self._names
+        elif field == "category_code":
+            array = self._category_codes
+        else:
+            array = self._columns[field]
+        if positions is not None:
+            values = array[:size][np.asarray(positions, dtype=np.intp)]
+        else:
+            values = array[:size].view()
+            values.flags.writeable = False
+        if field == "calculated_cost" and self._cost_scale != 1.0:
+            values = values * self._cost_scale
+            if positions is None:
+                values.flags.writeable = False
+        return values
+
+    def get(self, position):
+        """Return the item at ``position`` as a plain dict."""
+        return self.to_records([self._check_position(position)])[0]
+
+    def to_records(self, positions=None):
+        """Return items as a list of plain dicts (the JSON file layout)."""
+        size = self._size
+        columns = {
+            "item_id": self._read("item_id", positions, size).tolist(),
+            "item_name": self._read("item_name", positions, size).tolist(),
+            "category": [self._categories[c] for c in self._read("category_code", positions, size).tolist()],
+        }
+        for field in FLOAT_FIELDS:
+            columns[field] = self._plain_values(field, positions, size).tolist()
+        return [dict(zip(ITEM_FIELDS, row)) for row in zip(*(columns[f] for f in ITEM_FIELDS))]
+
+    def _plain_values(self, field, positions=None, size=None):
+        values = self._read(field, positions, self._size if size is None else size)
+        if values.dtype == np.float32:
+            values = values.astype(np.float64).round(FLOAT32_DECIMALS)
+        return values
+
+    def view_frame(self, positions=None):
+        """Return a DataFrame for charts and analysis.
+
+        For the whole catalog the frame wraps the store's arrays without
+        copying; the columns are read-only. Category is a Categorical over the
+        store's category table.
+        """
+        size = self._size
+        codes = self._read("category_code", positions, size)
+        data = {
+            "item_id": self._read("item_id", positions, size),
+            "item_name": self._read("item_name", positions, size),
+            "category": pd.Categorical.from_codes(codes, categories=self._categories),
+        }
+        for field in FLOAT_FIELDS:
+            data[field] = self._read(field, positions, size)
+        return pd.DataFrame(data, copy=False)
+
+    def to_frame(self, positions=None):
+        """Return an editable DataFrame copy with plain Python-friendly dtypes."""
+        size = self._size
+        data = {
+            "item_id": self._read("item_id", positions, size),
+            "item_name": self._read("item_name", positions, size).astype(object),
+            "category": np.array(self._categories, dtype=object)[self._read("category_code", positions, size)],
+        }
+        for field in FLOAT_FIELDS:
+            data[field] = self._plain_values(field, positions, size)
+        return pd.DataFrame(data)
+
+    def copy(self):
+        """Return an independent copy of this store."""
+        size = self._size
+        clone = ItemStore(categories=self._categories, capacity=size)
+        clone._ids[:size] = self._ids[:size]
+        clone._next_id = self._next_id
+        clone._names[:size] = self._names[:size]
+        clone._category_codes[:size] = self._category_codes[:size]
+        for field, array in self._columns.items():
+            clone._columns[field][:size] = array[:size]
+        clone._stale_costs[:size] = self._stale_costs[:size]
+        clone._has_stale_costs = self._has_stale_costs
+        clone._cost_scale = self._cost_scale
+        clone._size = size
+        clone._rebuild_index()
+        clone.version = self.version
+        return clone
+
+
+def _coerce_id(value):
+    """Return ``value`` as a positive int id, or 0 if it isn't usable as one."""
+    if isinstance(value, bool):
+        return 0
+    try:
+        item_id = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return item_id if 0 < item_id < _MAX_ID and item_id == value else 0
@@ -0,0 +1,219 @@
+"""One-pass, mergeable balance statistics of a catalog.
+
+A ``CatalogSummary`` is fed the items chunk by chunk and keeps only counts,
+means and sums of squared deviations (combined with the pairwise update of
+Chan et al.), so its size doesn't depend on the number of items. Summaries
+of disjoint parts of a catalog merge into the summary of the whole, so
+shards can be scored independently and combined afterwards.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from balancing.engine import (
+    CATEGORY_STATS_FIELDS,
+    balance_score,
+    ideal_line_counts,
+    overpowered,
+    underpowered,
+    underused_resources,
+)
+from balancing.store import RESOURCE_FIELDS
+
+SUMMARY_FIELDS = CATEGORY_STATS_FIELDS + RESOURCE_FIELDS
+
+
+class Moments:
+    """Count, means and sums of squared deviations of ``width`` columns."""
+
+    def __init__(self, width):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+
+    def add(self, values):
+        """Add the rows of an (n x width) array."""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        mean = values.mean(axis=0)
+        deviations = values - mean
+        self._combine(len(values), mean, (deviations * deviations).sum(axis=0))
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta * delta * (self.count * count / total)
+        self.count = total
+
+    def std(self):
+        """Sample standard deviations (NaN with fewer than two rows)."""
+        if self.count < 2:
+            return np.full(len(self.mean), np.nan)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+
+class Comoments:
+    """Mergeable accumulator of the Pearson correlation of two columns."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def add(self, x, y):
+        """Add paired values; pairs with a NaN are skipped."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        valid = np.isfinite(x) & np.isfinite(y)
+        x, y = x[valid], y[valid]
+        if len(x) == 0:
+            return
+        mean_x, mean_y = x.mean(), y.mean()
+        dx, dy = x - mean_x, y - mean_y
+        self._combine(len(x), mean_x, mean_y, (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum())
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean_x, other.mean_y, other.m2_x, other.m2_y, other.c_xy)
+
+    def _combine(self, count, mean_x, mean_y, m2_x, m2_y, c_xy):
+        total = self.count + count
+        dx = mean_x - self.mean_x
+        dy = mean_y - self.mean_y
+        weight = self.count * count / total
+        self.mean_x += dx * count / total
+        self.mean_y += dy * count / total
+        self.m2_x += m2_x + dx * dx * weight
+        self.m2_y += m2_y + dy * dy * weight
+        self.c_xy += c_xy + dx * dy * weight
+        self.count = total
+
+    def correlation(self):
+        """NaN for fewer than two pairs or a constant column, like engine.correlation."""
+        denominator = math.sqrt(self.m2_x * self.m2_y)
+        if self.count < 2 or denominator == 0:
+            return float("nan")
+        return float(self.c_xy / denominator)
+
+
+class CatalogSummary:
+    """Balance statistics of all items added so far (see the module docstring)."""
+
+    def __init__(self):
+        self.overall = Moments(len(SUMMARY_FIELDS))
+        self.categories = {}
+        self.cost_performance = Comoments()
+        self.overpowered = 0
+        self.underpowered = 0
+        self.overperforming = 0
+        self.underperforming = 0
+
+    @property
+    def count(self):
+        return self.overall.count
+
+    def add(self, df):
+        """Add a chunk of items: a DataFrame with category and SUMMARY_FIELDS.
+
+        The scores are expected to be there already (engine.add_scores).
+        """
+        category = df["category"]
+        if not isinstance(category.dtype, pd.CategoricalDtype):
+            category = category.fillna("")
+        codes, names = pd.factorize(category)
+        self.add_columns(codes, list(names), [df[field].to_numpy(dtype=np.float64) for field in SUMMARY_FIELDS])
+
+    def add_columns(self, codes, names, columns):
+        """Add items given as codes into the category ``names`` and one array per SUMMARY_FIELDS.
+
+        Per-category moments come from bincount, so the cost doesn't grow
+        with the number of categories. Negative codes (missing categories)
+        count towards the category "".
+        """
+        codes = np.asarray(codes, dtype=np.intp)
+        if len(codes) == 0:
+            return
+        if codes.min() < 0:
+            codes = np.where(codes < 0, len(names), codes)
+            names = list(names) + [""]
+        width = len(names)
+        counts = np.bincount(codes, minlength=width)
+        divisors = np.maximum(counts, 1)
+        overall_mean = np.empty(len(columns))
+        overall_m2 = np.empty(len(columns))
+        group_mean = np.empty((width, len(columns)))
+        group_m2 = np.empty((width, len(columns)))
+        for i, values in enumerate(columns):
+            values = np.asarray(values, dtype=np.float64)
+            overall_mean[i] = values.mean()
+            deviations = values - overall_mean[i]
+            overall_m2[i] = np.dot(deviations, deviations)
+            group_mean[:, i] = np.bincount(codes, weights=values, minlength=width) / divisors
+            deviations = values - group_mean[codes, i]
+            group_m2[:, i] = np.bincount(codes, weights=deviations * deviations, minlength=width)
+        self.overall._combine(len(codes), overall_mean, overall_m2)
+        for code in np.flatnonzero(counts):
+            self.categories.setdefault(names[code], Moments(len(SUMMARY_FIELDS)))._combine(
+                int(counts[code]), group_mean[code], group_m2[code]
+            )
+
+        column = dict(zip(SUMMARY_FIELDS, columns))
+        rates = (column["success_rate"], column["efficiency"], column["calculated_cost"])
+        self.cost_performance.add(column["calculated_cost"], column["performance_score"])
+        self.overpowered += int(overpowered(*rates).sum())
+        self.underpowered += int(underpowered(*rates).sum())
+        over, under = ideal_line_counts(column["performance_score"], column["calculated_cost"])
+        self.overperforming += over
+        self.underperforming += under
+
+    def merge(self, other):
+        """Fold ``other`` (a summary of different items) into this one."""
+        self.overall.merge(other.overall)
+        for name, moments in other.categories.items():
+            self.categories.setdefault(name, Moments(len(SUMMARY_FIELDS))).merge(moments)
+        self.cost_performance.merge(other.cost_performance)
+        self.overpowered += other.overpowered
+        self.underpowered += other.underpowered
+        self.overperforming += other.overperforming
+        self.underperforming += other.underperforming
+
+    def report(self):
+        """The statistics as a JSON-ready dict (NaN becomes None)."""
+        means = dict(zip(SUMMARY_FIELDS, self.overall.mean.tolist()))
+        resource_means = {field: means[field] for field in RESOURCE_FIELDS}
+        correlation = self.cost_performance.correlation()
+        categories = {}
+        for name, moments in self.categories.items():
+            stats = {"count": moments.count}
+            stats.update(zip(SUMMARY_FIELDS, moments.mean.tolist()))
+            stats.update(zip([f"{field}_std" for field in SUMMARY_FIELDS], moments.std().tolist()))
+            categories[name] = stats
+        return _json_ready({
+            "items": self.count,
+            "means": means if self.count else {},
+            "overpowered": self.overpowered,
+            "underpowered": self.underpowered,
+            "overperforming": self.overperforming,
+            "underperforming": self.underperforming,
+            "underused_resources": underused_resources(resource_means) if self.count else [],
+            "cost_performance_correlation": correlation,
+            "balance_score": balance_score(correlation),
+            "categories": categories,
+        })
+
+
+def _json_ready(value):
+    if isinstance(value, dict):
+        return {key: _json_ready(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_ready(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
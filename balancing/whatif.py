@@ -0,0 +1,221 @@
+"""What-if sweeps of the global balance parameters.
+
+A sweep scores the whole catalog under many scenarios at once. Every
+scenario sets cost_max and multiplies the success rate and efficiency of
+one category (or of all items) by a factor; the buffed rates are clipped to
+0-100. The scenarios are evaluated as (scenarios x items) arrays in blocks
+of ``block_size`` elements, so a sweep is a few dozen NumPy passes whatever
+the number of scenarios, and memory stays bounded.
+
+Per scenario the result holds the mean cost, the cost-performance
+correlation and balance score, the overpowered/underpowered counts, the
+items off the ideal balance line and the mean power level of every
+category: the numbers the Balance Analysis and Advanced Metrics tabs show
+for the live catalog.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from balancing.costs import calculate_cost
+from balancing.engine import (
+    IDEAL_TOLERANCE,
+    balance_score,
+    overpowered,
+    performance_score,
+    power_level,
+    underpowered,
+)
+
+DEFAULT_BLOCK_SIZE = 4_000_000
+SCENARIO_FIELDS = ["cost_max", "category", "success_multiplier", "efficiency_multiplier"]
+RESULT_FIELDS = [
+    "mean_cost", "correlation", "balance_score", "overpowered", "underpowered",
+    "overperforming", "underperforming",
+]
+
+
+def scenario_grid(cost_max_values, success_multipliers=(1.0,), efficiency_multipliers=(1.0,), category=None):
+    """Every combination of the given values as a scenario table.
+
+    The multipliers apply to ``category``, or to all items if it is None
+    (stored as "").
+    """
+    rows = itertools.product(cost_max_values, success_multipliers, efficiency_multipliers)
+    return pd.DataFrame(
+        [(float(cost_max), category or "", float(success), float(efficiency))
+         for cost_max, success, efficiency in rows],
+        columns=SCENARIO_FIELDS,
+    )
+
+
+def _row_correlation(x, y):
+    """Pearson correlation of every row of x with the same row of y."""
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    denominator = np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, (x * y).sum(axis=1) / denominator, np.nan)
+
+
+class Sweep:
+    """A catalog prepared for what-if sweeps.
+
+    ``df`` needs success_rate, efficiency and category, plus the fields read
+    by ``formula`` (a CostFormula; None for the standard formula), which is
+    evaluated with ``parameters`` and each scenario's cost_max.
+    """
+
+    def __init__(self, df, formula=None, parameters=None, block_size=DEFAULT_BLOCK_SIZE):
+        category = df["category"]
+        if isinstance(category.dtype, pd.CategoricalDtype):
+            codes, categories = category.cat.codes.to_numpy(), list(category.cat.categories)
+        else:
+            codes, categories = pd.factorize(category.fillna(""))
+            categories = list(categories)
+        if len(codes) and codes.min() < 0:
+            # Missing categories of a Categorical count as the category ""
+            codes = np.where(codes < 0, len(categories), codes)
+            categories.append("")
+        # Items sorted by category, so per-category sums are one reduceat
+        order = np.argsort(codes, kind="stable")
+        self.codes = codes[order].astype(np.intp)
+        self.categories = categories
+        self.present = np.unique(self.codes)
+        self._starts = np.searchsorted(self.codes, self.present)
+        self._counts = np.diff(np.r_[self._starts, len(self.codes)])
+        self.success_rate = df["success_rate"].to_numpy(dtype=np.float64)[order]
+        self.efficiency = df["efficiency"].to_numpy(dtype=np.float64)[order]
+        self.formula = formula
+        self.parameters = dict(parameters or {})
+        self.columns = {}
+        if formula is not None:
+            for field in formula.fields:
+                if field not in ("success_rate", "efficiency", "category"):
+                    self.columns[field] = df[field].to_numpy(dtype=np.float64)[order]
+        self.block_size = block_size
+        self._order = order
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _multipliers(self, scenarios):
+        """(scenarios x categories) success and efficiency multipliers."""
+        count = len(scenarios)
+        success = np.ones((count, max(len(self.categories), 1)))
+        efficiency = np.ones_like(success)
+        targets = scenarios["category"].to_numpy()
+        for i, (target, s, e) in enumerate(zip(targets, scenarios["success_multiplier"],
+                                               scenarios["efficiency_multiplier"])):
+            if target:
+                if target not in self.categories:
+                    continue
+                k = self.categories.index(target)
+                success[i, k], efficiency[i, k] = s, e
+            else:
+                success[i], efficiency[i] = s, e
+        return success, efficiency
+
+    def rates(self, scenarios):
+        """(success_rate, efficiency) of the items under each scenario, in sweep order."""
+        success_mult, efficiency_mult = self._multipliers(scenarios)
+        success = np.clip(self.success_rate * success_mult[:, self.codes], 0, 100)
+        efficiency = np.clip(self.efficiency * efficiency_mult[:, self.codes], 0, 100)
+        return success, efficiency
+
+    def costs(self, success, efficiency, cost_max):
+        """Item costs for (scenarios x items) rates and a cost_max per scenario."""
+        cost_max = np.asarray(cost_max, dtype=np.float64)[:, np.newaxis]
+        if self.formula is None:
+            return calculate_cost(success, efficiency, cost_max)
+        columns = dict(self.columns, success_rate=success, efficiency=efficiency, category=self.codes)
+        return self.formula.evaluate(columns, dict(self.parameters, cost_max=cost_max),
+                                     self.categories, len(self))
+
+    def run(self, scenarios):
+        """Score every scenario; return the scenario table with the results added.
+
+        Besides RESULT_FIELDS there is one ``power: <category>`` column per
+        category with items (its mean power level).
+        """
+        scenarios = scenarios.reset_index(drop=True)
+        results = np.full((len(scenarios), len(RESULT_FIELDS)), np.nan)
+        power = np.full((len(scenarios), len(self.present)), np.nan)
+        if len(self) and len(scenarios):
+            if self.formula is None or self.formula.proportional_to_cost_max:
+                self._run_scaled(scenarios, results, power)
+            else:
+                for rows in self._blocks(np.arange(len(scenarios))):
+                    block = scenarios.iloc[rows]
+                    success, efficiency = self.rates(block)
+                    cost = self.costs(success, efficiency, block["cost_max"].to_numpy())
+                    results[rows], power[rows] = self._score(success, efficiency, cost)
+
+        table = scenarios.copy()
+        for i, field in enumerate(RESULT_FIELDS):
+            table[field] = results[:, i]
+        for field in ("overpowered", "underpowered", "overperforming", "underperforming"):
+            table[field] = table[field].fillna(0).astype(np.int64)
+        for j, code in enumerate(self.present):
+            table[f"power: {self.categories[code]}"] = power[:, j]
+        return table
+
+    def _blocks(self, rows):
+        """Split ``rows`` into runs of at most block_size / items rows."""
+        step = max(1, self.block_size // max(len(self), 1))
+        for start in range(0, len(rows), step):
+            yield rows[start:start + step]
+
+    def _run_scaled(self, scenarios, results, power):
+        """Costs proportional to cost_max: the rates, performance and cost at
+        cost_max = 1 are computed once per distinct set of multipliers and
+        only rescaled for each of its cost_max values."""
+        groups = scenarios.groupby(SCENARIO_FIELDS[1:], sort=False).indices
+        rates = pd.DataFrame(list(groups), columns=SCENARIO_FIELDS[1:])
+        rows_of_group = list(groups.values())
+        cost_max = scenarios["cost_max"].to_numpy(dtype=np.float64)
+        for block in self._blocks(np.arange(len(rates))):
+            success, efficiency = self.rates(rates.iloc[block])
+            factors = self.costs(success, efficiency, np.ones(len(block)))
+            # Scaling the costs doesn't change their correlation with performance
+            correlations = _row_correlation(factors, performance_score(success, efficiency))
+            for g, group in enumerate(block):
+                for rows in self._blocks(rows_of_group[group]):
+                    cost = factors[g] * cost_max[rows, np.newaxis]
+                    results[rows], power[rows] = self._score(success[g], efficiency[g], cost, correlations[g])
+
+    def _score(self, success, efficiency, cost, correlation=None):
+        """RESULT_FIELDS and category power of (scenarios x items) costs.
+
+        The rates may also be one row shared by all scenarios, with their
+        cost-performance ``correlation`` given.
+        """
+        performance = performance_score(success, efficiency)
+        if correlation is None:
+            correlation = _row_correlation(cost, performance)
+        correlation = np.broadcast_to(correlation, len(cost))
+        expected = cost * 100
+        results = np.column_stack([
+            cost.mean(axis=1),
+            correlation,
+            balance_score(correlation),
+            overpowered(success, efficiency, cost).sum(axis=1),
+            underpowered(success, efficiency, cost).sum(axis=1),
+            (performance > expected * (1 + IDEAL_TOLERANCE)).sum(axis=1),
+            (performance < expected * (1 - IDEAL_TOLERANCE)).sum(axis=1),
+        ])
+        # power_level is linear, so the category sums give the mean power
+        power_sums = power_level(*(np.add.reduceat(values, self._starts, axis=-1)
+                                   for values in (success, efficiency, cost)))
+        return results, power_sums / self._counts
+
+    def flagged(self, scenario):
+        """Row offsets (into the original ``df``) of the overpowered and
+        underpowered items under one scenario (a row of the scenario table)."""
+        block = pd.DataFrame([scenario])[SCENARIO_FIELDS]
+        success, efficiency = self.rates(block)
+        cost = self.costs(success, efficiency, block["cost_max"].to_numpy())
+        over = self._order[np.flatnonzero(overpowered(success[0], efficiency[0], cost[0]))]
+        under = self._order[np.flatnonzero(underpowered(success[0], efficiency[0], cost[0]))]
+        return np.sort(over), np.sort(under)
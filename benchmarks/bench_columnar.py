@@ -0,0 +1,49 @@
+"""
+Benchmark opening a catalog from data.json versus the memory-mapped columnar file.
+
+Usage: python benchmarks/bench_columnar.py [item_count]
+"""
+import json
+import os
+import sys
+import tempfile
+
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import ItemStore
+from balancing.columnar import load_columnar, save_columnar
+from balancing.persistence import write_json_atomic
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        columnar_path = os.path.join(directory, "data.npz")
+
+        def load_json():
+            with open(json_path, encoding="utf-8") as fh:
+                ItemStore.from_records(json.load(fh), categories=CATEGORIES)
+
+        def open_and_filter():
+            # Open, then touch one category the way a filtered view does
+            loaded = load_columnar(columnar_path, categories=CATEGORIES)
+            loaded.view_frame(loaded.filter("Weapons"))
+
+        write_seconds = timed(lambda: write_json_atomic(json_path, store.to_records()), repeat=1)
+        columnar_seconds = timed(lambda: save_columnar(store, columnar_path), repeat=1)
+        print(f"Catalog of {count:,} items: data.json {os.path.getsize(json_path) / 1e6:.1f} MB, "
+              f"data.npz {os.path.getsize(columnar_path) / 1e6:.1f} MB")
+        report([
+            ("write data.json", write_seconds),
+            ("write data.npz", columnar_seconds),
+            ("load data.json", timed(load_json, repeat=1)),
+            ("open data.npz (memory-mapped)", timed(lambda: load_columnar(columnar_path, categories=CATEGORIES))),
+            ("open data.npz + one category view", timed(open_and_filter)),
+        ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the batch cost engine against the old per-item calculate_cost loop.
+
+Usage: python benchmarks/bench_cost_engine.py [item_count]
+"""
+import sys
+
+from common import make_records, report, timed
+
+from balancing import CostEngine, ItemStore, calculate_cost
+from balancing.formulas import STANDARD_FORMULA, compile_formula
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cost_max = 100000
+    records = make_records(count)
+    store = ItemStore.from_records(records)
+    engine = CostEngine()
+
+    def scalar_loop():
+        # What app.py used to do on every rerun
+        for item in records:
+            item['calculated_cost'] = calculate_cost(item['success_rate'], item['efficiency'], cost_max)
+
+    def full_recompute():
+        # A new formula forces a recompute of the whole catalog
+        engine.refresh(store, cost_max, compile_formula(STANDARD_FORMULA))
+        engine.refresh(store, cost_max)
+
+    def new_cost_max():
+        # Only rescales the stored cost factors
+        engine.refresh(store, cost_max + 1)
+        engine.refresh(store, cost_max)
+
+    def unchanged_rerun():
+        engine.refresh(store, cost_max)
+
+    def one_row_edit():
+        store.update(count // 2, {"efficiency": 42.0})
+        engine.refresh(store, cost_max)
+
+    engine.refresh(store, cost_max)
+    print(f"Cost calculation for {count:,} items")
+    report([
+        ("scalar calculate_cost loop", timed(scalar_loop)),
+        ("engine full recompute", timed(full_recompute) / 2),
+        ("engine new Max Cost", timed(new_cost_max) / 2),
+        ("engine rerun, nothing changed", timed(unchanged_rerun)),
+        ("engine rerun after one-row edit", timed(one_row_edit)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark compiling and re-evaluating the preset cost formulas.
+
+Usage: python benchmarks/bench_formulas.py [item_count]
+"""
+import sys
+
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import ItemStore, SharedCatalog
+from balancing.formulas import FORMULA_PRESETS, CostFormula, compile_formula
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    catalog = SharedCatalog()
+    catalog.load(ItemStore.from_records(make_records(count), categories=CATEGORIES))
+
+    rows = []
+    for name, preset in FORMULA_PRESETS.items():
+        formula = compile_formula(preset.expression)
+        rows.append((f"{name}: compile", timed(lambda: CostFormula(preset.expression))))
+        catalog.set_formula(formula, preset.parameters)
+        if not preset.parameters:
+            continue
+        # Moving a formula parameter slider re-evaluates the formula for every item
+        parameter = next(iter(preset.parameters))
+        tweaked = dict(preset.parameters, **{parameter: preset.parameters[parameter] * 1.1})
+
+        def tweak():
+            catalog.set_formula(formula, tweaked)
+            catalog.set_formula(formula, preset.parameters)
+        rows.append((f"{name}: {parameter} tweak", timed(tweak, repeat=3) / 2))
+    print(f"Cost formulas over {count:,} items:")
+    report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark the streaming JSON importer against json.load + ItemStore.from_records.
+
+Reports wall time and peak traced memory for an indent=2 export.
+
+Usage: python benchmarks/bench_import.py [item_count]
+"""
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from common import CATEGORIES, make_records
+
+from balancing import ItemStore
+from balancing.importer import import_items
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    blob = json.dumps(make_records(count), indent=2).encode("utf-8")
+
+    def whole_file():
+        # What the sidebar importer used to do
+        ItemStore.from_records(json.load(io.BytesIO(blob)), categories=CATEGORIES)
+
+    def streaming():
+        import_items(io.BytesIO(blob), categories=CATEGORIES)
+
+    print(f"Import of {count:,} items ({len(blob) / 1e6:.1f} MB of JSON)")
+    for label, func in [("json.load + from_records", whole_file), ("streaming import_items", streaming)]:
+        seconds, peak = measure(func)
+        print(f"  {label:<26}  {seconds * 1000:10.1f} ms  peak {peak / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark the balance analysis serially and on process and thread pools.
+
+Without a worker count the pools are timed at 2, 4, 8, ... workers and at
+the number of usable CPUs; the speedup is relative to the serial analysis.
+Run it on a multi-core machine: on a single CPU the app never uses the pool.
+
+Usage: python benchmarks/bench_parallel.py [item_count] [workers]
+"""
+import sys
+
+from common import CATEGORIES, make_records, timed
+
+from balancing import CostEngine, ItemStore
+from balancing.derived import add_derived_columns
+from balancing.engine import analyze
+from balancing.parallel import AnalysisPool, usable_cpus
+
+
+def worker_counts(cpus):
+    counts = []
+    workers = 2
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max(cpus, 2)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cpus = usable_cpus()
+    counts = [int(sys.argv[2])] if len(sys.argv) > 2 else worker_counts(cpus)
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+    CostEngine().refresh(store, 100000)
+    df = add_derived_columns(store.view_frame())
+
+    serial = timed(lambda: analyze(df), repeat=3)
+    rows = [("serial", serial)]
+    expected = analyze(df)
+    for kind in ("thread", "process"):
+        for workers in counts:
+            pool = AnalysisPool(workers, kind, min_parallel_items=0)
+            try:
+                # The first call starts the workers
+                result = pool.analyze(df)
+                assert result.overpowered == expected.overpowered
+                assert result.top_performers == expected.top_performers
+                rows.append((f"{kind} pool, {workers} workers", timed(lambda: pool.analyze(df), repeat=3)))
+            finally:
+                pool.close()
+    print(f"Balance analysis of {count:,} items ({cpus} usable CPUs):")
+    width = max(len(label) for label, _ in rows)
+    for label, seconds in rows:
+        print(f"  {label:<{width}}  {seconds * 1000:10.3f} ms  {serial / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
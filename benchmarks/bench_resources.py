@@ -0,0 +1,45 @@
+"""
+Benchmark finding and repairing resource shares that don't add up to 100%.
+
+Usage: python benchmarks/bench_resources.py [item_count]
+"""
+import sys
+import time
+
+import numpy as np
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import ItemStore, SharedCatalog
+from balancing.resources import REPAIR_STRATEGIES, plan_repair
+
+
+def drifted_store(count):
+    """A catalog where a fifth of the items have an inflated chemicals share
+    (on top of the rounding of the generated shares)."""
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+    drift = np.random.default_rng(1).choice(count, count // 5, replace=False)
+    store.set_column("chemicals", store.column("chemicals", drift) * 1.5 + 3, drift)
+    return store
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = drifted_store(count)
+    rows = []
+    for strategy in REPAIR_STRATEGIES:
+        rows.append((f"plan, {strategy}", timed(lambda: plan_repair(store, strategy), repeat=3)))
+
+    def apply():
+        catalog = SharedCatalog()
+        catalog.load(drifted_store(count))
+        start = time.perf_counter()
+        catalog.repair_resources("proportional")
+        return time.perf_counter() - start
+    rows.append(("apply to the catalog (write + costs)", apply()))
+    print(f"Resource share repair of {count:,} items "
+          f"({len(plan_repair(store).positions):,} off 100%):")
+    report(rows)
+
+
+if __name__ == "__main__":
+    main()
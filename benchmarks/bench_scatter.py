@@ -0,0 +1,61 @@
+"""
+Benchmark the payload of the overview scatter plot with and without level of detail.
+
+Usage: python benchmarks/bench_scatter.py [item_count]
+"""
+import sys
+
+import plotly.graph_objects as go
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import CostEngine, ItemStore
+from balancing.derived import add_derived_columns
+from balancing.lod import density_grid, top_positions
+
+
+def full_figure(df):
+    return go.Figure(go.Scatter(
+        x=df["success_rate"], y=df["efficiency"], mode="markers+text",
+        text=df["item_name"], marker=dict(color=df["calculated_cost"])
+    ))
+
+
+def webgl_figure(df):
+    top = df.iloc[top_positions(df["power_level"].to_numpy(), 20)]
+    return go.Figure([
+        go.Scattergl(x=df["success_rate"], y=df["efficiency"], mode="markers",
+                     text=df["item_name"], marker=dict(color=df["calculated_cost"])),
+        go.Scatter(x=top["success_rate"], y=top["efficiency"], mode="text", text=top["item_name"]),
+    ])
+
+
+def density_figure(df):
+    grid = density_grid(df["success_rate"].to_numpy(), df["efficiency"].to_numpy(), (0, 105), (0, 105))
+    points = df.iloc[grid.outliers]
+    top = df.iloc[top_positions(df["power_level"].to_numpy(), 20)]
+    return go.Figure([
+        go.Heatmap(x=grid.x_centers, y=grid.y_centers, z=grid.counts),
+        go.Scattergl(x=points["success_rate"], y=points["efficiency"], mode="markers",
+                     text=points["item_name"], marker=dict(color=points["calculated_cost"])),
+        go.Scatter(x=top["success_rate"], y=top["efficiency"], mode="text", text=top["item_name"]),
+    ])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+    CostEngine().refresh(store, 100000)
+    df = add_derived_columns(store.view_frame())
+
+    rows = []
+    for label, build in [("every item labelled", full_figure),
+                         ("WebGL, top 20 labelled", webgl_figure),
+                         ("density grid + outliers", density_figure)]:
+        size = len(build(df).to_json())
+        rows.append((f"{label} ({size / 1e6:.2f} MB)", timed(lambda: build(df).to_json(), repeat=3)))
+    print(f"Overview scatter of {count:,} items (build + serialize):")
+    report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Benchmark the Monte Carlo usage simulation.
+
+Usage: python benchmarks/bench_simulation.py [item_count] [trials]
+"""
+import sys
+
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import CostEngine, ItemStore
+from balancing.simulation import simulate
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    trials = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+    CostEngine().refresh(store, 100000)
+    df = store.view_frame()
+
+    rows = []
+    for block_size in (1_000_000, 4_000_000, 16_000_000):
+        seconds = timed(lambda: simulate(df, trials, block_size=block_size), repeat=1)
+        rows.append((f"block of {block_size:,} draws", seconds))
+    print(f"Usage simulation, {trials:,} uses of {count:,} items "
+          f"({trials * count / 1e9:.1f} billion draws):")
+    report(rows)
+
+
+if __name__ == "__main__":
+    main()
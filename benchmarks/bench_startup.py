@@ -0,0 +1,93 @@
+"""
+Measure the app's cold start: time until the page shell and the full first page are rendered.
+
+Every run starts a fresh Python process (empty import and resource caches,
+like a new container) with its own data directory, and runs app.py once
+through Streamlit's AppTest. Reported per run:
+
+- imports: starting Python and importing Streamlit;
+- first element: until the app sends its first element (the page shell);
+- first render: until the first script run has finished.
+
+With a budget the script exits with status 1 when the median first render
+exceeds it, so it can guard against startup regressions in CI.
+
+Usage: python benchmarks/bench_startup.py [runs] [budget_seconds]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+CHILD = r"""
+import json, sys, time
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+launch = time.perf_counter() - (time.time() - float(sys.argv[2]))
+
+first_element = []
+enqueue = DeltaGenerator._enqueue
+def timed_enqueue(self, *args, **kwargs):
+    if not first_element:
+        first_element.append(time.perf_counter())
+    return enqueue(self, *args, **kwargs)
+DeltaGenerator._enqueue = timed_enqueue
+
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+run_start = time.perf_counter()
+app.run()
+finished = time.perf_counter()
+print(json.dumps({
+    "imports": imported - launch,
+    "first_element": (first_element or [finished])[0] - run_start,
+    "first_render": finished - run_start,
+    "errors": [str(e.value) for e in app.exception],
+}))
+"""
+
+
+def run_once():
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, ITEM_BALANCING_DATA_FILE=os.path.join(directory, "data.json"))
+        # The child measures its imports from this wall-clock launch time
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD, APP, repr(time.time())],
+            env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    results = [run_once() for _ in range(runs)]
+    for result in results:
+        if result["errors"]:
+            print("App raised:", *result["errors"], sep="\n  ")
+            sys.exit(1)
+
+    print(f"Cold start of app.py ({runs} runs, median):")
+    width = len("first element (page shell)")
+    for key, label in [("imports", "python + streamlit imports"),
+                       ("first_element", "first element (page shell)"),
+                       ("first_render", "first render (full page)")]:
+        seconds = statistics.median(result[key] for result in results)
+        print(f"  {label:<{width}}  {seconds * 1000:10.1f} ms")
+
+    if budget is not None:
+        first_render = statistics.median(result["first_render"] for result in results)
+        if first_render > budget:
+            print(f"Over budget: first render took {first_render:.2f} s, budget {budget:.2f} s")
+            sys.exit(1)
+        print(f"Within budget ({budget:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
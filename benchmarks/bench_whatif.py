@@ -0,0 +1,48 @@
+"""
+Benchmark a what-if sweep against scoring each scenario with engine.analyze.
+
+Usage: python benchmarks/bench_whatif.py [item_count] [cost_steps] [multiplier_steps]
+"""
+import sys
+
+import numpy as np
+from common import CATEGORIES, make_records, report, timed
+
+from balancing import CostEngine, ItemStore
+from balancing.derived import add_derived_columns
+from balancing.engine import analyze
+from balancing.formulas import compile_formula
+from balancing.whatif import Sweep, scenario_grid
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cost_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    multiplier_steps = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    store = ItemStore.from_records(make_records(count), categories=CATEGORIES)
+    CostEngine().refresh(store, 100000)
+    df = add_derived_columns(store.view_frame())
+    scenarios = scenario_grid(np.linspace(20000, 200000, cost_steps), np.linspace(0.8, 1.2, multiplier_steps),
+                              np.linspace(0.8, 1.2, 3), category="Weapons")
+
+    def one_by_one():
+        # What a rerun per candidate value amounts to (first 10 scenarios)
+        weapons = (df["category"] == "Weapons").to_numpy()
+        for row in scenarios.head(10).itertuples():
+            buffed = df.copy()
+            buffed.loc[weapons, "success_rate"] = (buffed.loc[weapons, "success_rate"] * row.success_multiplier).clip(0, 100)
+            buffed.loc[weapons, "efficiency"] = (buffed.loc[weapons, "efficiency"] * row.efficiency_multiplier).clip(0, 100)
+            analyze(buffed, cost_max=row.cost_max)
+
+    # A formula that isn't proportional to cost_max takes the general path
+    offset = compile_formula("success_rate * efficiency / 10000 * cost_max + 100")
+    print(f"What-if sweep of {len(scenarios)} scenarios over {count:,} items:")
+    report([
+        ("engine.analyze per scenario (x10 -> all)", timed(one_by_one, repeat=1) * len(scenarios) / 10),
+        ("sweep, standard formula", timed(lambda: Sweep(df).run(scenarios), repeat=3)),
+        ("sweep, non-proportional formula", timed(lambda: Sweep(df, offset).run(scenarios), repeat=1)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Shared helpers for the benchmark scripts in this folder."""
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running the scripts directly (python benchmarks/bench_x.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from balancing.store import RESOURCE_FIELDS  # noqa: E402
+
+CATEGORIES = [
+    "Weapons", "Armor", "Gadgets", "Medical Items", "Consumables",
+    "Upgrades/Mods", "Tools", "Resources", "Blueprints", "Special/Unique"
+]
+
+
+def make_records(count, seed=0):
+    """Generate ``count`` random items in the data.json layout."""
+    rng = np.random.default_rng(seed)
+    success = rng.uniform(0, 100, count).round(1)
+    efficiency = rng.uniform(0, 100, count).round(1)
+    shares = rng.dirichlet(np.ones(len(RESOURCE_FIELDS)), count) * 100
+    categories = rng.integers(0, len(CATEGORIES), count)
+    records = []
+    for i in range(count):
+        item = {
+            "item_name": f"Item {i}",
+            "category": CATEGORIES[categories[i]],
+            "success_rate": float(success[i]),
+            "efficiency": float(efficiency[i]),
+            "calculated_cost": 0.0,
+        }
+        item.update(zip(RESOURCE_FIELDS, shares[i].round(1).tolist()))
+        records.append(item)
+    return records
+
+
+def timed(func, repeat=5):
+    """Return the best wall time of ``repeat`` calls to ``func`` in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(rows):
+    """Print (label, seconds) rows as an aligned table in milliseconds."""
+    width = max(len(label) for label, _ in rows)
+    for label, seconds in rows:
+        print(f"  {label:<{width}}  {seconds * 1000:10.3f} ms")
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from balancing.store import RESOURCE_FIELDS  # noqa: E402
+
+CATEGORIES = ["Weapons", "Armor", "Tools", "Consumables"]
+
+
+def make_records(count, seed=0):
+    """``count`` random items in the data.json layout."""
+    rng = np.random.default_rng(seed)
+    shares = rng.dirichlet(np.ones(len(RESOURCE_FIELDS)), count) * 100
+    records = []
+    for i in range(count):
+        item = {
+            "item_name": f"Item {i % 50}",
+            "category": CATEGORIES[int(rng.integers(len(CATEGORIES)))],
+            "success_rate": round(float(rng.uniform(0, 100)), 1),
+            "efficiency": round(float(rng.uniform(0, 100)), 1),
+        }
+        item.update(zip(RESOURCE_FIELDS, shares[i].round(1).tolist()))
+        records.append(item)
+    return records
+
+
+@pytest.fixture
+def records():
+    return make_records(500)
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import CostFormula, ItemStore, SharedCatalog
+from balancing.backends import SqliteBackend, migrate_json_to_sqlite
+from conftest import CATEGORIES, make_records
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SqliteBackend(tmp_path / "data.db")
+    yield backend
+    backend.close()
+
+
+def test_database_follows_the_catalog(backend, records):
+    catalog = SharedCatalog(cost_max=1000)
+    catalog.load(ItemStore.from_records(records, categories=CATEGORIES))
+    backend.save(catalog.store)
+    catalog.add_listener(backend.listener())
+
+    catalog.set_cost_max(2500)
+    catalog.update_item(int(catalog.store.column("item_id")[3]), {"efficiency": 7.0, "category": "Tools"},
+                        catalog.version)
+    catalog.add_items(make_records(5, 9))
+    catalog.set_formula(CostFormula("success_rate + cost_max / 100"))
+    catalog.set_cost_max(4000)
+    catalog.repair_resources("snap")
+    catalog.store.delete([0, 1])
+
+    loaded = backend.load(categories=CATEGORIES)
+    assert loaded.to_records() == catalog.store.to_records()
+    assert np.allclose(loaded.column("calculated_cost"), catalog.store.column("calculated_cost"))
+
+
+def test_an_emptied_database_stays_initialized(backend, records):
+    assert not backend.initialized()
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    backend.save(store)
+    store.add_listener(backend.listener())
+    store.clear()
+    assert backend.initialized()
+    assert len(backend.load(categories=CATEGORIES)) == 0
+
+
+def test_a_new_max_cost_writes_no_row(backend, records):
+    catalog = SharedCatalog(cost_max=1000)
+    catalog.load(ItemStore.from_records(records, categories=CATEGORIES))
+    backend.save(catalog.store)
+    catalog.add_listener(backend.listener())
+    changes = backend._connection().total_changes
+    catalog.set_cost_max(3000)
+    # Only the cost_scale row of the meta table
+    assert backend._connection().total_changes == changes + 1
+    assert backend.cost_scale() == 3000
+    assert np.allclose(backend.load(categories=CATEGORIES).column("calculated_cost"),
+                       catalog.store.column("calculated_cost"))
+
+
+def test_queries_match_the_catalog(backend, records):
+    catalog = SharedCatalog(cost_max=1000)
+    catalog.load(ItemStore.from_records(records, categories=CATEGORIES))
+    backend.save(catalog.store)
+    catalog.add_listener(backend.listener())
+    catalog.set_cost_max(1500)
+    catalog.store.delete([2, 5])
+
+    store = catalog.store
+    assert backend.count() == len(store)
+    for category in CATEGORIES:
+        positions = store.filter(category)
+        assert backend.count(category) == len(positions)
+        assert backend.item_ids(category).tolist() == store.column("item_id", positions).tolist()
+        assert backend.load(category, categories=CATEGORIES).to_records() == store.to_records(positions)
+
+    columns = ["category", "count", "success_rate", "efficiency", "calculated_cost", "performance_score",
+               "power_level"]
+    pd.testing.assert_frame_equal(backend.category_stats(), catalog.aggregates.table()[columns], rtol=1e-6)
+    pd.testing.assert_frame_equal(backend.category_stats("Tools"), catalog.aggregates.table("Tools")[columns],
+                                  rtol=1e-6)
+
+
+def test_recomputed_costs_are_synced(backend, records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    store.set_cost_factors(np.ones(len(store)))
+    backend.save(store)
+
+    catalog = SharedCatalog(cost_max=2000)
+    catalog.load(backend.load(categories=CATEGORIES))
+    assert backend.sync_costs(catalog.store) == len(store)
+    assert backend.sync_costs(catalog.store) == 0
+    assert np.allclose(backend.load(categories=CATEGORIES).column("calculated_cost"),
+                       catalog.store.column("calculated_cost"))
+
+
+def test_migrate_json_to_sqlite(tmp_path, records):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps(records))
+    assert migrate_json_to_sqlite(json_path, tmp_path / "data.db", categories=CATEGORIES) == len(records)
+    backend = SqliteBackend(tmp_path / "data.db")
+    try:
+        migrated = backend.load(categories=CATEGORIES)
+    finally:
+        backend.close()
+    assert migrated.to_records() == ItemStore.from_records(records, categories=CATEGORIES).to_records()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from balancing import CostEngine, ItemStore
+from balancing.binning import ResourceMix, bin_codes
+from balancing.store import RESOURCE_FIELDS
+from conftest import CATEGORIES
+
+
+def make_store(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES + ["Relics"])
+    CostEngine().refresh(store, 20000)
+    return store
+
+
+@pytest.mark.parametrize("by", ["category", "cost", "resource"])
+def test_mix_matches_a_groupby(records, by):
+    store = make_store(records)
+    positions = store.filter()[::3]
+    mix = ResourceMix(store, positions, by=by, quantiles=4)
+    labels, codes = bin_codes(store, positions, by, quantiles=4)
+    df = store.to_frame(positions).assign(bin=np.array(labels)[codes])
+    expected = df.groupby("bin")[RESOURCE_FIELDS].mean()
+
+    assert mix.table["count"].sum() == len(positions)
+    assert (mix.table["count"] > 0).all()
+    assert sorted(mix.table["bin"]) == sorted(expected.index)
+    for row in mix.table.itertuples(index=False):
+        assert row.count == (df["bin"] == row.bin).sum()
+        assert np.allclose([getattr(row, field) for field in RESOURCE_FIELDS], expected.loc[row.bin])
+        members = mix.positions(row.bin)
+        assert len(members) == row.count
+        assert np.isin(members, positions).all()
+
+
+def test_cost_quantiles(records):
+    store = make_store(records)
+    labels, codes = bin_codes(store, by="cost", quantiles=5)
+    assert len(labels) == 5
+    assert np.bincount(codes).tolist() == [100] * 5
+    cost = store.column("calculated_cost")
+    assert np.all(np.diff([cost[codes == code].max() for code in range(5)]) > 0)
+
+    store.set_cost_factors(np.full(len(store), 0.5))
+    labels, codes = bin_codes(store, by="cost")
+    assert labels == ["10,000"]
+    assert not codes.any()
+
+
+def test_empty_bins_and_selections(records):
+    store = make_store(records)
+    mix = ResourceMix(store, by="category")
+    assert "Relics" not in mix.table["bin"].tolist()
+    assert len(ResourceMix(store, [], by="cost").table) == 0
+    with pytest.raises(ValueError):
+        bin_codes(store, by="name")
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import CatalogConflict, ItemStore, SharedCatalog
+from balancing.aggregates import CategoryAggregates
+from balancing.costs import compute_costs
+from conftest import CATEGORIES, make_records
+
+
+@pytest.fixture
+def catalog(records):
+    catalog = SharedCatalog(cost_max=1000)
+    catalog.load(ItemStore.from_records(records, categories=CATEGORIES))
+    return catalog
+
+
+def item_id(catalog, position):
+    return int(catalog.store.column("item_id")[position])
+
+
+def test_edits_of_different_fields_merge(catalog):
+    base = catalog.version
+    first, second = item_id(catalog, 0), item_id(catalog, 1)
+    catalog.update_item(first, {"efficiency": 11.0}, base)
+    catalog.update_item(first, {"success_rate": 22.0}, base)
+    catalog.update_item(second, {"efficiency": 33.0}, base)
+    store = catalog.store
+    assert store.value(store.position_of(first), "efficiency") == 11.0
+    assert store.value(store.position_of(first), "success_rate") == 22.0
+    assert store.value(store.position_of(second), "efficiency") == 33.0
+
+
+def test_edit_of_a_changed_field_conflicts(catalog):
+    base = catalog.version
+    target = item_id(catalog, 0)
+    catalog.update_item(target, {"efficiency": 11.0}, base)
+    with pytest.raises(CatalogConflict) as raised:
+        catalog.update_item(target, {"efficiency": 12.0}, base)
+    assert raised.value.item_id == target
+    assert raised.value.fields == ["efficiency"]
+    # Writing the value that is already there is not a change
+    catalog.update_item(target, {"efficiency": 11.0}, base)
+    catalog.update_item(target, {"efficiency": 12.0}, catalog.version)
+
+
+def test_edit_of_a_deleted_or_replaced_catalog_conflicts(catalog):
+    base = catalog.version
+    with pytest.raises(CatalogConflict):
+        catalog.update_item(10 ** 9, {"efficiency": 1.0}, base)
+    catalog.clear(base)
+    with pytest.raises(CatalogConflict):
+        catalog.update_item(1, {"efficiency": 1.0}, base)
+    with pytest.raises(CatalogConflict):
+        catalog.replace(ItemStore(categories=CATEGORIES), base)
+
+
+def test_resource_repair_conflicts_only_with_repaired_shares(catalog):
+    store = catalog.store
+    store.set_column("metals_alloys", store.column("metals_alloys", [0]) + 30, [0])
+    base = catalog.version
+    catalog.repair_resources("proportional", base_version=base)
+    target = item_id(catalog, 0)
+    with pytest.raises(CatalogConflict):
+        catalog.update_item(target, {"metals_alloys": 1.0}, base)
+    catalog.update_item(target, {"success_rate": 1.0}, base)
+    catalog.update_item(item_id(catalog, 1), {"metals_alloys": 1.0}, base)
+
+
+def test_costs_and_aggregates_match_recomputation(catalog):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        position = int(rng.integers(len(catalog.store)))
+        catalog.update_item(item_id(catalog, position), {
+            "efficiency": round(float(rng.uniform(0, 100)), 1),
+            "category": CATEGORIES[int(rng.integers(len(CATEGORIES)))],
+        }, catalog.version)
+    catalog.add_items(make_records(20, 3))
+    catalog.set_cost_max(2500)
+    store = catalog.store
+    assert np.allclose(store.column("calculated_cost"), compute_costs(store, 2500))
+    pd.testing.assert_frame_equal(catalog.aggregates.table(), CategoryAggregates(store).table(), rtol=1e-6)
+
+
+def test_aggregates_match_a_groupby(catalog):
+    frame = catalog.store.to_frame()
+    frame["category"] = frame["category"].astype(str)
+    expected = frame.groupby("category").agg(
+        count=("efficiency", "size"), efficiency=("efficiency", "mean"), efficiency_std=("efficiency", "std")
+    ).reset_index()
+    table = catalog.aggregates.table()
+    assert table["category"].tolist() == sorted(CATEGORIES)
+    pd.testing.assert_frame_equal(table[expected.columns.tolist()], expected, check_dtype=False, rtol=1e-6)
+
+
+def test_concurrent_writers_lose_no_update(catalog):
+    base = catalog.version
+    ids = catalog.store.column("item_id")[:40].tolist()
+    errors = []
+
+    def write(chunk):
+        for item_id in chunk:
+            try:
+                catalog.update_item(item_id, {"efficiency": 99.0}, base)
+            except CatalogConflict as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(ids[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert catalog.version == base + 40
+    positions = catalog.store.positions_of(ids)
+    assert (catalog.store.column("efficiency", positions) == 99.0).all()
@@ -0,0 +1,76 @@
+import io
+
+import numpy as np
+
+from balancing import ItemStore
+from balancing.columnar import columnar_arrays, columnar_bytes, is_columnar_file, load_columnar, save_columnar
+from balancing.store import FLOAT_FIELDS
+from conftest import CATEGORIES, make_records
+
+
+def make_store(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    store.update(0, {"item_name": "Épée ✨"})
+    store.delete([3, 4])
+    return store
+
+
+def mapped(array):
+    """Whether ``array`` is a view of a memory map."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_file_round_trip(tmp_path, records):
+    store = make_store(records)
+    path = tmp_path / "data.npz"
+    save_columnar(store, path)
+    assert is_columnar_file(path)
+    assert not is_columnar_file(tmp_path / "data.json")
+
+    loaded = load_columnar(path, categories=CATEGORIES)
+    assert loaded.to_records() == store.to_records()
+    assert loaded.next_id == store.next_id
+    assert loaded.categories == store.categories
+    assert loaded.positions_of([store.column("item_id")[10]]).tolist() == [10]
+
+
+def test_numeric_columns_are_mapped_copy_on_write(tmp_path, records):
+    store = make_store(records)
+    path = tmp_path / "data.npz"
+    save_columnar(store, path)
+    saved = path.read_bytes()
+
+    loaded = load_columnar(path, categories=CATEGORIES)
+    for field in ["item_id", "category_code"] + list(FLOAT_FIELDS):
+        assert mapped(loaded.column(field)), field
+    loaded.update(1, {"efficiency": 12.5})
+    loaded.extend(make_records(3, 1))
+    assert loaded.value(1, "efficiency") == 12.5
+    assert not mapped(loaded.column("efficiency"))
+    assert path.read_bytes() == saved
+
+
+def test_bytes_and_compressed_archives_load(records):
+    store = make_store(records)
+    loaded = load_columnar(io.BytesIO(columnar_bytes(store)))
+    assert loaded.to_records() == store.to_records()
+    assert not mapped(loaded.column("efficiency"))
+
+    compressed = io.BytesIO()
+    np.savez_compressed(compressed, **columnar_arrays(store))
+    compressed.seek(0)
+    assert load_columnar(compressed, categories=CATEGORIES).to_records() == store.to_records()
+
+
+def test_categories_are_remapped(tmp_path, records):
+    store = make_store(records)
+    path = tmp_path / "data.npz"
+    save_columnar(store, path)
+    order = ["Tools", "Relics", "Weapons", "Armor", "Consumables"]
+    loaded = load_columnar(path, categories=order)
+    assert loaded.categories[:2] == ["Tools", "Relics"]
+    assert loaded.to_records() == store.to_records()
@@ -0,0 +1,43 @@
+import numpy as np
+
+from balancing import CostEngine, ItemStore, compile_formula
+from balancing.costs import compute_costs
+from conftest import CATEGORIES, make_records
+
+
+def test_cost_scale_matches_recomputation(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    engine = CostEngine()
+    for cost_max in (100000, 250, 1e6):
+        engine.refresh(store, cost_max)
+        assert store.cost_scale == cost_max
+        assert np.allclose(store.column("calculated_cost"), compute_costs(store, cost_max))
+
+    store.update(5, {"efficiency": 12.5})
+    store.extend(make_records(10, 2))
+    assert engine.refresh(store, 3000) == 11
+    assert np.allclose(store.column("calculated_cost"), compute_costs(store, 3000))
+
+    # A formula that isn't proportional to cost_max is stored unscaled
+    formula = compile_formula("success_rate + cost_max / 1000")
+    engine.refresh(store, 5000, formula)
+    assert store.cost_scale == 1.0
+    assert np.allclose(store.column("calculated_cost"), compute_costs(store, 5000, formula=formula))
+    engine.refresh(store, 7000)
+    assert np.allclose(store.column("calculated_cost"), compute_costs(store, 7000))
+
+
+def test_a_new_max_cost_touches_no_row(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    engine = CostEngine()
+    engine.refresh(store, 1000)
+    assert engine.refresh(store, 2000) == 0
+    assert np.allclose(store.column("calculated_cost"), compute_costs(store, 2000))
+
+
+def test_copy_keeps_the_cost_scale(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    CostEngine().refresh(store, 4000)
+    clone = store.copy()
+    assert np.array_equal(clone.column("calculated_cost"), store.column("calculated_cost"))
+    assert ItemStore.from_records(store.to_records(), categories=CATEGORIES).to_records() == store.to_records()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from balancing import ItemStore
+from balancing.derived import FrameCache
+from balancing.engine import performance_score, power_level
+from conftest import CATEGORIES
+
+
+def test_frames_are_cached_per_version_and_category(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    cache = FrameCache(max_frames=4)
+    frame = cache.frame(store)
+    assert cache.frame(store) is frame
+    tools = cache.frame(store, "Tools")
+    assert (tools["category"] == "Tools").all()
+    assert len(tools) == len(store.filter("Tools"))
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    store.update(0, {"efficiency": 1.0})
+    assert cache.frame(store) is not frame
+    # The new version replaced the old frame of the same filter
+    assert len(cache._frames) == 2
+
+
+def test_frames_dont_follow_later_edits(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    store.set_cost_scale(1000)
+    frame = FrameCache().frame(store)
+    before = frame.copy()
+    store.update(0, {"efficiency": 1.0, "success_rate": 2.0})
+    store.set_column("efficiency", 50.0)
+    store.set_cost_scale(5000)
+    assert frame.equals(before)
+    assert frame.attrs["version"] < store.version
+    np.testing.assert_allclose(frame["performance_score"], performance_score(frame["success_rate"],
+                                                                             frame["efficiency"]))
+    np.testing.assert_allclose(frame["power_level"], power_level(frame["success_rate"], frame["efficiency"],
+                                                                 frame["calculated_cost"]))
+
+
+class RecordingLock:
+    held = False
+
+    def __enter__(self):
+        self.held = True
+
+    def __exit__(self, *exc):
+        self.held = False
+
+
+def test_frames_are_copied_under_the_lock(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    lock = RecordingLock()
+    seen = []
+
+    def find(category):
+        seen.append(lock.held)
+        return store.filter(category)
+
+    FrameCache().frame(store, "Armor", lock=lock, find=find)
+    assert seen == [True]
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from balancing import analyze
+from balancing.engine import balance_score, frame_from_records
+from conftest import make_records
+
+
+def test_balance_score_is_floored_at_zero():
+    assert balance_score(0.8) == 100
+    assert balance_score(0.3) == 50
+    assert balance_score(-0.5) == 0
+    assert np.isnan(balance_score(np.nan))
+    assert balance_score(np.array([-1.0, 0.8])).tolist() == [0, 100]
+
+
+def test_report_matches_pandas(records):
+    df = frame_from_records(records)
+    report = analyze(df, cost_max=1000)
+    costs = df["success_rate"] * df["efficiency"] / 10000 * 1000
+    performance = (df["success_rate"] + df["efficiency"]) / 2
+    assert report.item_count == len(df)
+    assert np.isclose(report.mean_cost, costs.mean())
+    assert np.isclose(report.correlation, costs.corr(performance))
+    assert np.isclose(report.balance_score, max(100 - abs(costs.corr(performance) - 0.8) * 100, 0))
+    expected = df.assign(calculated_cost=costs).groupby("category")["calculated_cost"].mean()
+    stats = report.category_stats.set_index("category")["calculated_cost"]
+    pd.testing.assert_series_equal(stats, expected, check_names=False)
+
+
+def test_anticorrelated_catalog_scores_zero():
+    records = make_records(100)
+    for i, record in enumerate(records):
+        record["success_rate"] = record["efficiency"] = float(i)
+    df = frame_from_records(records).assign(calculated_cost=lambda d: 100000 - d["success_rate"] * 1000)
+    assert analyze(df).balance_score == 0
@@ -0,0 +1,57 @@
+import gc
+import gzip
+import io
+import json
+import weakref
+
+import pytest
+
+from balancing import ItemStore
+from balancing.columnar import load_columnar
+from balancing.export import EXPORT_FORMATS, ExportCache, serialize
+from conftest import CATEGORIES
+
+
+def test_every_format_round_trips(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    expected = store.to_records()
+    assert json.loads(serialize(store, "json")) == expected
+    assert json.loads(serialize(store, "json-compact")) == expected
+    assert json.loads(gzip.decompress(serialize(store, "json-gzip"))) == expected
+    assert load_columnar(io.BytesIO(serialize(store, "npz"))).to_records() == expected
+    assert set(EXPORT_FORMATS) == {"json", "json-compact", "json-gzip", "npz"}
+    with pytest.raises(ValueError):
+        serialize(store, "xml")
+
+
+def test_cache_is_invalidated_by_a_new_version(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    cache = ExportCache()
+    assert cache.get(store, "json", build=False) is None
+    payload = cache.get(store, "json")
+    assert cache.get(store, "json") is payload
+    assert cache.get(store, "json", build=False) is payload
+    assert cache.get(store, "json-compact", build=False) is None
+
+    store.update(0, {"efficiency": 1.5})
+    assert cache.get(store, "json", build=False) is None
+    rebuilt = cache.get(store, "json")
+    assert rebuilt is not payload
+    assert json.loads(rebuilt)[0]["efficiency"] == 1.5
+
+
+def test_cache_tells_stores_apart(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    clone = store.copy()
+    assert clone.version == store.version
+    cache = ExportCache()
+    cache.get(store, "json-compact")
+    assert cache.get(clone, "json-compact", build=False) is None
+
+    # Only one payload per format is held, and the store is not kept alive
+    cache.get(clone, "json-compact")
+    assert cache.get(store, "json-compact", build=False) is None
+    clone_ref = weakref.ref(clone)
+    del clone
+    gc.collect()
+    assert clone_ref() is None
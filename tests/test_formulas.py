@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from balancing import CostFormula, FormulaError, ItemStore, calculate_cost
+from balancing.costs import compute_costs
+from balancing.formulas import FORMULA_PRESETS, MAX_FORMULA_LENGTH, STANDARD_FORMULA
+from conftest import CATEGORIES
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "success_rate.__class__",
+    "efficiency[0]",
+    "(lambda: 1)()",
+    "open('data.json')",
+    "max(success_rate)",
+    "abs(x=success_rate)",
+    "[success_rate for _ in range(3)]",
+    "{'a': 1}",
+    "'text'",
+    "True",
+    "category",
+    "category == 3",
+    "category < 'Weapons'",
+    "success_rate in (1, 2)",
+    "_hidden * 2",
+    "sqrt",
+    "efficiency := 3",
+    "success_rate +",
+    "1" + " + 1" * MAX_FORMULA_LENGTH,
+])
+def test_rejected_formulas(expression):
+    with pytest.raises(FormulaError):
+        CostFormula(expression)
+
+
+def test_fields_and_parameters():
+    formula = CostFormula("success_rate * (1 + tech_components / 100 * premium) * cost_max")
+    assert formula.fields == ["success_rate", "tech_components"]
+    assert formula.parameters == ["cost_max", "premium"]
+    assert formula.proportional_to_cost_max
+    assert not CostFormula("success_rate + cost_max").proportional_to_cost_max
+    with pytest.raises(FormulaError):
+        formula.evaluate({"success_rate": np.ones(2), "tech_components": np.ones(2)}, {"cost_max": 1.0})
+
+
+def test_presets_compile():
+    for preset in FORMULA_PRESETS.values():
+        CostFormula(preset.expression)
+
+
+def test_evaluation_matches_numpy(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    success = store.column("success_rate").astype(np.float64)
+    efficiency = store.column("efficiency").astype(np.float64)
+    categories = np.array(store.categories)[store.column("category_code")]
+
+    standard = compute_costs(store, 5000, formula=CostFormula(STANDARD_FORMULA))
+    assert np.allclose(standard, calculate_cost(success, efficiency, 5000))
+
+    formula = CostFormula(
+        'where(category in ("Weapons", "Armor"), max(success_rate, efficiency), sqrt(efficiency)) '
+        '* (2 if success_rate > 50 and not efficiency < 10 else 1) + log(success_rate - 50)'
+    )
+    expected = np.where(np.isin(categories, ["Weapons", "Armor"]), np.maximum(success, efficiency), np.sqrt(efficiency))
+    expected *= np.where((success > 50) & ~(efficiency < 10), 2, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected += np.log(success - 50)
+    expected[~np.isfinite(expected)] = 0.0
+    assert np.allclose(compute_costs(store, 1, formula=formula), expected)
+
+
+def test_unknown_category_matches_nothing():
+    formula = CostFormula('1 if category == "Nope" else 2')
+    costs = formula.evaluate({"category": np.array([0, 1, 2])}, {}, CATEGORIES)
+    assert costs.tolist() == [2.0, 2.0, 2.0]
@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from balancing.importer import import_items, iter_json_items
+from conftest import CATEGORIES, make_records
+
+ITEMS = [
+    {"item_name": "Comma, bracket ] brace }", "success_rate": 12.5, "efficiency": 1e-3,
+     "metals_alloys": -1.5E+2, "tags": [1, 2, {"nested": None}], "flag": True, "note": "é中"},
+    {"item_name": "Plain", "success_rate": 100, "efficiency": 0},
+]
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ITEMS),
+    json.dumps(ITEMS, indent=2, ensure_ascii=False),
+    json.dumps({"version": 2, "meta": {"a": [1, "]"]}, "items": ITEMS}),
+    "[]",
+    "[1.5e-3 , -2 ,30]",
+])
+def test_every_chunk_boundary(text):
+    expected = json.loads(text)
+    if isinstance(expected, dict):
+        expected = expected["items"]
+    for chunk_size in range(1, 48):
+        assert list(iter_json_items(io.StringIO(text), chunk_size=chunk_size)) == expected
+
+
+def test_binary_files_with_bom():
+    data = "﻿" + json.dumps(ITEMS, ensure_ascii=False)
+    assert list(iter_json_items(io.BytesIO(data.encode("utf-8")), chunk_size=7)) == ITEMS
+
+
+@pytest.mark.parametrize("text", [
+    "[1x, 2]",
+    "[1.]",
+    '["a"b]',
+    "[true false]",
+    "[1 2]",
+    '[{"a": 1}' + "x" * 10000 + "]",
+    '{"other": []}',
+    '"items"',
+    "[1, 2",
+])
+def test_malformed_files_raise(text):
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(ValueError):
+            list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+
+
+def test_garbage_after_a_value_is_not_read_ahead():
+    fh = io.StringIO('[{"a": 1}x' + " " * 100000 + "]")
+    with pytest.raises(ValueError):
+        list(iter_json_items(fh, chunk_size=64))
+    assert fh.tell() <= 128
+
+
+def test_batches_match_a_single_pass():
+    records = make_records(230) + [{"success_rate": 3}, {"item_name": "Bad", "efficiency": "x"}]
+    text = json.dumps(records)
+    whole, stats = import_items(io.StringIO(text), categories=CATEGORIES)
+    assert (stats.accepted, stats.rejected) == (230, 2)
+    for batch_size, chunk_size in ((1, 5), (7, 100), (1000, 1 << 20)):
+        store, _ = import_items(io.StringIO(text), categories=CATEGORIES, batch_size=batch_size,
+                                chunk_size=chunk_size)
+        assert store.to_records() == whole.to_records()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from balancing import ItemStore
+from balancing import indexes
+from conftest import CATEGORIES, make_records
+
+
+def assert_same_index(store):
+    """The incrementally kept index answers like one built from scratch."""
+    fresh = ItemStore.from_records(store.to_records(), categories=store.categories)
+    ids = store.column("item_id")
+    assert np.array_equal(fresh.column("item_id"), ids)
+    for category in store.categories:
+        assert np.array_equal(store.filter(category), fresh.filter(category))
+    probe = np.arange(0, store.next_id + 2)
+    assert np.array_equal(store.positions_of(probe), fresh.positions_of(probe))
+    for name in {f"Item {i}" for i in range(50)} | {"Renamed"}:
+        assert store.ids_named(name) == fresh.ids_named(name)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_rebuild(monkeypatch, seed):
+    # Small enough that the tombstones get compacted during the run
+    monkeypatch.setattr(indexes, "_MIN_TOMBSTONES", 8)
+    rng = np.random.default_rng(seed)
+    store = ItemStore.from_records(make_records(200, seed), categories=CATEGORIES)
+    store.ids_named("Item 0")
+    for step in range(150):
+        op = rng.integers(4)
+        if op == 0 or not len(store):
+            records = make_records(int(rng.integers(1, 20)), seed * 1000 + step)
+            if rng.random() < 0.3:
+                # Imported ids below the current maximum, possibly of deleted items
+                for record in records:
+                    record["item_id"] = int(rng.integers(1, store.next_id))
+            store.extend(records)
+        elif op == 1:
+            position = int(rng.integers(len(store)))
+            changes = {"category": CATEGORIES[int(rng.integers(len(CATEGORIES)))]}
+            if rng.random() < 0.3:
+                changes["item_name"] = "Renamed"
+            store.update(position, changes)
+        elif op == 2:
+            store.delete(rng.integers(0, len(store), int(rng.integers(1, 10))))
+        else:
+            store.filter(CATEGORIES[int(rng.integers(len(CATEGORIES)))])
+        if step % 10 == 0:
+            assert_same_index(store)
+    assert_same_index(store)
+
+
+def test_filtered_positions_stay_valid_after_changes(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    held = store.filter("Armor")
+    kept = held.copy()
+    store.extend(make_records(50, 1))
+    store.update(int(held[0]), {"category": "Tools"})
+    store.delete(held[:3])
+    assert np.array_equal(held, kept)
+
+
+def test_item_moved_into_an_emptied_category_before_a_deleted_one():
+    store = ItemStore.from_records([
+        {"item_name": "A", "category": "Weapons"},
+        {"item_name": "B", "category": "Tools"},
+        {"item_name": "C", "category": "Armor"},
+    ], categories=CATEGORIES)
+    store.update(1, {"category": "Armor"})
+    store.delete([2])
+    assert store.filter("Tools").tolist() == []
+    store.update(0, {"category": "Tools"})
+    assert store.filter("Tools").tolist() == [0]
+    assert_same_index(store)
+
+
+def test_delete_keeps_order_and_ids(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    ids = store.column("item_id").copy()
+    store.delete([0, 10, 11, 499])
+    assert np.array_equal(store.column("item_id"), np.delete(ids, [0, 10, 11, 499]))
+    assert store.positions_of([ids[0], ids[12]]).tolist() == [-1, 9]
+    with pytest.raises(KeyError):
+        store.position_of(int(ids[10]))
+
+
+def test_reused_id_after_delete():
+    store = ItemStore.from_records(make_records(20), categories=CATEGORIES)
+    store.extend(make_records(5, 1))
+    store.delete([3])
+    store.extend([{"item_id": 4, "item_name": "Back", "category": "Tools"}])
+    assert store.value(store.position_of(4), "item_name") == "Back"
+    assert_same_index(store)
+
+
+def test_invalid_and_repeated_ids_get_fresh_ones():
+    store = ItemStore.from_records([
+        {"item_name": "A", "item_id": 7},
+        {"item_name": "B", "item_id": 7},
+        {"item_name": "C", "item_id": "x"},
+        {"item_name": "D", "item_id": -3},
+        {"item_name": "E"},
+    ], categories=CATEGORIES)
+    ids = store.column("item_id").tolist()
+    assert ids[0] == 7
+    assert len(set(ids)) == 5 and min(ids) > 0
+    assert store.next_id > max(ids)
@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+import pytest
+
+from balancing import ItemStore
+from balancing.journal import (
+    ChangeJournal,
+    JournaledStorage,
+    JournalRecorder,
+    journal_path_for,
+    replay_journal,
+    rotated_journals,
+)
+from balancing.persistence import AutoSaver, write_json_atomic
+from balancing.store import RESOURCE_FIELDS
+from conftest import CATEGORIES, make_records
+
+
+def records_without_costs(store):
+    return [{k: v for k, v in item.items() if k != "calculated_cost"} for item in store.to_records()]
+
+
+def change_randomly(store, rng, steps=60):
+    for step in range(steps):
+        op = rng.integers(5)
+        if op == 0 or not len(store):
+            store.extend(make_records(int(rng.integers(1, 5)), 100 + step))
+        elif op == 1:
+            store.update(int(rng.integers(len(store))), {
+                "efficiency": round(float(rng.uniform(0, 100)), 1),
+                "category": CATEGORIES[int(rng.integers(len(CATEGORIES)))],
+                "item_name": f"Edited {step}",
+            })
+        elif op == 2:
+            store.delete(rng.integers(0, len(store), 3))
+        elif op == 3:
+            positions = np.unique(rng.integers(0, len(store), 10))
+            store.set_columns({field: np.full(len(positions), 100 / 6) for field in RESOURCE_FIELDS}, positions)
+        elif rng.random() < 0.1:
+            store.clear()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_replay_reproduces_the_store(tmp_path, seed):
+    data_path = tmp_path / "data.json"
+    store = ItemStore.from_records(make_records(100, seed), categories=CATEGORIES)
+    snapshot = store.copy()
+    recorder = JournalRecorder(ChangeJournal(data_path, fsync=False))
+    store.add_listener(recorder)
+    change_randomly(store, np.random.default_rng(seed))
+    assert not recorder.needs_snapshot
+
+    replay_journal(snapshot, data_path)
+    assert records_without_costs(snapshot) == records_without_costs(store)
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    data_path = tmp_path / "data.json"
+    store = ItemStore.from_records(make_records(10), categories=CATEGORIES)
+    snapshot = store.copy()
+    store.add_listener(JournalRecorder(ChangeJournal(data_path, fsync=False)))
+    store.update(0, {"efficiency": 1.5})
+    with journal_path_for(data_path).open("a", encoding="utf-8") as fh:
+        fh.write('{"op":"update","id":2,"se')
+    assert replay_journal(snapshot, data_path) == 1
+    assert records_without_costs(snapshot) == records_without_costs(store)
+
+
+def test_whole_column_writes_ask_for_a_snapshot(tmp_path):
+    store = ItemStore.from_records(make_records(10), categories=CATEGORIES)
+    recorder = JournalRecorder(ChangeJournal(tmp_path / "data.json", fsync=False))
+    store.add_listener(recorder)
+    store.set_cost_factors(np.ones(10))
+    assert not recorder.needs_snapshot
+    store.set_column("efficiency", np.ones(10))
+    assert recorder.needs_snapshot
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    data_path = tmp_path / "data.json"
+    saver = AutoSaver(data_path, debounce=0.01)
+    storage = JournaledStorage(saver, data_path, max_records=20)
+    storage.journal.fsync = False
+    store = ItemStore.from_records(make_records(50), categories=CATEGORIES)
+    storage.attach(store)
+    rng = np.random.default_rng(7)
+    for _ in range(10):
+        change_randomly(store, rng, steps=10)
+        storage.commit(store)
+    assert saver.flush(10)
+    assert rotated_journals(data_path) == []
+
+    with data_path.open(encoding="utf-8") as fh:
+        loaded = ItemStore.from_records(json.load(fh), categories=CATEGORIES)
+    replay_journal(loaded, data_path)
+    assert records_without_costs(loaded) == records_without_costs(store)
+
+
+def test_replay_over_a_snapshot_that_already_holds_the_changes(tmp_path):
+    data_path = tmp_path / "data.json"
+    store = ItemStore.from_records(make_records(30), categories=CATEGORIES)
+    store.add_listener(JournalRecorder(ChangeJournal(data_path, fsync=False)))
+    change_randomly(store, np.random.default_rng(3), steps=30)
+    # A crash after the snapshot was written but before the journal was removed
+    write_json_atomic(data_path, store.to_records())
+    with data_path.open(encoding="utf-8") as fh:
+        loaded = ItemStore.from_records(json.load(fh), categories=CATEGORIES)
+    replay_journal(loaded, data_path)
+    assert records_without_costs(loaded) == records_without_costs(store)
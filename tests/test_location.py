@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from balancing import location
+
+
+def use_candidates(monkeypatch, *candidates):
+    monkeypatch.setattr(location, "candidate_dirs", lambda: list(candidates))
+
+
+def test_first_start_probes_and_records_the_choice(tmp_path, monkeypatch):
+    volume, writable = tmp_path / "volume", tmp_path / "writable"
+    use_candidates(monkeypatch, (volume, False), (writable, True))
+    marker = tmp_path / "state" / location.MARKER_NAME
+    data_file = location.resolve_data_file(tmp_path / "bundled.json", marker)
+    assert data_file == writable / "data.json"
+    assert marker.read_text(encoding="utf-8") == str(data_file)
+
+
+def test_later_starts_trust_the_marker(tmp_path, monkeypatch):
+    writable = tmp_path / "writable"
+    use_candidates(monkeypatch, (writable, True))
+    marker = tmp_path / location.MARKER_NAME
+    location.resolve_data_file(tmp_path / "bundled.json", marker)
+
+    def probe(fallback):
+        raise AssertionError("probed again")
+
+    monkeypatch.setattr(location, "probe_data_file", probe)
+    assert location.resolve_data_file(tmp_path / "bundled.json", marker) == writable / "data.json"
+
+
+def test_stale_markers_are_probed_again(tmp_path, monkeypatch):
+    volume, writable = tmp_path / "volume", tmp_path / "writable"
+    use_candidates(monkeypatch, (volume, False), (writable, True))
+    marker = tmp_path / location.MARKER_NAME
+
+    # The recorded directory is gone
+    marker.write_text(str(tmp_path / "gone" / "data.json"), encoding="utf-8")
+    assert location.resolve_data_file(tmp_path / "bundled.json", marker) == writable / "data.json"
+
+    # The preferred volume was mounted since the marker was written
+    volume.mkdir()
+    assert location.resolve_data_file(tmp_path / "bundled.json", marker) == volume / "data.json"
+    assert marker.read_text(encoding="utf-8") == str(volume / "data.json")
+
+
+def test_unwritable_candidates_fall_back(tmp_path, monkeypatch):
+    use_candidates(monkeypatch, (tmp_path / "missing", False))
+    marker = tmp_path / location.MARKER_NAME
+    assert location.resolve_data_file(tmp_path / "bundled.json", marker) == tmp_path / "bundled.json"
+
+
+def test_marker_location(tmp_path, monkeypatch):
+    monkeypatch.delenv("ITEM_BALANCING_STATE_DIR", raising=False)
+    assert location.default_marker() == Path(location.__file__).resolve().parent.parent / location.MARKER_NAME
+    monkeypatch.setenv("ITEM_BALANCING_STATE_DIR", str(tmp_path))
+    assert location.default_marker() == tmp_path / location.MARKER_NAME
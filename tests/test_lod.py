@@ -0,0 +1,53 @@
+import numpy as np
+
+from balancing.lod import density_grid, scatter_mode, top_positions
+
+
+def test_scatter_mode_thresholds():
+    assert scatter_mode(0) == "svg"
+    assert scatter_mode(2000) == "svg"
+    assert scatter_mode(2001) == "webgl"
+    assert scatter_mode(50000) == "webgl"
+    assert scatter_mode(50001) == "density"
+    assert scatter_mode(10, webgl_threshold=5, density_threshold=8) == "density"
+
+
+def test_top_positions_ranks_highest_first():
+    scores = np.array([3.0, np.nan, 9.0, 1.0, 9.0, 5.0])
+    assert top_positions(scores, 3).tolist() == [2, 4, 5]
+    assert top_positions(scores, 10).tolist() == [2, 4, 5, 0, 3, 1]
+    assert top_positions(scores, 0).tolist() == []
+    scores = np.random.default_rng(5).normal(size=1000)
+    assert top_positions(scores, 20).tolist() == np.argsort(-scores, kind="stable")[:20].tolist()
+
+
+def test_density_grid_matches_histogram2d():
+    rng = np.random.default_rng(6)
+    x = rng.uniform(0, 100, 5000)
+    y = rng.normal(50, 15, 5000)
+    y[:10] = np.nan
+    grid = density_grid(x, y, x_range=(0, 100), y_range=(0, 100), bins=20, max_outliers=50)
+    valid = np.isfinite(y)
+    # Points outside the range count towards the edge cells
+    expected, _, _ = np.histogram2d(np.clip(y[valid], 0, 99.999), x[valid], bins=20, range=[(0, 100), (0, 100)])
+    assert np.array_equal(grid.counts, expected)
+    assert grid.counts.sum() == valid.sum()
+    assert np.allclose(grid.x_centers, np.arange(2.5, 100, 5))
+
+    assert len(grid.outliers) == 50
+    assert np.all(np.diff(grid.outliers) > 0)
+    assert not np.isnan(y[grid.outliers]).any()
+    # The outliers come from the sparsest cells
+    def cell_count(rows):
+        return grid.counts[np.clip((y[rows] / 5).astype(int), 0, 19), (x[rows] / 5).astype(int)]
+    assert cell_count(grid.outliers).max() <= np.sort(cell_count(np.flatnonzero(valid)))[50]
+
+
+def test_small_or_flat_inputs():
+    grid = density_grid([1.0, 2.0, 3.0], [7.0, 7.0, 7.0], bins=4)
+    assert grid.counts.sum() == 3
+    assert grid.outliers.tolist() == [0, 1, 2]
+    assert grid.y_centers[0] < 7 < grid.y_centers[-1]
+    empty = density_grid([], [], bins=4)
+    assert empty.counts.shape == (4, 4)
+    assert empty.counts.sum() == 0
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import CostEngine, ItemStore
+from balancing.derived import add_derived_columns
+from balancing.engine import analyze, frame_from_records
+from balancing.parallel import AnalysisPool, usable_cpus
+from conftest import CATEGORIES, make_records
+
+
+def assert_same_report(parallel, serial):
+    for field in ("item_count", "overpowered", "underpowered", "underused_resources", "overperforming",
+                  "underperforming", "top_performers"):
+        assert getattr(parallel, field) == getattr(serial, field), field
+    for field in ("mean_success_rate", "mean_efficiency", "mean_cost", "correlation", "balance_score"):
+        assert np.isclose(getattr(parallel, field), getattr(serial, field)), field
+    pd.testing.assert_frame_equal(parallel.category_stats, serial.category_stats, check_dtype=False, rtol=1e-9)
+
+
+@pytest.fixture
+def frame():
+    records = make_records(2000)
+    # Ties: the first of the tied items must win, as with idxmax
+    records[700]["efficiency"] = records[1500]["efficiency"] = 100.0
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    CostEngine().refresh(store, 100000)
+    return add_derived_columns(store.view_frame())
+
+
+@pytest.mark.parametrize("workers", [2, 3, 7])
+def test_thread_pool_matches_the_serial_analysis(frame, workers):
+    pool = AnalysisPool(workers, "thread", min_parallel_items=0)
+    try:
+        assert_same_report(pool.analyze(frame), analyze(frame))
+        # Plain category strings (not a Categorical) and a recomputed cost
+        plain = frame_from_records(frame.astype({"category": str}).to_dict("records"))
+        assert_same_report(pool.analyze(plain, cost_max=5000), analyze(plain, cost_max=5000))
+    finally:
+        pool.close()
+
+
+def test_small_catalogs_and_single_workers_run_serially(frame, monkeypatch):
+    pool = AnalysisPool(4, "thread", min_parallel_items=len(frame) + 1)
+    monkeypatch.setattr(pool, "_get_executor", lambda: pytest.fail("used the pool"))
+    assert_same_report(pool.analyze(frame), analyze(frame))
+    single = AnalysisPool(1, "thread", min_parallel_items=0)
+    monkeypatch.setattr(single, "_get_executor", lambda: pytest.fail("used the pool"))
+    single.analyze(frame)
+
+
+def test_default_is_one_worker_per_usable_cpu():
+    assert AnalysisPool().workers == usable_cpus() >= 1
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+import pytest
+
+from balancing import ItemStore
+from balancing.persistence import AutoSaver, write_atomic, write_json_atomic
+from conftest import CATEGORIES, make_records
+
+
+def wait_for(saver, state, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while saver.status().state != state:
+        assert time.monotonic() < deadline, saver.status().state
+        time.sleep(0.01)
+    return saver.status()
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "data.json"
+    write_json_atomic(path, [{"item_name": "Sword"}])
+    os.chmod(path, 0o640)
+
+    def fail(fh):
+        fh.write(b"[{")
+        raise OSError("disk full")
+    with pytest.raises(OSError):
+        write_atomic(path, fail)
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"item_name": "Sword"}]
+    assert os.listdir(tmp_path) == ["data.json"]
+
+    write_json_atomic(path, [{"item_name": "Épée"}])
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"item_name": "Épée"}]
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_a_burst_of_edits_is_one_write(tmp_path):
+    path = tmp_path / "data.json"
+    saver = AutoSaver(path, debounce=0.3)
+    store = ItemStore.from_records(make_records(20), categories=CATEGORIES)
+    saved = []
+    for i in range(5):
+        store.update(0, {"efficiency": float(i)})
+        saver.schedule(store, on_saved=lambda i=i: saved.append(i))
+    assert saver.status().state == "pending"
+    assert not path.exists()
+
+    status = wait_for(saver, "saved")
+    assert status.coalesced == 5
+    assert status.items == 20
+    assert status.path == path
+    assert sorted(saved) == [0, 1, 2, 3, 4]
+    assert json.loads(path.read_text(encoding="utf-8"))[0]["efficiency"] == 4.0
+
+    # The snapshot was taken at schedule time: later edits wait for the next one
+    store.update(0, {"efficiency": 50.0})
+    assert json.loads(path.read_text(encoding="utf-8"))[0]["efficiency"] == 4.0
+
+
+def test_max_delay_bounds_a_long_burst(tmp_path):
+    path = tmp_path / "data.json"
+    saver = AutoSaver(path, debounce=10, max_delay=0.2)
+    store = ItemStore.from_records(make_records(5), categories=CATEGORIES)
+    deadline = time.monotonic() + 5.0
+    while not path.exists():
+        assert time.monotonic() < deadline
+        saver.schedule(store)
+        time.sleep(0.02)
+    assert saver.flush(5.0)
+    assert saver.status().coalesced >= 1
+
+
+def test_flush_and_fallback(tmp_path):
+    blocked = tmp_path / "not-a-directory"
+    blocked.write_text("", encoding="utf-8")
+    fallback = tmp_path / "fallback.json"
+    saver = AutoSaver(blocked / "data.json", debounce=10, fallback_path=fallback)
+    store = ItemStore.from_records(make_records(7), categories=CATEGORIES)
+    saved = []
+    saver.schedule(store, on_saved=lambda: saved.append(True))
+    assert saver.flush(5.0)
+
+    status = saver.status()
+    assert status.state == "saved"
+    assert status.path == fallback
+    assert len(json.loads(fallback.read_text(encoding="utf-8"))) == 7
+    # Saving to the fallback doesn't run the post-save steps of the main file
+    assert saved == []
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from balancing import ItemStore
+from balancing.resources import REPAIR_STRATEGIES, off_total, plan_repair, repair_shares
+from balancing.store import RESOURCE_FIELDS
+from conftest import CATEGORIES, make_records
+
+
+@pytest.mark.parametrize("strategy", sorted(REPAIR_STRATEGIES))
+def test_repaired_shares_add_up(strategy):
+    rng = np.random.default_rng(0)
+    shares = rng.uniform(0, 60, (200, len(RESOURCE_FIELDS)))
+    shares[::7, 3:] = 0
+    repaired = repair_shares(shares, strategy)
+    assert np.allclose(repaired.sum(axis=1), 100)
+    assert (repaired >= 0).all()
+    assert not off_total(repaired).any()
+
+
+def test_dominant_adds_the_remainder_to_the_largest_share():
+    repaired = repair_shares([[40, 20, 10, 5, 5, 0]], "dominant")
+    assert repaired.tolist() == [[60, 20, 10, 5, 5, 0]]
+
+
+def test_dominant_rescales_when_the_excess_uses_up_the_largest_share():
+    repaired = repair_shares([[50, 50, 50, 0, 0, 0], [60, 60, 60, 0, 0, 0]], "dominant")
+    assert np.allclose(repaired, 100 / 3 * np.array([[1, 1, 1, 0, 0, 0]] * 2))
+
+
+def test_snap_rounds_to_the_step():
+    repaired = repair_shares([[33, 33, 34, 10, 0, 0]], "snap", step=5)
+    assert repaired.sum() == 100
+    assert (repaired % 5 == 0).all()
+
+
+def test_empty_and_invalid_rows():
+    shares = [[0] * 6, [np.nan, -5, 50, 20, 10, 10]]
+    assert off_total(shares).tolist() == [True, True]
+    repaired = repair_shares(shares, "dominant")
+    assert repaired[0].tolist() == [0] * 6
+    assert np.allclose(repaired[1], [0, 0, 60, 20, 10, 10])
+    with pytest.raises(ValueError):
+        repair_shares(shares, "snap", step=7)
+
+
+def test_plan_repair_selects_items_off_total():
+    store = ItemStore.from_records(make_records(50), categories=CATEGORIES)
+    store.set_column("tech_components", 0.0, [3, 4])
+    store.set_columns({field: 0.0 for field in RESOURCE_FIELDS}, [7])
+    repair = plan_repair(store, "proportional")
+    assert 3 in repair.positions and 4 in repair.positions
+    assert repair.unrepairable.tolist() == [7]
+    assert np.allclose(repair.after.sum(axis=1), 100)
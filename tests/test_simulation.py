@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import CostEngine, ItemStore
+from balancing.simulation import STREAM_ITEMS, simulate
+from conftest import CATEGORIES, make_records
+
+
+@pytest.fixture
+def frame():
+    store = ItemStore.from_records(make_records(STREAM_ITEMS + 300), categories=CATEGORIES)
+    CostEngine().refresh(store, 1000)
+    return store.to_frame()
+
+
+def test_same_seed_same_results_for_any_block_size(frame):
+    reference = simulate(frame, trials=400, session=20, seed=42)
+    for block_size in (1, 999, 50_000):
+        other = simulate(frame, trials=400, session=20, seed=42, block_size=block_size)
+        pd.testing.assert_frame_equal(other.items, reference.items)
+        pd.testing.assert_frame_equal(other.categories, reference.categories)
+
+
+def test_items_keep_their_stream_when_the_catalog_grows(frame):
+    full = simulate(frame, trials=200, session=20, seed=1)
+    prefix = simulate(frame.iloc[:STREAM_ITEMS], trials=200, session=20, seed=1)
+    pd.testing.assert_frame_equal(prefix.items, full.items.iloc[:STREAM_ITEMS])
+
+
+def test_seeds_differ_and_hit_rates_converge(frame):
+    first = simulate(frame, trials=2000, session=100, seed=0)
+    second = simulate(frame, trials=2000, session=100, seed=1)
+    assert not first.items["hit_rate"].equals(second.items["hit_rate"])
+    rates = frame["success_rate"].to_numpy()
+    # Binomial standard error of 2000 uses is at most about 1.1 points
+    assert np.abs(first.items["hit_rate"].to_numpy() - rates).max() < 6
+
+
+def test_certain_items_have_no_variance():
+    df = pd.DataFrame({
+        "success_rate": [100.0, 0.0],
+        "efficiency": [50.0, 50.0],
+        "calculated_cost": [10.0, 0.0],
+        "category": ["Weapons", "Armor"],
+    })
+    report = simulate(df, trials=100, session=10)
+    assert report.items["hit_rate"].tolist() == [100.0, 0.0]
+    assert report.items["value_per_cost"].iloc[0] == pytest.approx(0.05)
+    assert report.items["variance"].iloc[0] == 0
+    assert np.isnan(report.items["value_per_cost"].iloc[1])
+
+
+def test_invalid_session_length(frame):
+    with pytest.raises(ValueError):
+        simulate(frame, trials=150, session=100)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from balancing import ItemStore
+from balancing.store import FLOAT_FIELDS
+from conftest import CATEGORIES, make_records
+
+
+def test_records_round_trip(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    assert len(store) == len(records)
+    for record, stored in zip(records, store.to_records()):
+        assert stored["item_name"] == record["item_name"]
+        assert stored["category"] == record["category"]
+        for field, value in record.items():
+            if field in FLOAT_FIELDS:
+                assert stored[field] == value
+    assert ItemStore.from_records(store.to_records(), categories=CATEGORIES).to_records() == store.to_records()
+
+
+def test_frame_matches_records(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    frame = store.to_frame()
+    assert frame["item_name"].tolist() == [r["item_name"] for r in records]
+    assert frame["category"].astype(str).tolist() == [r["category"] for r in records]
+    assert np.array_equal(frame["efficiency"].to_numpy(), store.column("efficiency"))
+
+
+def test_copy_is_independent(records):
+    store = ItemStore.from_records(records, categories=CATEGORIES)
+    clone = store.copy()
+    store.update(0, {"efficiency": 1.0, "category": "Tools"})
+    store.extend(make_records(5, 1))
+    store.delete([1])
+    assert clone.to_records() == ItemStore.from_records(records, categories=CATEGORIES).to_records()
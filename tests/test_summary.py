@@ -0,0 +1,112 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from balancing import analyze
+from balancing.batch import main, score_chunk
+from balancing.summary import SUMMARY_FIELDS, CatalogSummary, Comoments, Moments
+from conftest import make_records
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_merged_moments_match_numpy():
+    values = np.random.default_rng(3).normal(50, 20, size=(1000, 3))
+    whole, merged = Moments(3), Moments(3)
+    whole.add(values)
+    for chunk in np.array_split(values, [1, 2, 300, 301, 1000]):
+        part = Moments(3)
+        part.add(chunk)
+        merged.merge(part)
+    for moments in (whole, merged):
+        assert moments.count == 1000
+        assert np.allclose(moments.mean, values.mean(axis=0))
+        assert np.allclose(moments.std(), values.std(axis=0, ddof=1))
+
+
+def test_comoments_skip_nan_pairs():
+    rng = np.random.default_rng(4)
+    x = rng.normal(size=500)
+    y = x * 0.5 + rng.normal(size=500)
+    y[::7] = np.nan
+    moments = Comoments()
+    for start in range(0, 500, 64):
+        moments.add(x[start:start + 64], y[start:start + 64])
+    valid = ~np.isnan(y)
+    assert moments.count == valid.sum()
+    assert np.isclose(moments.correlation(), np.corrcoef(x[valid], y[valid])[0, 1])
+
+    constant = Comoments()
+    constant.add([1.0, 1.0, 1.0], [1.0, 2.0, 3.0])
+    assert np.isnan(constant.correlation())
+
+
+def test_sharded_summary_matches_analyze(records):
+    df = score_chunk(records, 50000)
+    shards = []
+    for rows in np.array_split(np.arange(len(df)), 3):
+        shard = CatalogSummary()
+        for chunk in np.array_split(rows, 4):
+            shard.add(df.iloc[chunk])
+        shards.append(shard)
+    summary = shards[0]
+    for shard in shards[1:]:
+        summary.merge(shard)
+    result = summary.report()
+
+    report = analyze(df)
+    assert result["items"] == report.item_count
+    assert result["overpowered"] == len(report.overpowered)
+    assert result["underpowered"] == len(report.underpowered)
+    assert result["overperforming"] == report.overperforming
+    assert result["underperforming"] == report.underperforming
+    assert np.isclose(result["cost_performance_correlation"], report.correlation)
+    assert np.isclose(result["balance_score"], report.balance_score)
+    assert result["underused_resources"] == report.underused_resources
+
+    groups = df.groupby("category")[SUMMARY_FIELDS]
+    for category, stats in result["categories"].items():
+        assert stats["count"] == len(groups.get_group(category))
+        for field in SUMMARY_FIELDS:
+            assert np.isclose(stats[field], groups.mean().loc[category, field])
+            assert np.isclose(stats[f"{field}_std"], groups.std().loc[category, field])
+
+
+def write_items(path, records):
+    lines = [json.dumps(record) for record in records]
+    lines[5:5] = ["not json", json.dumps({"category": "Tools"}), json.dumps(dict(records[0], efficiency="high"))]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_batch_cli_scores_in_chunks(tmp_path):
+    records = make_records(250)
+    items = tmp_path / "items.jsonl"
+    write_items(items, records)
+    assert main([str(items), "--cost-max", "20000", "--chunk-size", "40", "--quiet",
+                 "-o", str(tmp_path / "scored.jsonl"), "--summary", str(tmp_path / "summary.json")]) == 0
+
+    scored = pd.read_json(tmp_path / "scored.jsonl", lines=True)
+    expected = score_chunk(make_records(250), 20000)
+    assert len(scored) == 250
+    assert np.allclose(scored["calculated_cost"], expected["calculated_cost"])
+    assert np.allclose(scored["power_level"], expected["power_level"])
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding="utf-8"))
+    assert summary["items"] == 250
+    assert summary["rejected"] == 3
+    assert np.isclose(summary["balance_score"], analyze(expected).balance_score)
+
+
+def test_batch_module_reads_stdin(tmp_path):
+    records = make_records(60)
+    completed = subprocess.run(
+        [sys.executable, "-m", "balancing.batch", "-", "--format", "json", "--quiet"],
+        input=json.dumps({"items": records}), capture_output=True, text=True, cwd=ROOT, check=True,
+    )
+    summary = json.loads(completed.stdout)
+    assert summary["items"] == 60
+    assert summary["rejected"] == 0
+    assert np.isclose(summary["means"]["efficiency"], np.mean([r["efficiency"] for r in records]))
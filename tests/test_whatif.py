@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from balancing import CostFormula, analyze, calculate_cost
+from balancing.engine import frame_from_records
+from balancing.formulas import FORMULA_PRESETS
+from balancing.whatif import Sweep, scenario_grid
+from conftest import CATEGORIES
+
+FORMULAS = [
+    (None, {}),
+    (CostFormula(FORMULA_PRESETS["Per category"].expression), FORMULA_PRESETS["Per category"].parameters),
+    # Not proportional to cost_max: evaluated per scenario
+    (CostFormula("success_rate * efficiency / 10000 * cost_max + chemicals * 20"), {}),
+]
+
+
+def scenarios():
+    return pd.concat([
+        scenario_grid([1000, 50000], (0.8, 1.3), (1.0, 1.1), category="Weapons"),
+        scenario_grid([20000], (0.5, 1.5)),
+    ], ignore_index=True)
+
+
+def buffed_frame(df, scenario, formula, parameters):
+    """``df`` with the scenario applied, the way the live analysis would see it."""
+    df = df.copy()
+    target = df["category"] == scenario["category"] if scenario["category"] else slice(None)
+    df.loc[target, "success_rate"] = (df.loc[target, "success_rate"] * scenario["success_multiplier"]).clip(0, 100)
+    df.loc[target, "efficiency"] = (df.loc[target, "efficiency"] * scenario["efficiency_multiplier"]).clip(0, 100)
+    if formula is None:
+        df["calculated_cost"] = calculate_cost(df["success_rate"].to_numpy(), df["efficiency"].to_numpy(),
+                                               scenario["cost_max"])
+    else:
+        codes, categories = pd.factorize(df["category"])
+        columns = {field: df[field].to_numpy() for field in formula.fields}
+        columns["category"] = codes
+        df["calculated_cost"] = formula.evaluate(columns, dict(parameters, cost_max=scenario["cost_max"]),
+                                                 list(categories), len(df))
+    return df
+
+
+@pytest.mark.parametrize("formula, parameters", FORMULAS)
+def test_sweep_matches_analyze(records, formula, parameters):
+    df = frame_from_records(records)
+    sweep = Sweep(df, formula, parameters, block_size=len(df) * 3)
+    results = sweep.run(scenarios())
+    assert len(results) == 10
+    for _, row in results.iterrows():
+        report = analyze(buffed_frame(df, row, formula, parameters))
+        assert np.isclose(row["mean_cost"], report.mean_cost)
+        assert np.isclose(row["correlation"], report.correlation)
+        assert np.isclose(row["balance_score"], report.balance_score)
+        assert row["overpowered"] == len(report.overpowered)
+        assert row["underpowered"] == len(report.underpowered)
+        assert row["overperforming"] == report.overperforming
+        assert row["underperforming"] == report.underperforming
+        for stats in report.category_stats.itertuples():
+            assert np.isclose(row[f"power: {stats.category}"], stats.power_level)
+        over, under = sweep.flagged(row)
+        assert over.tolist() == report.overpowered
+        assert under.tolist() == report.underpowered
+
+
+def test_unknown_category_leaves_the_catalog_alone(records):
+    df = frame_from_records(records)
+    results = Sweep(df).run(scenario_grid([30000], (2.0,), category="Relics"))
+    report = analyze(df, cost_max=30000)
+    assert np.isclose(results["mean_cost"][0], report.mean_cost)
+    assert results["overpowered"][0] == len(report.overpowered)
+    assert sorted(column[len("power: "):] for column in results if column.startswith("power: ")) \
+        == sorted(CATEGORIES)